@@ -8,12 +8,16 @@ import zlib
 
 from . import utils
 from app.services.redis_service import get_redis
-from app.core.logger import get_logger
+from app.core.logger import get_logger, logging_control
 from app.config.settings import settings
 from app.src.session.input_sessions_manager import input_sessions_manager
 from app.src.session.output_sessions_manager import output_sessions_manager, send_to_main_server
+from app.src.session.idle_reaper import idle_reaper
 from app.src.output.utils import get_output_dev_id
-from app.services.history_service import get_packet_history
+from app.services.flight_recorder_service import flight_recorder
+from app.services.latency_service import latency_tracker
+from app.services.metrics_service import metrics
+from app.services.history_service import get_packet_history, query_packet_history, parse_history_cursor, get_history_service_stats, PACKET_TYPES
 from app.src.input.j16x_j16.builder import build_command as build_j16x_j16_command
 from app.src.input.j16w.builder import build_command as build_j16w_command
 from app.src.input.vl01.builder import build_command as build_vl01_command
@@ -62,6 +66,9 @@ def get_gateway_info():
                 },
                 "total_active_translator_sessions": len(input_sessions_manager.get_sessions()),
                 "total_active_main_server_sessions": len(output_sessions_manager.get_sessions()),
+                "total_reaped_idle_connections": idle_reaper.get_stats(),
+                "history_service": get_history_service_stats(),
+                "flight_recorder": flight_recorder.stats(),
             }
         }
     
@@ -70,6 +77,83 @@ def get_gateway_info():
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """
+    Métricas no formato de exposição do Prometheus (contadores, sessões, threads, filas do histórico, Redis e etapas do pipeline).
+    """
+    response = make_response(metrics.render(), 200)
+    response.headers["Content-Type"] = "text/plain; version=0.0.4; charset=utf-8"
+    return response
+
+@app.route('/logging', methods=['GET'])
+def get_logging_config():
+    """
+    Retorna a verbosidade atual do log: nível global, regras por dispositivo/protocolo e amostragem.
+    """
+    return jsonify(logging_control.snapshot()), 200
+
+@app.route('/logging', methods=['POST'])
+def set_logging_config():
+    """
+    Altera a verbosidade do log em tempo de execução, sem reiniciar o servidor.
+    Corpo (todos opcionais): {"level": "INFO", "sample_every": 10, "devices": {"<dev_id>": "DEBUG"}, "protocols": {"nt40": "DEBUG"}, "diagnose": false, "backtrace": false}
+    Um nível null em "devices"/"protocols" remove a regra.
+    """
+    with logger.contextualize(log_label="API"):
+        request_data = request.get_json(silent=True)
+        if not isinstance(request_data, dict):
+            return jsonify({"status": "error", "message": "request with no data received."}), 400
+
+        devices = request_data.get("devices")
+        protocols = request_data.get("protocols")
+        if not isinstance(devices or {}, dict) or not isinstance(protocols or {}, dict):
+            return jsonify({"status": "error", "message": "'devices' and 'protocols' must be objects."}), 400
+
+        try:
+            logging_control.configure(
+                level=request_data.get("level"),
+                sample_every=request_data.get("sample_every"),
+                devices=devices,
+                protocols=protocols,
+                diagnose=request_data.get("diagnose"),
+                backtrace=request_data.get("backtrace"),
+            )
+        except (TypeError, ValueError) as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+
+        logger.info(f"Verbosidade do log alterada: {logging_control.snapshot()}")
+        return jsonify(logging_control.snapshot()), 200
+
+@app.route('/latency', methods=['GET'])
+def get_latency_histograms():
+    """
+    Retorna, por protocolo de entrada e etapa do pipeline, contagem, média, percentis (p50/p90/p99/p99.9) e máximo em ms.
+    Parâmetro opcional: `protocol` (ex.: ?protocol=nt40).
+    """
+    protocol = request.args.get("protocol")
+    return jsonify(latency_tracker.snapshot(protocol.lower() if protocol else None)), 200
+
+@app.route('/latency', methods=['POST'])
+def set_latency_histograms():
+    """
+    Liga/desliga os histogramas de latência e/ou os zera.
+    Corpo (todos opcionais): {"enabled": true, "reset": true}
+    """
+    with logger.contextualize(log_label="API"):
+        request_data = request.get_json(silent=True)
+        if not isinstance(request_data, dict):
+            return jsonify({"status": "error", "message": "request with no data received."}), 400
+
+        enabled = request_data.get("enabled")
+        if enabled is not None and not isinstance(enabled, bool):
+            return jsonify({"status": "error", "message": "'enabled' must be a boolean."}), 400
+
+        latency_tracker.configure(enabled=enabled, reset=bool(request_data.get("reset")))
+
+        logger.info(f"Histogramas de latência alterados: enabled={latency_tracker.enabled} reset={bool(request_data.get('reset'))}")
+        return jsonify({"enabled": latency_tracker.enabled, "since": latency_tracker.since}), 200
+
 @app.route('/sessions/trackers', methods=['GET'])
 def get_tracker_sessions():
     """
@@ -145,10 +229,32 @@ def get_satellite_trackers():
 def get_tracker_history(dev_id):
     """
     Fetches the packet history for a specific tracker.
+    With any of `since`, `until`, `limit`, `cursor`, `packet_type` or `alert_id`, returns a page: {"data": [...], "next_cursor": ...}.
     """
     try:
-        compress = request.args.get("zlib_compress")
-        history = get_packet_history(dev_id, return_compressed=True if compress else False)
+        args = request.args
+        compress = args.get("zlib_compress")
+
+        if any(param in args for param in ("since", "until", "limit", "cursor", "packet_type", "alert_id")):
+            try:
+                since = utils.parse_timestamp(args.get("since"))
+                until = utils.parse_timestamp(args.get("until"))
+                limit = int(args.get("limit", 100))
+                cursor = args.get("cursor") or None
+                parse_history_cursor(cursor)
+                alert_id = int(args["alert_id"]) if args.get("alert_id") else None
+                packet_type = args.get("packet_type") or None
+                if packet_type is not None and packet_type not in PACKET_TYPES:
+                    raise ValueError(packet_type)
+            except (ValueError, OverflowError):
+                return jsonify({"status": "error", "message": "invalid since/until/limit/cursor/packet_type/alert_id parameter."}), 400
+
+            history = query_packet_history(dev_id, since=since, until=until, limit=limit, cursor=cursor, packet_type=packet_type, alert_id=alert_id)
+            if compress:
+                history = zlib.compress(json.dumps(history).encode('utf-8'))
+
+        else:
+            history = get_packet_history(dev_id, return_compressed=True if compress else False)
 
         if compress:
             response = make_response(history)
@@ -162,6 +268,26 @@ def get_tracker_history(dev_id):
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
+@app.route('/trackers/<string:dev_id>/flight_recorder', methods=['GET'])
+def get_tracker_flight_recorder(dev_id):
+    """
+    Retorna os últimos eventos do flight recorder do rastreador: bytes recebidos, ACKs, pacotes enviados ao
+    servidor principal e comandos recebidos dele, com o tempo de cada etapa.
+    Com `format=pcap`, retorna a gravação em um arquivo pcap (LINKTYPE_USER0).
+    """
+    events = flight_recorder.dump(dev_id)
+    if not events:
+        return jsonify({"status": "error", "message": "No flight recorder events for this device."}), 404
+
+    if request.args.get("format") == "pcap":
+        response = make_response(flight_recorder.export_pcap(dev_id))
+        response.headers["Content-Type"] = "application/vnd.tcpdump.pcap"
+        response.headers["Content-Disposition"] = f"attachment; filename={dev_id}.pcap"
+
+        return response, 200
+
+    return jsonify({"device_id": dev_id, "events": events}), 200
+
 @app.route('/trackers/<string:dev_id>/details', methods=['GET'])
 def get_tracker_details(dev_id):
     """
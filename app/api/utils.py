@@ -1,5 +1,7 @@
 import json
+import math
 from typing import Tuple
+from dateutil import parser
 
 from app.services.redis_service import get_redis
 from app.services.cache_service import get_cache
@@ -33,4 +35,23 @@ def get_output_input_ids_map() -> Tuple[dict]:
 
         return output_input_ids_0Padded, output_input_ids_notPadded
     except Exception as e:
-        logger.error(f"Houve um erro ao tentar obter o mapeamento de ids. {e}")
\ No newline at end of file
+        logger.error(f"Houve um erro ao tentar obter o mapeamento de ids. {e}")
+
+
+def parse_timestamp(value: str | None) -> float | None:
+    """
+    Converte um parâmetro de data (epoch em segundos ou ISO 8601) em epoch.
+    Levanta ValueError se o valor não for reconhecido ou não for finito ("nan", "inf").
+    """
+    if value is None or value == "":
+        return None
+
+    try:
+        timestamp = float(value)
+    except ValueError:
+        return parser.isoparse(value).timestamp()
+
+    if not math.isfinite(timestamp):
+        raise ValueError(f"timestamp não finito: {value}")
+
+    return timestamp
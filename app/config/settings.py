@@ -11,6 +11,17 @@ class Settings(BaseSettings):
     )
 
     LOG_LEVEL: str = "INFO"
+    LOG_SAMPLE_EVERY: int = 10              # Mensagens de alto volume (pacotes recebidos/mapeados/encaminhados): emite 1 a cada N por ponto do código
+    LOG_DEVICE_LEVELS: Dict[str, str] = {}   # Nível próprio por dev_id, ex.: {"864943040000000": "DEBUG"}. Alterável em /logging
+    LOG_PROTOCOL_LEVELS: Dict[str, str] = {} # Nível próprio por protocolo de entrada, ex.: {"nt40": "DEBUG"}
+    LOG_ASYNC: bool = True                   # Escrita dos logs por uma thread dedicada, fora das threads dos rastreadores
+    LOG_QUEUE_SIZE: int = 10000              # Mensagens aguardando escrita no modo assíncrono
+    LOG_QUEUE_OVERFLOW: str = "drop"         # Com a fila cheia: "drop" descarta e contabiliza, "block" aguarda espaço
+    LOG_DIAGNOSE: bool = False               # Variáveis de cada frame nas exceções (caro). Alterável em /logging
+    LOG_BACKTRACE: bool = False              # Rastro estendido além do frame que capturou a exceção (caro). Alterável em /logging
+    LOG_BUS_BACKFILL_LINES: int = 100        # Últimas linhas guardadas por log_label para quem abre o streaming via WebSocket
+    LOG_BUS_MAX_LABELS: int = 2000           # log_labels (dispositivos) com linhas guardadas; os menos recentes são descartados
+    LOG_BUS_SUBSCRIBER_QUEUE: int = 1000     # Linhas aguardando envio a cada cliente do WebSocket
 
     # --- Configurações Gerais do Servidor ---
     STANDARD_HYBRID_OUTPUT_PROTOCOL: str = "gt06" # Protocolo de Saída padrão para dispositivos híbridos
@@ -19,10 +30,54 @@ class Settings(BaseSettings):
     AUTO_SUNTECH_OUTPUT_PROTOCOLS: list = ["satellital", "nt40", "suntech2g", "suntech4g"]
 
     # --- Configurações para history service ---
-    HISTORY_LIMIT: int = 10000
+    HISTORY_LIMIT: int = 10000              # Pacotes mantidos por dispositivo, somando as camadas quente e fria
+    HISTORY_HOT_LIMIT: int = 2000           # Pacotes mais recentes mantidos no Redis; os mais antigos vão para o disco
+    HISTORY_COLD_MIN_SEGMENT_PACKETS: int = 200   # Segmentos frios menores que isso são juntados na compactação
+    HISTORY_COLD_SEGMENT_PACKETS: int = 2000      # Tamanho máximo de um segmento frio resultante da compactação
+    HISTORY_COLD_COMPACT_INTERVAL: int = 3600     # Segundos entre rodadas de compactação da camada fria
+    HISTORY_COLD_COMPACT_BATCH: int = 20          # Dispositivos compactados a cada segundo do worker
     DISK_BATCH_SIZE: int = 500
     CACHE_DIR: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + "/cache"
     HISTORY_SERVICE_QUEUE: str = "history_service:packet_queue"
+    HISTORY_SERVICE_STATS_KEY: str = "history_service:stats"
+    HISTORY_WORKER_PROCESSES: int = 1       # Com mais de um, cada processo consome a fila do seu shard de dev_ids
+    HISTORY_WORKER_BATCH_SIZE: int = 500    # Itens retirados da fila por vez
+    HISTORY_FLUSH_INTERVAL: int = 60        # Segundos até um buffer incompleto virar segmento
+    HISTORY_MIN_SEGMENT_PACKETS: int = 50   # Buffers menores que isso não viram segmento por tempo antes de HISTORY_FLUSH_MAX_INTERVAL
+    HISTORY_FLUSH_MAX_INTERVAL: int = 900   # Segundos máximos que um buffer pequeno aguarda antes de virar segmento
+    HISTORY_STATS_INTERVAL: int = 10        # Segundos entre publicações de vazão/atraso
+    HISTORY_ENQUEUE_INTERVAL: float = 0.005 # Segundos máximos que um pacote aguarda no lote antes de ir para a fila
+    HISTORY_ENQUEUE_BATCH_SIZE: int = 200   # Itens acumulados que disparam o envio imediato do lote
+    HISTORY_BUFFER_SHARDS: int = 16         # Bancos SQLite do armazenamento de buffers (FanoutCache)
+    HISTORY_BUFFER_TIMEOUT: float = 1.0     # Segundos de espera pelo lock de um shard antes de tentar novamente
+    HISTORY_ZDICT_TRAIN_SAMPLES: int = 5000 # Pacotes amostrados para treinar o dicionário de compressão
+    HISTORY_ZDICT_RETRAIN_DAYS: int = 7     # Intervalo entre treinos do dicionário
+
+    # --- Configurações de compressão (codec_service) ---
+    CODEC_DEFAULT: str = "zdict"            # "zdict" (zlib com dicionário treinado) ou "zlib"
+    CODEC_ZDICT_SIZE: int = 4096            # Tamanho máximo do dicionário (até 32768, a janela do zlib)
+    CODEC_DICTIONARY_REFRESH: int = 60      # Segundos entre consultas da versão corrente do dicionário
+
+    # --- Configurações do flight recorder (flight_recorder_service) ---
+    FLIGHT_RECORDER_ENABLED: bool = True
+    FLIGHT_RECORDER_EVENTS: int = 32          # Eventos (recvs, ACKs, pacotes de saída, comandos) guardados por dispositivo
+    FLIGHT_RECORDER_MAX_DEVICES: int = 10000  # Dispositivos com gravação; os mais antigos são descartados
+
+    # --- Histogramas de latência por etapa do pipeline (latency_service) ---
+    LATENCY_HISTOGRAMS_ENABLED: bool = True   # Alterável em tempo de execução via POST /latency
+
+    # --- Configurações de sessões TCP dos rastreadores ---
+    TRACKER_TCP_KEEPALIVE_IDLE: int = 120     # Segundos ociosos antes da primeira sonda de keepalive
+    TRACKER_TCP_KEEPALIVE_INTERVAL: int = 30  # Segundos entre sondas
+    TRACKER_TCP_KEEPALIVE_COUNT: int = 4      # Sondas sem resposta até a conexão ser considerada morta
+    DEFAULT_TRACKER_IDLE_TIMEOUT: int = 1800  # Prazo de leitura para protocolos sem "idle_timeout" próprio
+    SESSION_LOCK_STRIPES: int = 256           # Quantidade de locks dos registros de sessões (indexados por dev_id)
+
+    # --- Configurações de sessões TCP com os servidores principais ---
+    MAIN_SERVER_TCP_KEEPALIVE_IDLE: int = 60
+    MAIN_SERVER_TCP_KEEPALIVE_INTERVAL: int = 15
+    MAIN_SERVER_TCP_KEEPALIVE_COUNT: int = 4
+    MAIN_SERVER_SESSION_IDLE_TIMEOUT: int = 3600 * 3 # Sessões sem envios por esse tempo são encerradas
 
     # --- Configurações de Rede e Credenciais ---
     SUNTECH_MAIN_SERVER_HOST: str = '127.0.0.1'
@@ -31,6 +86,9 @@ class Settings(BaseSettings):
     GT06_MAIN_SERVER_HOST: str = '127.0.0.1'
     GT06_MAIN_SERVER_PORT: int = 12345
  
+    # Armazenamento do estado dos rastreadores, sessões e filas: "redis" ou "memory"
+    # (em memória, no processo: para benchmarks e testes sem um servidor Redis)
+    STORAGE_BACKEND: str = "redis"
     REDIS_DB_MAIN: int = 2
     REDIS_PASSWORD: str = '...'
     REDIS_HOST: str = '127.0.0.1'
@@ -42,42 +100,52 @@ class Settings(BaseSettings):
     API_REFERER: str = "..."
 
     # --- Módulos de Protocolo a serem Carregados ---
+    # "idle_timeout": segundos sem receber dados até a conexão ser encerrada (~3x o intervalo de heartbeat do protocolo)
     INPUT_PROTOCOL_HANDLERS: Dict[str, Dict[str, Any]] = {
         "j16w": {
             "port": 65430,
-            "handler_path": "app.src.input.j16w.handler.handle_connection"
+            "handler_path": "app.src.input.j16w.handler.handle_connection",
+            "idle_timeout": 900
         },
         "j16x_j16": {
             "port": 65431,
-            "handler_path": "app.src.input.j16x_j16.handler.handle_connection"
+            "handler_path": "app.src.input.j16x_j16.handler.handle_connection",
+            "idle_timeout": 900
         },
         "vl01": {
             "port": 65432,
-            "handler_path": "app.src.input.vl01.handler.handle_connection"
+            "handler_path": "app.src.input.vl01.handler.handle_connection",
+            "idle_timeout": 900
         },
         "nt40": {
             "port": 65433,
-            "handler_path": "app.src.input.nt40.handler.handle_connection"
+            "handler_path": "app.src.input.nt40.handler.handle_connection",
+            "idle_timeout": 900
         },
         "satellital": {
             "port": 65434,
-            "handler_path": "app.src.input.satellital.handler.handle_connection"
+            "handler_path": "app.src.input.satellital.handler.handle_connection",
+            "idle_timeout": 3600 * 25
         },
         "suntech2g": {
             "port": 65435,
-            "handler_path": "app.src.input.suntech2g.handler.handle_connection"
+            "handler_path": "app.src.input.suntech2g.handler.handle_connection",
+            "idle_timeout": 3600
         },
         "suntech4g": {
             "port": 65436,
-            "handler_path": "app.src.input.suntech4g.handler.handle_connection"
+            "handler_path": "app.src.input.suntech4g.handler.handle_connection",
+            "idle_timeout": 3600
         },
         "gp900m": {
             "port": 65437,
-            "handler_path": "app.src.input.gp900m.handler.handle_connection"
+            "handler_path": "app.src.input.gp900m.handler.handle_connection",
+            "idle_timeout": 1800
         },
         "vl03": {
             "port": 65438,
-            "handler_path": "app.src.input.vl03.handler.handle_connection"
+            "handler_path": "app.src.input.vl03.handler.handle_connection",
+            "idle_timeout": 900
         }
     }
 
@@ -0,0 +1,120 @@
+import os
+import queue
+import threading
+from collections import OrderedDict, deque
+
+from app.config.settings import settings
+
+class LogSubscription:
+    """
+    Inscrição nas linhas de log de um `log_label`. As linhas novas chegam por uma fila limitada;
+    se o cliente não acompanhar, as excedentes são descartadas e contadas em `dropped`.
+    """
+
+    def __init__(self, label: str, backfill: list):
+        self.label = label
+        self.backfill = backfill
+        self.dropped = 0
+        self.closed = False
+        self._queue = queue.Queue(settings.LOG_BUS_SUBSCRIBER_QUEUE)
+
+    def _put(self, line: str):
+        try:
+            self._queue.put_nowait(line)
+        except queue.Full:
+            self.dropped += 1
+
+    def get(self, timeout: float | None = None) -> str | None:
+        """
+        Próxima linha, ou None se a inscrição foi encerrada ou nada chegou dentro de `timeout`.
+        """
+        if self.closed:
+            return None
+
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+class LogBus:
+    """
+    Barramento em memória das linhas de log, indexado por `log_label` (geralmente o dev_id).
+    Recebe as mensagens já formatadas do sink do logger e as entrega apenas aos inscritos no label.
+    Cada label mantém as últimas LOG_BUS_BACKFILL_LINES linhas, enviadas a quem se inscreve;
+    apenas os LOG_BUS_MAX_LABELS labels mais recentes são mantidos.
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+                    cls._instance._buffers = OrderedDict()
+                    cls._instance._subscribers = {}
+                    cls._instance._bus_lock = threading.Lock()
+                    os.register_at_fork(after_in_child=cls._instance._reset_after_fork)
+
+        return cls._instance
+
+    def _reset_after_fork(self):
+        # O lock pode ter sido copiado travado pela thread escritora do pai; os inscritos pertencem ao pai
+        self._bus_lock = threading.Lock()
+        self._subscribers = {}
+
+    def publish(self, message):
+        """
+        Recebe uma mensagem do loguru (str com o registro em `message.record`).
+        """
+        label = str(message.record["extra"].get("log_label"))
+        line = message.rstrip("\n")
+
+        with self._bus_lock:
+            buffer = self._buffers.get(label)
+            if buffer is None:
+                buffer = deque(maxlen=settings.LOG_BUS_BACKFILL_LINES)
+                self._buffers[label] = buffer
+                if len(self._buffers) > settings.LOG_BUS_MAX_LABELS:
+                    self._buffers.popitem(last=False)
+            else:
+                self._buffers.move_to_end(label)
+
+            buffer.append(line)
+            subscribers = self._subscribers.get(label)
+            if subscribers:
+                for subscription in subscribers:
+                    subscription._put(line)
+
+    def subscribe(self, label: str, backfill_lines: int | None = None) -> LogSubscription:
+        label = str(label)
+        with self._bus_lock:
+            backfill = list(self._buffers.get(label, ()))
+            if backfill_lines is not None:
+                backfill = backfill[-backfill_lines:] if backfill_lines > 0 else []
+
+            subscription = LogSubscription(label, backfill)
+            self._subscribers.setdefault(label, set()).add(subscription)
+
+        return subscription
+
+    def unsubscribe(self, subscription: LogSubscription):
+        with self._bus_lock:
+            subscribers = self._subscribers.get(subscription.label)
+            if subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.label]
+
+        subscription.closed = True
+        # Acorda quem estiver aguardando em `get`
+        subscription._put(None)
+
+    def stats(self) -> dict:
+        with self._bus_lock:
+            return {
+                "labels": len(self._buffers),
+                "subscribers": sum(len(subscribers) for subscribers in self._subscribers.values()),
+            }
+
+log_bus = LogBus()
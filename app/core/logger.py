@@ -1,25 +1,406 @@
+import atexit
+import os
+import queue
 import sys
+import threading
+import time
 from loguru import logger
 from app.config.settings import settings
+from app.core.log_bus import log_bus
+
+LOG_FORMAT = (
+    "<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | "
+    "<level>{level}</level> | "
+    "<yellow>[{extra[log_label]}]</yellow> |"
+    "<cyan>{name}:{function}:{line}</cyan> - <level>{message}</level>"
+)
+
+_WARNING_LEVEL_NO = logger.level("WARNING").no
+
+class _LazyValue:
+    __slots__ = ("func", "args")
+
+    def __init__(self, func, args):
+        self.func = func
+        self.args = args
+
+    def __format__(self, spec: str) -> str:
+        return format(self.func(*self.args), spec)
+
+    def __str__(self) -> str:
+        return str(self.func(*self.args))
+
+def lazy(func, *args) -> _LazyValue:
+    """
+    Adia um cálculo caro até a mensagem ser de fato emitida.
+    Ex.: logger.debug("Pacote construído: {}", lazy(packet.hex))
+    """
+    return _LazyValue(func, args)
+
+class AsyncLogSink:
+    """
+    Sink não bloqueante: as mensagens já formatadas vão para uma fila limitada (LOG_QUEUE_SIZE)
+    e uma thread dedicada as escreve em lotes no stream.
+    Com a fila cheia, LOG_QUEUE_OVERFLOW="drop" descarta a mensagem nova e a contabiliza por nível
+    (o escritor registra um aviso com o total descartado); "block" faz quem registra aguardar espaço.
+    Após escrever, o escritor repassa as mensagens a `publish` (o barramento de logs por dispositivo).
+    """
+
+    def __init__(self, stream, maxsize: int | None = None, overflow: str | None = None, publish=None):
+        self._stream = stream
+        self._publish = publish
+        self._maxsize = maxsize or settings.LOG_QUEUE_SIZE
+        self._block = (overflow or settings.LOG_QUEUE_OVERFLOW) == "block"
+        self._pid = None
+        self._queue = None
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.dropped = 0
+        self.dropped_by_level = {}
+        self._reported_dropped = 0
+
+    def _ensure_writer(self):
+        # A thread escritora (e o lock interno da fila) não atravessam fork: cada processo cria os seus
+        if self._pid == os.getpid():
+            return
+
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+
+            self._queue = queue.Queue(self._maxsize)
+            self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def __call__(self, message):
+        self._ensure_writer()
+
+        if self._block:
+            self._queue.put(message)
+            return
+
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            level = message.record["level"].name
+            self.dropped += 1
+            self.dropped_by_level[level] = self.dropped_by_level.get(level, 0) + 1
+
+    def _run(self):
+        log_queue = self._queue
+        while True:
+            batch = [log_queue.get()]
+            try:
+                while len(batch) < 1000:
+                    batch.append(log_queue.get_nowait())
+            except queue.Empty:
+                pass
+
+            queued = len(batch)
+            dropped = self.dropped
+            if dropped != self._reported_dropped:
+                batch.append(
+                    f"{time.strftime('%Y-%m-%d %H:%M:%S')} | WARNING | [SERVIDOR] |app.core.logger - "
+                    f"{dropped - self._reported_dropped} mensagens de log descartadas (fila cheia), total={dropped}\n"
+                )
+                self._reported_dropped = dropped
+
+            try:
+                self._stream.write("".join(batch))
+                self._stream.flush()
+
+                if self._publish is not None:
+                    for message in batch[:queued]:
+                        self._publish(message)
+            except Exception:
+                pass
+            finally:
+                for _ in range(queued):
+                    log_queue.task_done()
+
+    def flush(self, timeout: float = 2.0):
+        """
+        Aguarda a fila ser escrita, por até `timeout` segundos.
+        """
+        if self._pid != os.getpid():
+            return
+
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize() if self._pid == os.getpid() else 0,
+            "capacity": self._maxsize,
+            "overflow": "block" if self._block else "drop",
+            "dropped": self.dropped,
+            "dropped_by_level": dict(self.dropped_by_level),
+        }
+
+class SyncLogSink:
+    """
+    Escrita direta no stream, na thread de quem registra (LOG_ASYNC=False), repassando as mensagens a `publish`.
+    """
+
+    def __init__(self, stream, publish=None):
+        self._stream = stream
+        self._publish = publish
+
+    def __call__(self, message):
+        self._stream.write(message)
+        self._stream.flush()
+
+        if self._publish is not None:
+            self._publish(message)
+
+class LoggingControl:
+    """
+    Verbosidade do log em tempo de execução: nível global, níveis por dispositivo (`log_label`) e por protocolo,
+    e amostragem das mensagens de alto volume (loggers obtidos com `get_logger(__name__, sampled=True)`).
+    Dispositivos e protocolos com nível próprio não são amostrados.
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+                    cls._instance._sink = AsyncLogSink(sys.stdout, publish=log_bus.publish) if settings.LOG_ASYNC else SyncLogSink(sys.stdout, publish=log_bus.publish)
+                    cls._instance.diagnose = settings.LOG_DIAGNOSE
+                    cls._instance.backtrace = settings.LOG_BACKTRACE
+                    cls._instance._handler_id = None
+                    cls._instance._handler_level_no = None
+                    cls._instance.level = settings.LOG_LEVEL.upper()
+                    cls._instance._level_no = logger.level(cls._instance.level).no
+                    cls._instance.sample_every = settings.LOG_SAMPLE_EVERY
+                    cls._instance._device_rules = {}
+                    cls._instance._protocol_rules = {}
+                    cls._instance._device_levels = {}
+                    cls._instance._protocol_levels = {}
+                    cls._instance._sample_counters = {}
+                    cls._instance._protocol_by_module = {}
+                    cls._instance.sampled_out = 0
+
+        return cls._instance
+
+    @staticmethod
+    def _parse_level(level: str) -> tuple:
+        """
+        Retorna (nome, número) do nível. Lança ValueError para níveis desconhecidos.
+        """
+        name = str(level).upper()
+        return name, logger.level(name).no
+
+    def configure(
+        self, level: str | None = None, sample_every: int | None = None, devices: dict | None = None, protocols: dict | None = None,
+        diagnose: bool | None = None, backtrace: bool | None = None
+    ):
+        """
+        Altera a verbosidade. Em `devices` e `protocols`, um nível None remove a regra.
+        `diagnose` liga a exibição das variáveis de cada frame nas exceções e `backtrace` o rastro estendido
+        além do frame que capturou a exceção (caros; apenas para depuração).
+        Nada é alterado se algum nível for inválido.
+        """
+        parsed_level = self._parse_level(level) if level is not None else None
+        device_levels = {str(dev_id): self._parse_level(value) if value is not None else None for dev_id, value in (devices or {}).items()}
+        protocol_levels = {self._normalize_protocol(protocol): self._parse_level(value) if value is not None else None for protocol, value in (protocols or {}).items()}
+
+        if sample_every is not None and int(sample_every) < 1:
+            raise ValueError("sample_every deve ser maior ou igual a 1")
+
+        with self._lock:
+            if parsed_level:
+                self.level, self._level_no = parsed_level
+
+            if sample_every is not None:
+                self.sample_every = int(sample_every)
+
+            # Dicionários novos a cada alteração: o filtro lê sem lock
+            self._device_rules = self._merge_rules(self._device_rules, device_levels)
+            self._protocol_rules = self._merge_rules(self._protocol_rules, protocol_levels)
+            self._device_levels = {key: no for key, (_, no) in self._device_rules.items()}
+            self._protocol_levels = {key: no for key, (_, no) in self._protocol_rules.items()}
+
+            if diagnose is not None and bool(diagnose) != self.diagnose:
+                self.diagnose = bool(diagnose)
+                self._handler_level_no = None
+
+            if backtrace is not None and bool(backtrace) != self.backtrace:
+                self.backtrace = bool(backtrace)
+                self._handler_level_no = None
+
+            self._apply()
+
+    @staticmethod
+    def _merge_rules(current: dict, changes: dict) -> dict:
+        merged = dict(current)
+        for key, level in changes.items():
+            if level is None:
+                merged.pop(key, None)
+            else:
+                merged[key] = level
+
+        return merged
+
+    def set_sink(self, sink):
+        with self._lock:
+            self._sink = sink
+            self._handler_level_no = None
+            self._apply()
+
+    def _apply(self):
+        # O nível do handler é o menor entre as regras: o loguru descarta antes de montar o registro
+        # tudo que estiver abaixo dele, então o custo do nível global não muda sem regras mais verbosas
+        level_no = min([self._level_no, *self._device_levels.values(), *self._protocol_levels.values()])
+        if level_no == self._handler_level_no:
+            return
+
+        old_handler_id = self._handler_id
+        self._handler_id = logger.add(
+            self._sink,
+            level=level_no,
+            format=LOG_FORMAT,
+            filter=self._filter,
+            colorize=True,
+            backtrace=self.backtrace,
+            diagnose=self.diagnose
+        )
+        self._handler_level_no = level_no
+
+        if old_handler_id is not None:
+            logger.remove(old_handler_id)
+
+    @staticmethod
+    def _normalize_protocol(protocol: str) -> str:
+        # "J16X-J16" -> "j16x_j16", como no nome do pacote
+        return str(protocol).lower().replace("-", "_")
+
+    def _record_protocol(self, record) -> str | None:
+        protocol = record["extra"].get("protocol")
+        if protocol:
+            return self._normalize_protocol(protocol)
+
+        # Módulos dos protocolos de entrada: app.src.input.<protocolo>.<módulo>
+        name = record["name"]
+        protocol = self._protocol_by_module.get(name)
+        if protocol is None:
+            parts = name.split(".")
+            protocol = parts[3] if len(parts) > 4 and parts[:3] == ["app", "src", "input"] else ""
+            self._protocol_by_module[name] = protocol
+
+        return protocol
+
+    def _filter(self, record) -> bool:
+        level_no = record["level"].no
+        extra = record["extra"]
+
+        threshold = None
+        if self._device_levels:
+            threshold = self._device_levels.get(str(extra.get("log_label")))
+        if threshold is None and self._protocol_levels:
+            threshold = self._protocol_levels.get(self._record_protocol(record))
+        if threshold is not None:
+            return level_no >= threshold
+
+        if level_no < self._level_no:
+            return False
+
+        if self.sample_every > 1 and level_no < _WARNING_LEVEL_NO and extra.get("sampled"):
+            return self._sample((record["name"], record["line"]))
+
+        return True
+
+    def _sample(self, key: tuple) -> bool:
+        # Emite a primeira e depois uma a cada `sample_every` mensagens de cada ponto do código
+        count = self._sample_counters.get(key, 0)
+        self._sample_counters[key] = count + 1
+        if count % self.sample_every:
+            self.sampled_out += 1
+            return False
+
+        return True
+
+    def snapshot(self) -> dict:
+        return {
+            "level": self.level,
+            "sample_every": self.sample_every,
+            "devices": {dev_id: name for dev_id, (name, _) in self._device_rules.items()},
+            "protocols": {protocol: name for protocol, (name, _) in self._protocol_rules.items()},
+            "sampled_out": self.sampled_out,
+            "diagnose": self.diagnose,
+            "backtrace": self.backtrace,
+            "sink": self._sink.stats() if isinstance(self._sink, AsyncLogSink) else None,
+            "bus": log_bus.stats(),
+        }
+
+    def flush(self):
+        if isinstance(self._sink, AsyncLogSink):
+            self._sink.flush()
 
 # Remove o handler padrão para evitar logs duplicados
 logger.remove()
 
-# Adiciona um novo "sink" para o stdout com um formato mais rico e colorido
-logger.add(
-    sys.stdout,
-    level=settings.LOG_LEVEL.upper(),
-    format="<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | "
-           "<level>{level}</level> | "
-           "<yellow>[{extra[log_label]}]</yellow> |"
-           "<cyan>{name}:{function}:{line}</cyan> - <level>{message}</level>",
-    colorize=True,
-    backtrace=True,
-    diagnose=True
-)
+logging_control = LoggingControl()
+logging_control.configure(devices=settings.LOG_DEVICE_LEVELS, protocols=settings.LOG_PROTOCOL_LEVELS)
+
+# Escreve o que ainda estiver na fila do sink assíncrono ao encerrar o processo
+atexit.register(logging_control.flush)
+
+class _SampledLogger:
+    """
+    Logger das mensagens de alto volume. O loguru formata a mensagem (inclusive os argumentos `lazy`) antes de
+    qualquer filtro, então o nível e a amostragem de trace/debug/info/success são decididos aqui, antes de chamá-lo:
+    mensagens descartadas não custam formatação. Os demais métodos são os do logger Loguru.
+    """
+
+    def __init__(self, name: str):
+        self._logger = logger.bind(name=name, sampled=True)
+        # depth=2: o registro aponta para quem chamou debug/info, não para este wrapper
+        self._emit_sampled = self._logger.opt(depth=2)
+        self._emit = logger.bind(name=name).opt(depth=2)
 
-def get_logger(name: str):
+    def __getattr__(self, attr):
+        return getattr(self._logger, attr)
+
+    def _log(self, level: str, level_no: int, message: str, args: tuple, kwargs: dict):
+        control = logging_control
+        if control._device_levels or control._protocol_levels:
+            # Regras por dispositivo/protocolo dependem do log_label do contexto: a decisão fica com o filtro
+            self._emit_sampled.log(level, message, *args, **kwargs)
+            return
+
+        if level_no < control._level_no:
+            return
+
+        if control.sample_every > 1:
+            frame = sys._getframe(2)
+            if not control._sample((frame.f_globals["__name__"], frame.f_lineno)):
+                return
+
+        self._emit.log(level, message, *args, **kwargs)
+
+    def trace(self, message: str, *args, **kwargs):
+        self._log("TRACE", 5, message, args, kwargs)
+
+    def debug(self, message: str, *args, **kwargs):
+        self._log("DEBUG", 10, message, args, kwargs)
+
+    def info(self, message: str, *args, **kwargs):
+        self._log("INFO", 20, message, args, kwargs)
+
+    def success(self, message: str, *args, **kwargs):
+        self._log("SUCCESS", 25, message, args, kwargs)
+
+def get_logger(name: str, sampled: bool = False):
     """
     Retorna uma instância do logger Loguru com o nome do módulo associado.
+    Com `sampled=True`, as mensagens abaixo de WARNING são amostradas (LOG_SAMPLE_EVERY).
     """
-    return logger.bind(name=name)
\ No newline at end of file
+    if sampled:
+        return _SampledLogger(name)
+
+    return logger.bind(name=name)
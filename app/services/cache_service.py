@@ -10,4 +10,23 @@ def get_cache():
 
     cache = diskcache.Cache(settings.CACHE_DIR)
 
-    return cache
\ No newline at end of file
+    return cache
+
+_buffer_stores = {}
+
+def get_buffer_store() -> diskcache.FanoutCache:
+    """
+    Armazenamento dos buffers do histórico, compartilhado pelos workers de histórico e pela leitura da API.
+    Particionado em HISTORY_BUFFER_SHARDS bancos SQLite (por hash da chave), para que escritores concorrentes
+    não disputem o lock de um único arquivo. Uma instância por processo, pois as conexões não atravessam fork.
+    """
+    pid = os.getpid()
+    store = _buffer_stores.get(pid)
+    if store is None:
+        directory = os.path.join(settings.CACHE_DIR, "history_buffers")
+        os.makedirs(directory, exist_ok=True)
+
+        store = diskcache.FanoutCache(directory, shards=settings.HISTORY_BUFFER_SHARDS, timeout=settings.HISTORY_BUFFER_TIMEOUT)
+        _buffer_stores[pid] = store
+
+    return store
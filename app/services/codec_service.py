@@ -0,0 +1,180 @@
+import struct
+import threading
+import time
+import zlib
+
+from app.services.redis_service import get_redis
+from app.core.logger import get_logger
+from app.config.settings import settings
+
+logger = get_logger(__name__)
+
+# Blobs com dicionário: MAGIC + versão do dicionário (uint32) + stream zlib.
+# Blobs sem o prefixo são zlib puro (formato original), e continuam legíveis.
+ZDICT_MAGIC = b"\x01ZD"
+_ZDICT_HEADER = struct.Struct(">3sI")
+
+DICTIONARIES_KEY = "codec:dictionaries"
+CURRENT_DICTIONARY_KEY = "codec:dictionary:current"
+
+class ZlibCodec:
+    """
+    zlib sem dicionário. É o formato original dos blobs de histórico.
+    """
+    name = "zlib"
+
+    def __init__(self, level: int = 6):
+        self.level = level
+
+    def encode(self, data: bytes) -> bytes:
+        return zlib.compress(data, self.level)
+
+    def decode(self, blob: bytes) -> bytes:
+        return zlib.decompress(blob)
+
+class ZdictCodec:
+    """
+    zlib com dicionário pré-definido (`zdict`), treinado a partir de pacotes reais.
+    Cada blob carrega a versão do dicionário usado, permitindo trocar o dicionário sem reescrever dados antigos.
+    """
+    name = "zdict"
+
+    def __init__(self, version: int, zdict: bytes, level: int = 6):
+        self.version = version
+        self.zdict = zdict
+        self.level = level
+        self._header = _ZDICT_HEADER.pack(ZDICT_MAGIC, version)
+
+    def encode(self, data: bytes) -> bytes:
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, zlib.MAX_WBITS, 9, zlib.Z_DEFAULT_STRATEGY, self.zdict)
+        return self._header + compressor.compress(data) + compressor.flush()
+
+    def decode(self, blob: bytes) -> bytes:
+        decompressor = zlib.decompressobj(zlib.MAX_WBITS, self.zdict)
+        return decompressor.decompress(blob[_ZDICT_HEADER.size:]) + decompressor.flush()
+
+def train_dictionary(samples: list, size: int | None = None, shape_size: int = 48) -> bytes:
+    """
+    Treina um dicionário zlib a partir de amostras (bytes).
+    Pacotes inteiros funcionam melhor que substrings frequentes: preservam o contexto em que cada campo aparece.
+    As amostras são agrupadas pelo formato (seus primeiros `shape_size` bytes) e escolhidas alternando entre os grupos,
+    para que todo tipo de pacote esteja representado; os grupos mais frequentes ficam no final do dicionário,
+    mais próximos dos dados e com distâncias menores.
+    """
+    size = size or settings.CODEC_ZDICT_SIZE
+
+    groups = {}
+    for sample in samples:
+        groups.setdefault(sample[:shape_size], []).append(sample)
+
+    # Do grupo mais frequente para o menos frequente
+    ordered_groups = sorted(groups.values(), key=len, reverse=True)
+
+    chosen = []
+    total = 0
+    for round_index in range(max((len(group) for group in ordered_groups), default=0)):
+        for group in ordered_groups:
+            if round_index >= len(group):
+                continue
+
+            sample = group[round_index]
+            if total + len(sample) > size:
+                return b"".join(reversed(chosen))
+
+            chosen.append(sample)
+            total += len(sample)
+
+    return b"".join(reversed(chosen))
+
+class CodecRegistry:
+    """
+    Resolve o codec de escrita (CODEC_DEFAULT) e o codec de leitura de cada blob.
+    Os dicionários ficam versionados no Redis e são mantidos em memória após o primeiro uso;
+    a versão corrente é reconsultada a cada CODEC_DICTIONARY_REFRESH segundos.
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+                    cls._instance._zlib = ZlibCodec()
+                    cls._instance._zdict_codecs = {}
+                    cls._instance._current_version = None
+                    cls._instance._current_checked_at = 0.0
+
+        return cls._instance
+
+    def encoder(self):
+        if settings.CODEC_DEFAULT != ZdictCodec.name:
+            return self._zlib
+
+        version = self.get_current_version()
+        if version is None:
+            # Sem dicionário treinado ainda
+            return self._zlib
+
+        return self._get_zdict_codec(version) or self._zlib
+
+    def encode(self, data: bytes) -> bytes:
+        return self.encoder().encode(data)
+
+    def decode(self, blob: bytes) -> bytes:
+        if blob[:len(ZDICT_MAGIC)] != ZDICT_MAGIC:
+            return self._zlib.decode(blob)
+
+        _, version = _ZDICT_HEADER.unpack_from(blob)
+        codec = self._get_zdict_codec(version)
+        if codec is None:
+            raise ValueError(f"Dicionário de compressão versão {version} não encontrado")
+
+        return codec.decode(blob)
+
+    def publish_dictionary(self, zdict: bytes) -> int:
+        """
+        Armazena um novo dicionário no Redis e o torna o corrente. Retorna a versão criada.
+        As versões antigas são mantidas, pois ainda decodificam dados gravados com elas.
+        """
+        redis_client = get_redis(decode_responses=False)
+
+        version = redis_client.incr(f"{CURRENT_DICTIONARY_KEY}:seq")
+        pipe = redis_client.pipeline()
+        pipe.hset(DICTIONARIES_KEY, version, zdict)
+        pipe.set(CURRENT_DICTIONARY_KEY, version)
+        pipe.execute()
+
+        self._zdict_codecs[version] = ZdictCodec(version, zdict)
+        self._current_version = version
+        self._current_checked_at = time.monotonic()
+
+        logger.info(f"Novo dicionário de compressão publicado: versão={version}, tamanho={len(zdict)} bytes")
+        return version
+
+    def get_current_version(self) -> int | None:
+        now = time.monotonic()
+        if now - self._current_checked_at >= settings.CODEC_DICTIONARY_REFRESH:
+            self._current_checked_at = now
+            try:
+                version = get_redis(decode_responses=False).get(CURRENT_DICTIONARY_KEY)
+                self._current_version = int(version) if version else None
+            except Exception as e:
+                logger.error(f"Erro ao consultar a versão corrente do dicionário de compressão: {e}")
+
+        return self._current_version
+
+    def _get_zdict_codec(self, version: int):
+        codec = self._zdict_codecs.get(version)
+        if codec is not None:
+            return codec
+
+        zdict = get_redis(decode_responses=False).hget(DICTIONARIES_KEY, version)
+        if zdict is None:
+            return None
+
+        codec = ZdictCodec(version, zdict)
+        self._zdict_codecs[version] = codec
+        return codec
+
+codec_registry = CodecRegistry()
@@ -0,0 +1,232 @@
+import mmap
+import os
+import struct
+import threading
+import zlib
+from contextlib import contextmanager
+from urllib.parse import quote, unquote
+
+from app.core.logger import get_logger
+from app.config.settings import settings
+
+logger = get_logger(__name__)
+
+# Arquivo de índice: cabeçalho (MAGIC, geração do arquivo de dados) seguido de entradas
+# (offset, tamanho, tamanho do seg_id, seg_id), na ordem em que os segmentos foram gravados (do mais antigo ao mais novo).
+_INDEX_HEADER = struct.Struct(">4sI")
+_INDEX_MAGIC = b"HIDX"
+_INDEX_ENTRY = struct.Struct(">QIH")
+
+# Limite do nome escapado do dispositivo, com folga para a geração e a extensão (255 bytes por nome na maioria dos sistemas de arquivos)
+_MAX_FILE_NAME = 200
+
+class ColdSegmentReader:
+    """
+    Leitura dos segmentos frios de um dispositivo. Os blobs são fatiados do arquivo de dados mapeado em memória.
+    """
+
+    def __init__(self, entries: list, data: mmap.mmap | None):
+        self._entries = {seg_id: (offset, size) for seg_id, offset, size in entries}
+        self._data = data
+
+        # Do mais novo para o mais antigo, como no índice do Redis
+        self.seg_ids = [seg_id for seg_id, _, _ in reversed(entries)]
+
+    def get(self, seg_id: str) -> bytes | None:
+        location = self._entries.get(seg_id)
+        if location is None or self._data is None:
+            return None
+
+        offset, size = location
+        return self._data[offset:offset + size]
+
+    def close(self):
+        if self._data is not None:
+            self._data.close()
+
+class ColdSegmentStore:
+    """
+    Camada fria do histórico: segmentos já comprimidos, guardados em disco por dispositivo.
+
+    Cada dispositivo tem um arquivo de dados (blobs concatenados, somente-adição) e um arquivo de índice.
+    Novos segmentos são adicionados ao final dos dois arquivos; reescritas (descarte e compactação) geram
+    um novo arquivo de dados (nova geração) e substituem o índice atomicamente, sem bloquear leitores.
+    Apenas o worker de histórico do shard do dispositivo escreve nos arquivos dele.
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+
+        return cls._instance
+
+    @property
+    def base_dir(self) -> str:
+        return os.path.join(settings.CACHE_DIR, "history_cold")
+
+    def _device_dir(self, dev_id: str) -> str:
+        shard = zlib.crc32(str(dev_id).encode()) % 256
+        return os.path.join(self.base_dir, f"{shard:02x}")
+
+    @staticmethod
+    def _file_name(dev_id: str) -> str:
+        """
+        Nome de arquivo do dispositivo. O dev_id vem do payload do rastreador (ex.: ESN satelital), então tudo
+        além de letras, dígitos e "_.-~" é escapado (reversível em `devices`): nada de separadores de caminho.
+        """
+        name = quote(str(dev_id), safe="")
+        if not name or name in (".", "..") or len(name) > _MAX_FILE_NAME:
+            raise ValueError(f"dev_id inválido para a camada fria: {dev_id!r}")
+
+        return name
+
+    def _index_path(self, dev_id: str) -> str:
+        return os.path.join(self._device_dir(dev_id), f"{self._file_name(dev_id)}.idx")
+
+    def _data_path(self, dev_id: str, generation: int) -> str:
+        return os.path.join(self._device_dir(dev_id), f"{self._file_name(dev_id)}-{generation}.seg")
+
+    def _read_index(self, dev_id: str) -> tuple:
+        """
+        Retorna a geração do arquivo de dados e as entradas (seg_id, offset, tamanho), do mais antigo ao mais novo.
+        """
+        try:
+            with open(self._index_path(dev_id), "rb") as f:
+                raw = f.read()
+        except FileNotFoundError:
+            return None, []
+
+        magic, generation = _INDEX_HEADER.unpack_from(raw)
+        if magic != _INDEX_MAGIC:
+            raise ValueError(f"Índice frio inválido para {dev_id}")
+
+        entries = []
+        offset = _INDEX_HEADER.size
+        while offset + _INDEX_ENTRY.size <= len(raw):
+            data_offset, size, seg_id_size = _INDEX_ENTRY.unpack_from(raw, offset)
+            offset += _INDEX_ENTRY.size
+
+            # Entrada parcial (escrita em andamento)
+            if offset + seg_id_size > len(raw):
+                break
+
+            entries.append((raw[offset:offset + seg_id_size].decode(), data_offset, size))
+            offset += seg_id_size
+
+        return generation, entries
+
+    @contextmanager
+    def reader(self, dev_id: str):
+        entries, data = [], None
+
+        # O arquivo de dados pode ser trocado por uma reescrita entre a leitura do índice e a abertura
+        for _ in range(3):
+            generation, entries = self._read_index(dev_id)
+            if generation is None:
+                break
+
+            try:
+                with open(self._data_path(dev_id, generation), "rb") as f:
+                    if os.fstat(f.fileno()).st_size:
+                        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                break
+            except FileNotFoundError:
+                entries = []
+
+        reader = ColdSegmentReader(entries, data)
+        try:
+            yield reader
+        finally:
+            reader.close()
+
+    def append(self, dev_id: str, segments: list):
+        """
+        Adiciona segmentos [(seg_id, blob)], do mais antigo ao mais novo.
+        """
+        if not segments:
+            return
+
+        os.makedirs(self._device_dir(dev_id), exist_ok=True)
+
+        generation, _ = self._read_index(dev_id)
+        if generation is None:
+            generation = 0
+            with open(self._index_path(dev_id), "wb") as f:
+                f.write(_INDEX_HEADER.pack(_INDEX_MAGIC, generation))
+
+        index_entries = []
+        with open(self._data_path(dev_id, generation), "ab") as f:
+            offset = f.seek(0, os.SEEK_END)
+            for seg_id, blob in segments:
+                f.write(blob)
+                seg_id_bytes = seg_id.encode()
+                index_entries.append(_INDEX_ENTRY.pack(offset, len(blob), len(seg_id_bytes)) + seg_id_bytes)
+                offset += len(blob)
+
+            f.flush()
+
+        # Índice atualizado só depois dos dados: leitores nunca enxergam uma entrada sem o blob
+        with open(self._index_path(dev_id), "ab") as f:
+            f.write(b"".join(index_entries))
+
+    def rewrite(self, dev_id: str, segments: list):
+        """
+        Substitui todos os segmentos do dispositivo por [(seg_id, blob)], do mais antigo ao mais novo.
+        """
+        old_generation, _ = self._read_index(dev_id)
+        if not segments:
+            self.delete(dev_id)
+            return
+
+        os.makedirs(self._device_dir(dev_id), exist_ok=True)
+        generation = (old_generation or 0) + 1
+
+        index = [_INDEX_HEADER.pack(_INDEX_MAGIC, generation)]
+        offset = 0
+        with open(self._data_path(dev_id, generation), "wb") as f:
+            for seg_id, blob in segments:
+                f.write(blob)
+                seg_id_bytes = seg_id.encode()
+                index.append(_INDEX_ENTRY.pack(offset, len(blob), len(seg_id_bytes)) + seg_id_bytes)
+                offset += len(blob)
+
+        tmp_index_path = self._index_path(dev_id) + ".tmp"
+        with open(tmp_index_path, "wb") as f:
+            f.write(b"".join(index))
+        os.replace(tmp_index_path, self._index_path(dev_id))
+
+        if old_generation is not None:
+            # Leitores com o arquivo antigo já mapeado continuam lendo normalmente
+            try:
+                os.remove(self._data_path(dev_id, old_generation))
+            except FileNotFoundError:
+                pass
+
+    def delete(self, dev_id: str):
+        generation, _ = self._read_index(dev_id)
+        for path in (self._index_path(dev_id), self._data_path(dev_id, generation or 0)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def devices(self):
+        """
+        Itera os dev_ids com histórico frio.
+        """
+        if not os.path.isdir(self.base_dir):
+            return
+
+        for shard_dir in os.scandir(self.base_dir):
+            if not shard_dir.is_dir():
+                continue
+
+            for entry in os.scandir(shard_dir.path):
+                if entry.name.endswith(".idx"):
+                    yield unquote(entry.name.removesuffix(".idx"))
+
+cold_segment_store = ColdSegmentStore()
@@ -0,0 +1,141 @@
+import heapq
+import itertools
+import threading
+import time
+from typing import Callable, Hashable
+
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+class _Timer:
+    __slots__ = ("deadline", "callback", "seq", "heap_deadline")
+
+    def __init__(self, deadline: float, callback: Callable[[], None], seq: int):
+        self.deadline = deadline
+        self.callback = callback
+        # Identificação e prazo da entrada viva desse timer no heap
+        self.seq = seq
+        self.heap_deadline = deadline
+
+class ExpiryService:
+    """
+    Serviço de expiração baseado em heap, com uma única thread.
+
+    - `schedule` agenda (ou reagenda) uma chave em O(log n);
+    - `touch` adia o vencimento de uma chave já agendada em O(1), sem lock e sem crescer o heap:
+      a entrada no heap é reposicionada apenas quando seu prazo antigo é atingido;
+    - `cancel` remove a chave em O(1), a entrada do heap é descartada ao ser retirada.
+
+    Os callbacks rodam na thread do serviço, fora do lock, e não devem bloquear: um callback lento atrasa
+    todas as expirações do processo. Trabalho que aguarda locks ou rede deve ser repassado a outra thread.
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+                    cls._instance._timers = {}
+                    cls._instance._heap = []
+                    cls._instance._seq = itertools.count()
+                    cls._instance._cond = threading.Condition()
+                    threading.Thread(target=cls._instance._run, daemon=True).start()
+
+        return cls._instance
+
+    def schedule(self, key: Hashable, delay: float, callback: Callable[[], None]):
+        deadline = time.monotonic() + delay
+
+        with self._cond:
+            timer = self._timers.get(key)
+
+            # Prazo mais longo que a entrada atual do heap: basta atualizar o timer
+            if timer is not None and deadline >= timer.heap_deadline:
+                timer.deadline = deadline
+                timer.callback = callback
+                return
+
+            timer = _Timer(deadline, callback, next(self._seq))
+            self._timers[key] = timer
+            heapq.heappush(self._heap, (deadline, timer.seq, key))
+
+            if self._heap[0][1] == timer.seq:
+                self._cond.notify()
+
+    def touch(self, key: Hashable, delay: float) -> bool:
+        """
+        Adia o vencimento de `key` para daqui a `delay` segundos. Retorna False se a chave não está agendada.
+
+        Chamado a cada recv de cada conexão, por isso não usa o lock: apenas grava o novo prazo no timer, e a
+        thread do serviço o confere quando a entrada do heap vence. Um touch concorrente com o vencimento pode
+        chegar tarde demais, como se tivesse acontecido logo após a expiração.
+        """
+        timer = self._timers.get(key)
+        if timer is None:
+            return False
+
+        deadline = time.monotonic() + delay
+        if deadline > timer.deadline:
+            timer.deadline = deadline
+        return True
+
+    def cancel(self, key: Hashable) -> bool:
+        with self._cond:
+            removed = self._timers.pop(key, None) is not None
+
+            # Compacta o heap quando as entradas obsoletas dominam, mantendo-o proporcional às chaves vivas
+            if len(self._heap) > 2 * len(self._timers) + 1024:
+                self._heap = [entry for entry in self._heap if (timer := self._timers.get(entry[2])) is not None and timer.seq == entry[1]]
+                heapq.heapify(self._heap)
+
+            return removed
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._timers
+
+    def __len__(self) -> int:
+        return len(self._timers)
+
+    def _run(self):
+        with logger.contextualize(log_label="EXPIRY SERVICE"):
+            while True:
+                due = []
+
+                with self._cond:
+                    while not self._heap:
+                        self._cond.wait()
+
+                    deadline, seq, key = self._heap[0]
+                    now = time.monotonic()
+                    if deadline > now:
+                        self._cond.wait(deadline - now)
+                        continue
+
+                    while self._heap and self._heap[0][0] <= now:
+                        deadline, seq, key = heapq.heappop(self._heap)
+                        timer = self._timers.get(key)
+
+                        # Entrada obsoleta (chave cancelada ou reagendada)
+                        if timer is None or timer.seq != seq:
+                            continue
+
+                        # Chave adiada via touch: reposiciona no heap
+                        if timer.deadline > now:
+                            timer.seq = next(self._seq)
+                            timer.heap_deadline = timer.deadline
+                            heapq.heappush(self._heap, (timer.deadline, timer.seq, key))
+                            continue
+
+                        del self._timers[key]
+                        due.append((key, timer.callback))
+
+                for key, callback in due:
+                    try:
+                        callback()
+                    except Exception:
+                        logger.exception(f"Erro ao executar callback de expiração key={key}")
+
+expiry_service = ExpiryService()
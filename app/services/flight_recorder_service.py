@@ -0,0 +1,174 @@
+import struct
+import threading
+import time
+from collections import OrderedDict, deque
+
+from app.config.settings import settings
+
+# Tipos de evento
+INBOUND = 1     # Bytes recebidos do rastreador (cada recv)
+TO_DEVICE = 2   # Bytes enviados ao rastreador (ACKs e comandos)
+OUTBOUND = 3    # Pacote traduzido enviado ao servidor principal
+UPSTREAM = 4    # Bytes recebidos do servidor principal (comandos)
+
+EVENT_NAMES = {INBOUND: "inbound", TO_DEVICE: "to_device", OUTBOUND: "outbound", UPSTREAM: "upstream"}
+
+# Etapas cronometradas de cada evento (segundos):
+#   process: processamento do recv (enquadramento, decodificação e encaminhamento) até o próximo recv
+#   build, history, session: construção do pacote de saída, envio ao histórico e obtenção da sessão de saída
+#   send: escrita no socket
+#   map, route: tradução do comando do servidor principal e entrega ao builder do protocolo de entrada
+STAGES = ("process", "build", "history", "session", "send", "map", "route")
+_STAGE_IDS = {stage: index for index, stage in enumerate(STAGES)}
+
+# Exportação no formato pcap clássico (legível pelo Wireshark/tcpdump), com LINKTYPE_USER0.
+# Cada pacote começa com um pseudo-cabeçalho: MAGIC "FR", tipo do evento, quantidade de etapas,
+# e para cada etapa (id em STAGES, duração em microssegundos). Em seguida vêm os bytes do evento.
+PCAP_LINKTYPE_USER0 = 147
+_PCAP_GLOBAL_HEADER = struct.Struct("<IHHiIII")
+_PCAP_RECORD_HEADER = struct.Struct("<IIII")
+_EVENT_HEADER = struct.Struct(">2sBB")
+_EVENT_STAGE = struct.Struct(">BI")
+_EVENT_MAGIC = b"FR"
+
+class FlightRecorder:
+    """
+    Gravador de bordo por dispositivo: um buffer circular (FLIGHT_RECORDER_EVENTS) com os últimos bytes
+    trocados com o rastreador e com o servidor principal, e o tempo gasto em cada etapa.
+    Registrar um evento é apenas anexar uma tupla (os bytes não são copiados nem formatados);
+    dispositivos sem tráfego não custam nada. Apenas os FLIGHT_RECORDER_MAX_DEVICES dispositivos
+    gravados mais recentemente são mantidos.
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+                    # Em ordem de uso: o primeiro é o gravado há mais tempo
+                    cls._instance._recorders = OrderedDict()
+
+        return cls._instance
+
+    def record(self, dev_id: str, kind: int, data: bytes, timings: dict | None = None):
+        """
+        Registra um evento. `timings` pode ser preenchido depois (ex.: duração do processamento de um recv).
+        """
+        if not settings.FLIGHT_RECORDER_ENABLED or not dev_id:
+            return
+
+        ring = self._recorders.get(dev_id)
+        if ring is None:
+            ring = self._new_recorder(dev_id)
+        else:
+            try:
+                self._recorders.move_to_end(dev_id)
+            except KeyError:
+                # Descartado por outra thread entre o get e o move_to_end
+                pass
+
+        ring.append((time.time(), kind, data, timings))
+
+    def _new_recorder(self, dev_id: str) -> deque:
+        with self._lock:
+            ring = self._recorders.get(dev_id)
+            if ring is None:
+                ring = deque(maxlen=settings.FLIGHT_RECORDER_EVENTS)
+                self._recorders[dev_id] = ring
+
+                # Descartando os gravadores usados há mais tempo
+                while len(self._recorders) > settings.FLIGHT_RECORDER_MAX_DEVICES:
+                    self._recorders.popitem(last=False)
+
+            return ring
+
+    def events(self, dev_id: str) -> list:
+        ring = self._recorders.get(str(dev_id))
+        if not ring:
+            return []
+
+        # O buffer pode receber eventos durante a cópia
+        for _ in range(10):
+            try:
+                return list(ring)
+            except RuntimeError:
+                continue
+
+        return []
+
+    def dump(self, dev_id: str) -> list:
+        """
+        Eventos do dispositivo, do mais antigo ao mais novo, com bytes em hex e durações em milissegundos.
+        """
+        dumped = []
+        for timestamp, kind, data, timings in self.events(dev_id):
+            dumped.append({
+                "timestamp": timestamp,
+                "direction": EVENT_NAMES.get(kind, kind),
+                "size": len(data),
+                "data": data.hex(),
+                "timings_ms": {stage: round(duration * 1000, 3) for stage, duration in (timings or {}).items()},
+            })
+
+        return dumped
+
+    def export_pcap(self, dev_id: str) -> bytes:
+        chunks = [_PCAP_GLOBAL_HEADER.pack(0xA1B2C3D4, 2, 4, 0, 0, 65535, PCAP_LINKTYPE_USER0)]
+
+        for timestamp, kind, data, timings in self.events(dev_id):
+            stages = [(stage, duration) for stage, duration in (timings or {}).items() if stage in _STAGE_IDS]
+            payload = _EVENT_HEADER.pack(_EVENT_MAGIC, kind, len(stages))
+            payload += b"".join(_EVENT_STAGE.pack(_STAGE_IDS[stage], min(int(duration * 1e6), 0xFFFFFFFF)) for stage, duration in stages)
+            payload += data
+
+            seconds = int(timestamp)
+            chunks.append(_PCAP_RECORD_HEADER.pack(seconds, int((timestamp - seconds) * 1e6), len(payload), len(payload)))
+            chunks.append(payload)
+
+        return b"".join(chunks)
+
+    def forget(self, dev_id: str):
+        with self._lock:
+            self._recorders.pop(str(dev_id), None)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": settings.FLIGHT_RECORDER_ENABLED,
+            "devices": len(self._recorders),
+            "events_per_device": settings.FLIGHT_RECORDER_EVENTS,
+        }
+
+def read_pcap(data: bytes) -> list:
+    """
+    Lê um arquivo exportado por `export_pcap`. Retorna [(timestamp, tipo, bytes, {etapa: segundos})].
+    """
+    magic, _, _, _, _, _, linktype = _PCAP_GLOBAL_HEADER.unpack_from(data)
+    if magic != 0xA1B2C3D4 or linktype != PCAP_LINKTYPE_USER0:
+        raise ValueError("Arquivo não é uma gravação do flight recorder")
+
+    events = []
+    offset = _PCAP_GLOBAL_HEADER.size
+    while offset + _PCAP_RECORD_HEADER.size <= len(data):
+        seconds, microseconds, length, _ = _PCAP_RECORD_HEADER.unpack_from(data, offset)
+        offset += _PCAP_RECORD_HEADER.size
+        payload = data[offset:offset + length]
+        offset += length
+
+        event_magic, kind, stage_count = _EVENT_HEADER.unpack_from(payload)
+        if event_magic != _EVENT_MAGIC:
+            raise ValueError("Evento inválido na gravação do flight recorder")
+
+        position = _EVENT_HEADER.size
+        timings = {}
+        for _ in range(stage_count):
+            stage_id, duration = _EVENT_STAGE.unpack_from(payload, position)
+            timings[STAGES[stage_id]] = duration / 1e6
+            position += _EVENT_STAGE.size
+
+        events.append((seconds + microseconds / 1e6, kind, payload[position:], timings))
+
+    return events
+
+flight_recorder = FlightRecorder()
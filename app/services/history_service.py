@@ -1,161 +1,931 @@
+import atexit
 import json
+import math
+import os
+import struct
+import threading
 import zlib
 import time
 import multiprocessing
-from diskcache import Cache
+import uuid
+from diskcache import Cache, FanoutCache
 
 from app.services.redis_service import get_redis
+from app.services.cache_service import get_buffer_store
+from app.services.codec_service import codec_registry, train_dictionary
+from app.services.cold_storage_service import cold_segment_store
 from app.core.logger import get_logger
 from app.config.settings import settings
 
 logger = get_logger(__name__)
 redis_client = get_redis()
 
-def add_packet_to_history(dev_id: str, raw_packet_hex: str, translated_packet: str):
+class HistoryEnqueuer:
     """
-    Função leve: Apenas coloca os dados na fila para processamento assíncrono.
+    Acumula, em memória, os pacotes de histórico de todas as threads dos handlers e os envia à fila
+    com um único pipeline de RPUSH (um comando com vários valores por fila) a cada HISTORY_ENQUEUE_INTERVAL
+    segundos ou ao atingir HISTORY_ENQUEUE_BATCH_SIZE itens.
+    A serialização e a ida ao Redis saem do caminho do pacote. O lote pendente é enviado ao encerrar o processo.
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+                    cls._instance._pending = []
+                    cls._instance._cond = threading.Condition()
+                    cls._instance._pid = None
+                    cls._instance.dropped = 0
+                    atexit.register(cls._instance.flush)
+
+        return cls._instance
+
+    def add(self, dev_id: str, packet: dict):
+        # O tamanho do dev_id ocupa um byte no item da fila: rejeitado aqui, e não ao enviar o lote
+        if len(str(dev_id).encode('utf-8')) > MAX_DEV_ID_BYTES:
+            raise ValueError(f"dev_id com mais de {MAX_DEV_ID_BYTES} bytes")
+
+        with self._cond:
+            self._ensure_flusher()
+            self._pending.append((dev_id, packet))
+
+            # Acorda o flusher no início de um lote (para contar o intervalo) e quando o lote enche
+            if len(self._pending) == 1 or len(self._pending) >= settings.HISTORY_ENQUEUE_BATCH_SIZE:
+                self._cond.notify()
+
+    def flush(self):
+        """
+        Envia imediatamente tudo que está pendente.
+        """
+        with self._cond:
+            pending, self._pending = self._pending, []
+
+        if not pending:
+            return
+
+        # Cada item é serializado separadamente: um pacote inválido não descarta o lote dos outros dispositivos
+        grouped = {}
+        invalid = 0
+        for dev_id, packet in pending:
+            try:
+                grouped.setdefault(get_history_queue(dev_id), []).append(_encode_queue_item(dev_id, packet))
+            except Exception as e:
+                invalid += 1
+                logger.info(f"Pacote de histórico descartado para {dev_id}: {e}")
+
+        if invalid:
+            self._count_dropped(invalid)
+
+        if not grouped:
+            return
+
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            for queue, items in grouped.items():
+                pipe.rpush(queue, *items)
+            pipe.execute()
+
+        except Exception as e:
+            count = sum(len(items) for items in grouped.values())
+            self._count_dropped(count)
+            logger.info(f"Erro ao enfileirar {count} pacotes de histórico: {e}")
+
+    def _count_dropped(self, count: int):
+        # flush roda no flusher, no atexit e em quem o chamar diretamente: o contador é atualizado sob o lock do lote
+        with self._cond:
+            self.dropped += count
+
+    def _ensure_flusher(self):
+        # A thread é iniciada no primeiro uso de cada processo (processos filhos não herdam threads)
+        if self._pid == os.getpid():
+            return
+
+        self._pid = os.getpid()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+
+                deadline = time.monotonic() + settings.HISTORY_ENQUEUE_INTERVAL
+                while len(self._pending) < settings.HISTORY_ENQUEUE_BATCH_SIZE and (remaining := deadline - time.monotonic()) > 0:
+                    self._cond.wait(remaining)
+
+            self.flush()
+
+history_enqueuer = HistoryEnqueuer()
+
+def add_packet_to_history(dev_id: str, raw_packet: bytes | str, translated_packet: bytes | str, packet_type: str = None, alert_id: int = None):
+    """
+    Função leve: Apenas coloca os dados no lote em memória para envio assíncrono à fila.
     O retorno é imediato, liberando a API/Thread principal.
+    Pacotes binários devem ser passados como bytes (são guardados assim, e convertidos em hex apenas na API);
+    pacotes textuais (Suntech, JSON satelital) como str.
+    `packet_type` (um de PACKET_TYPES) e `alert_id` (universal_alert_id) alimentam o índice secundário do histórico.
     """
     try:
-        payload = {
-            "dev_id": dev_id,
-            "packet": {
-                "raw_packet": raw_packet_hex,
-                "translated_packet": translated_packet,
-                "timestamp": time.time()
-            }
-        }
-        redis_client.rpush(settings.HISTORY_SERVICE_QUEUE, json.dumps(payload))
+        # Apenas IDs numéricos de alerta são indexados
+        if not isinstance(alert_id, int) or not 0 <= alert_id < _NO_ALERT_ID:
+            alert_id = None
+
+        history_enqueuer.add(dev_id, {
+            "raw_packet": raw_packet,
+            "translated_packet": translated_packet,
+            "timestamp": time.time(),
+            "packet_type": packet_type,
+            "alert_id": alert_id,
+        })
 
     except Exception as e:
         logger.info(f"Erro ao enfileirar pacote para {dev_id}: {e}")
 
-def get_packet_history(dev_id: str, return_compressed: bool = False) -> list:
+# ====================================== Formato binário dos registros ======================================
+#
+# Registro: cabeçalho (timestamp float64, flags uint8, tipo do pacote uint8, universal_alert_id uint32,
+# tamanho do bruto uint32, tamanho do traduzido uint32) seguido dos dois pacotes.
+# As flags indicam quais campos são texto; os demais são binários.
+# Em memória, um campo texto é str e um campo binário é bytes.
+
+PACKET_TYPES = ("location", "alert", "heartbeat", "command_reply")
+
+_RECORD_HEADER = struct.Struct(">dBBIII")
+_RECORD_HEADER_V1 = struct.Struct(">dBII")
+_RAW_IS_TEXT = 0x01
+_TRANSLATED_IS_TEXT = 0x02
+_NO_ALERT_ID = 0xFFFFFFFF
+
+# Segmento: SEGMENT_MAGIC + registros concatenados. Segmentos sem o prefixo são JSON (formato anterior).
+SEGMENT_MAGIC = b"HREC\x02"
+SEGMENT_MAGIC_V1 = b"HREC\x01"
+
+# Itens da fila: QUEUE_ITEM_MAGIC + tamanho do dev_id + dev_id + registro.
+# Itens sem o prefixo começam direto pelo tamanho do dev_id e trazem registros V1.
+QUEUE_ITEM_MAGIC = b"\x00\x02"
+# O tamanho do dev_id é gravado em um byte
+MAX_DEV_ID_BYTES = 255
+
+def _to_record_field(value: bytes | str | None) -> tuple:
+    if value is None:
+        return b"", True
+    if isinstance(value, str):
+        return value.encode('utf-8'), True
+
+    return bytes(value), False
+
+def _encode_record(packet: dict) -> bytes:
+    raw, raw_is_text = _to_record_field(packet.get("raw_packet"))
+    translated, translated_is_text = _to_record_field(packet.get("translated_packet"))
+
+    flags = (_RAW_IS_TEXT if raw_is_text else 0) | (_TRANSLATED_IS_TEXT if translated_is_text else 0)
+    packet_type = packet.get("packet_type")
+    type_index = PACKET_TYPES.index(packet_type) + 1 if packet_type in PACKET_TYPES else 0
+    alert_id = packet.get("alert_id")
+    alert_id = int(alert_id) if alert_id is not None else _NO_ALERT_ID
+
+    return _RECORD_HEADER.pack(packet.get("timestamp", 0), flags, type_index, alert_id, len(raw), len(translated)) + raw + translated
+
+def _decode_record(data: bytes | memoryview, offset: int = 0, version: int = 2) -> tuple:
+    """
+    Decodifica o registro que começa em `offset`. Retorna o pacote e o offset do próximo registro.
+    """
+    if version == 1:
+        timestamp, flags, raw_size, translated_size = _RECORD_HEADER_V1.unpack_from(data, offset)
+        type_index, alert_id = 0, _NO_ALERT_ID
+        offset += _RECORD_HEADER_V1.size
+    else:
+        timestamp, flags, type_index, alert_id, raw_size, translated_size = _RECORD_HEADER.unpack_from(data, offset)
+        offset += _RECORD_HEADER.size
+
+    raw = bytes(data[offset:offset + raw_size])
+    offset += raw_size
+    translated = bytes(data[offset:offset + translated_size])
+    offset += translated_size
+
+    packet = {
+        "raw_packet": raw.decode('utf-8', errors='replace') if flags & _RAW_IS_TEXT else raw,
+        "translated_packet": translated.decode('utf-8', errors='replace') if flags & _TRANSLATED_IS_TEXT else translated,
+        "timestamp": timestamp,
+        "packet_type": PACKET_TYPES[type_index - 1] if type_index else None,
+        "alert_id": alert_id if alert_id != _NO_ALERT_ID else None,
+    }
+    return packet, offset
+
+def _encode_queue_item(dev_id: str, packet: dict) -> bytes:
+    dev_id_bytes = str(dev_id).encode('utf-8')
+    return QUEUE_ITEM_MAGIC + bytes([len(dev_id_bytes)]) + dev_id_bytes + _encode_record(packet)
+
+def _decode_queue_item(item: bytes) -> tuple:
+    # Itens enfileirados antes do formato binário
+    if item[:1] == b"{":
+        item = json.loads(item)
+        return item["dev_id"], item["packet"]
+
+    version = 1
+    if item.startswith(QUEUE_ITEM_MAGIC):
+        version = 2
+        item = item[len(QUEUE_ITEM_MAGIC):]
+
+    dev_id_size = item[0]
+    packet, _ = _decode_record(item, 1 + dev_id_size, version)
+    return item[1:1 + dev_id_size].decode('utf-8'), packet
+
+def render_packet(packet: dict) -> dict:
+    """
+    Representação do pacote para a API: campos binários em hex, campos texto como estão.
+    """
+    raw = packet.get("raw_packet")
+    translated = packet.get("translated_packet")
+    return {
+        "raw_packet": raw.hex() if isinstance(raw, bytes) else raw,
+        "translated_packet": translated.hex() if isinstance(translated, bytes) else translated,
+        "timestamp": packet.get("timestamp"),
+        "packet_type": packet.get("packet_type"),
+        "universal_alert_id": packet.get("alert_id"),
+    }
+
+def _history_keys(dev_id: str) -> tuple:
+    """
+    Chaves do histórico segmentado de um dispositivo:
+    - segments: hash seg_id -> segmento comprimido (lista de pacotes, do mais novo para o mais antigo)
+    - index: sorted set seg_id -> timestamp do pacote mais novo do segmento
+    """
+    return f"history:{dev_id}:segments", f"history:{dev_id}:index"
+
+def _encode_segment(packets: list) -> bytes:
+    return codec_registry.encode(SEGMENT_MAGIC + b"".join(_encode_record(packet) for packet in packets))
+
+def _decode_segment(blob: bytes) -> list:
+    payload = codec_registry.decode(blob)
+    if payload.startswith(SEGMENT_MAGIC):
+        version = 2
+    elif payload.startswith(SEGMENT_MAGIC_V1):
+        version = 1
+    else:
+        return json.loads(payload.decode('utf-8'))
+
+    packets = []
+    view = memoryview(payload)
+    offset = len(SEGMENT_MAGIC)
+    while offset < len(payload):
+        packet, offset = _decode_record(view, offset, version)
+        packets.append(packet)
+
+    return packets
+
+def _packet_samples(packets: list) -> list:
+    """
+    Conteúdo de cada pacote como aparece dentro do segmento, usado para treinar o dicionário.
+    O cabeçalho do registro fica de fora: começa pelo timestamp, único por pacote, e impediria
+    o agrupamento das amostras pelo formato do pacote em train_dictionary.
+    """
+    return [_encode_record(packet)[_RECORD_HEADER.size:] for packet in packets]
+
+def train_history_dictionary(max_samples: int | None = None) -> int | None:
+    """
+    Treina um novo dicionário de compressão com os segmentos mais recentes de vários dispositivos
+    e o publica como corrente. Retorna a versão criada, ou None se não houver amostras suficientes.
+    """
+    max_samples = max_samples or settings.HISTORY_ZDICT_TRAIN_SAMPLES
+    redis_client = get_redis(decode_responses=False)
+
+    samples = []
+    for index_key in redis_client.scan_iter("history:*:index", count=1000):
+        if len(samples) >= max_samples:
+            break
+
+        seg_ids = redis_client.zrevrange(index_key, 0, 0)
+        if not seg_ids:
+            continue
+
+        segments_key = index_key[:-len(b"index")] + b"segments"
+        blob = redis_client.hget(segments_key, seg_ids[0])
+        if not blob:
+            continue
+
+        try:
+            # Poucos pacotes por dispositivo, para o dicionário representar a frota e não um único rastreador
+            samples.extend(_packet_samples(_decode_segment(blob)[:50]))
+        except Exception:
+            continue
+
+    if len(samples) < 100:
+        logger.warning(f"Amostras insuficientes para treinar o dicionário de compressão ({len(samples)} pacotes).")
+        return None
+
+    return codec_registry.publish_dictionary(train_dictionary(samples[:max_samples]))
+
+# Acima disso, o segmento é marcado como podendo conter qualquer alerta ("*")
+_MAX_SEGMENT_ALERT_IDS = 16
+
+# Segmentos lidos por vez, do mais antigo, ao aparar a camada quente
+_TRIM_READ_SEGMENTS = 8
+
+# Os timestamps no ID do segmento (e a pontuação no índice) são arredondados para 6 casas decimais:
+# a poda por janela de tempo é alargada por essa margem para não descartar pacotes das bordas
+_SEGMENT_TS_MARGIN = 1e-6
+
+def _build_segment_id(packets: list) -> str:
+    """
+    O ID do segmento descreve o segmento:
+    "<ts mais antigo>-<ts mais novo>-<quantidade>-<sufixo único>-<máscara de tipos>-<alert ids>".
+    Assim o índice basta para decidir quais segmentos ler ou descartar, e quais podem conter pacotes
+    de um tipo ou alerta, sem descomprimir nada.
+    """
+    timestamps = [packet.get("timestamp", 0) for packet in packets]
+
+    type_mask = 0
+    alert_ids = set()
+    for packet in packets:
+        if packet.get("packet_type") in PACKET_TYPES:
+            type_mask |= 1 << PACKET_TYPES.index(packet["packet_type"])
+        if packet.get("alert_id") is not None:
+            alert_ids.add(str(packet["alert_id"]))
+
+    alerts = "*" if len(alert_ids) > _MAX_SEGMENT_ALERT_IDS else ".".join(sorted(alert_ids))
+    return f"{min(timestamps):.6f}-{max(timestamps):.6f}-{len(packets)}-{uuid.uuid4().hex[:8]}-{type_mask:x}-{alerts}"
+
+def _parse_segment_id(seg_id) -> tuple:
+    if isinstance(seg_id, bytes):
+        seg_id = seg_id.decode()
+
+    min_ts, max_ts, count = seg_id.split("-", 3)[:3]
+    return float(min_ts), float(max_ts), int(count)
+
+def _segment_may_contain(seg_id, packet_type: str | None, alert_id: int | None) -> bool:
+    """
+    Verifica, pelo ID, se o segmento pode conter pacotes do tipo e alerta procurados.
+    Segmentos gravados antes do índice secundário não têm essa informação e são sempre lidos.
+    """
+    if packet_type is None and alert_id is None:
+        return True
+
+    if isinstance(seg_id, bytes):
+        seg_id = seg_id.decode()
+
+    parts = seg_id.split("-")
+    if len(parts) < 6:
+        return True
+
+    if packet_type is not None and not int(parts[4], 16) & (1 << PACKET_TYPES.index(packet_type)):
+        return False
+    if alert_id is not None and parts[5] != "*" and str(alert_id) not in parts[5].split("."):
+        return False
+
+    return True
+
+def _select_segments(seg_ids: list, limit: int) -> list:
+    """
+    Dos IDs (do mais novo para o mais antigo), seleciona apenas os necessários para cobrir `limit` pacotes.
+    """
+    selected = []
+    total = 0
+    for seg_id in seg_ids:
+        if total >= limit:
+            break
+
+        selected.append(seg_id)
+        total += _parse_segment_id(seg_id)[2]
+
+    return selected
+
+def _read_legacy_history(redis_client, dev_id: str) -> list:
+    """
+    Lê o formato antigo (um único blob comprimido em `history:<dev_id>`), mantido até ser descartado pelo trim.
+    """
+    compressed_history = redis_client.get(f"history:{dev_id}")
+    if not compressed_history:
+        return []
+
+    try:
+        return _decode_segment(compressed_history)
+    except Exception:
+        logger.error(f"Houve um erro ao tentar descomprimir o histórico legado. Descartando histórico.")
+        return []
+
+def _read_disk_buffer(dev_id: str) -> list:
+    """
+    Lê, sem alterar, os pacotes do dispositivo que ainda estão no buffer em disco (em ordem de chegada).
+    """
+    return get_buffer_store().get(f"buffer:{dev_id}", default=[], retry=True)
+
+def parse_history_cursor(cursor: str | None) -> tuple:
+    """
+    Converte o cursor "<timestamp>:<pacotes já retornados com esse timestamp>" em (before, skip).
+    Cursores sem o desempate (formato anterior) continuam aceitos, exclusivos no timestamp como antes.
+    Levanta ValueError se o cursor for inválido.
+    """
+    if not cursor:
+        return None, 0
+
+    timestamp, separator, skip = str(cursor).partition(":")
+    before = float(timestamp)
+    if not math.isfinite(before):
+        raise ValueError(f"cursor inválido: {cursor}")
+
+    if not separator:
+        return math.nextafter(before, -math.inf), 0
+
+    skip = int(skip)
+    if skip < 0:
+        raise ValueError(f"cursor inválido: {cursor}")
+
+    return before, skip
+
+class _HistoryFilter:
+    """
+    Filtro de leitura: janela [since, until], até `before` (cursor), tipo de pacote e universal_alert_id.
+    Os primeiros `skip` pacotes com timestamp igual a `before` já foram retornados na página anterior e são pulados;
+    por isso `matches` deve ser chamado na ordem da leitura, do mais novo para o mais antigo.
+    """
+    __slots__ = ("since", "until", "before", "skip", "packet_type", "alert_id", "_upper")
+
+    def __init__(self, since=None, until=None, before=None, packet_type=None, alert_id=None, skip=0):
+        self.since = since
+        self.until = until
+        self.before = before
+        self.skip = skip
+        self.packet_type = packet_type
+        self.alert_id = alert_id
+        self._upper = min(bound for bound in (until, before, float("inf")) if bound is not None)
+
+    def matches(self, packet: dict) -> bool:
+        timestamp = packet.get("timestamp", 0)
+        if self.since is not None and timestamp < self.since:
+            return False
+        if self.until is not None and timestamp > self.until:
+            return False
+        if self.before is not None and timestamp > self.before:
+            return False
+        if self.packet_type is not None and packet.get("packet_type") != self.packet_type:
+            return False
+        if self.alert_id is not None and packet.get("alert_id") != self.alert_id:
+            return False
+
+        if self.skip and timestamp == self.before:
+            self.skip -= 1
+            return False
+
+        return True
+
+    def segment_may_match(self, seg_id) -> bool:
+        min_ts, max_ts, _ = _parse_segment_id(seg_id)
+        if min_ts - _SEGMENT_TS_MARGIN > self._upper or (self.since is not None and max_ts + _SEGMENT_TS_MARGIN < self.since):
+            return False
+
+        return _segment_may_contain(seg_id, self.packet_type, self.alert_id)
+
+def _collect_segments(seg_ids: list, fetch, history: list, limit: int, history_filter: _HistoryFilter):
+    """
+    Descomprime, dos segmentos `seg_ids` (do mais novo para o mais antigo), apenas os suficientes para completar
+    `limit` pacotes que passam no filtro, adicionando-os a `history`. `fetch` recebe uma lista de IDs e retorna os blobs.
+    """
+    seg_ids = [seg_id for seg_id in seg_ids if history_filter.segment_may_match(seg_id)]
+
+    while seg_ids and len(history) < limit:
+        # Apenas os segmentos suficientes para completar a página; os das bordas podem exigir mais uma rodada
+        selected = _select_segments(seg_ids, limit - len(history))
+        seg_ids = seg_ids[len(selected):]
+
+        for blob in fetch(selected):
+            if not blob:
+                continue
+
+            try:
+                history.extend(packet for packet in _decode_segment(blob) if history_filter.matches(packet))
+            except Exception:
+                logger.error(f"Houve um erro ao tentar descomprimir um segmento. Descartando segmento.")
+
+def _read_history(dev_id: str, limit: int, history_filter: _HistoryFilter = None) -> list:
+    """
+    Lê até `limit` pacotes que passam no filtro, do mais novo para o mais antigo.
+    Percorre as camadas em ordem: buffer em disco do worker, segmentos quentes (Redis), segmentos frios (disco)
+    e o histórico legado. Pelo ID, só os segmentos que podem conter pacotes do filtro (janela de tempo,
+    tipo e alerta) são descomprimidos. O buffer em disco é lido sem ser mesclado: a leitura não escreve nada.
+    """
+    history_filter = history_filter or _HistoryFilter()
+
+    history = [packet for packet in reversed(_read_disk_buffer(dev_id)) if history_filter.matches(packet)]
+    if len(history) >= limit:
+        return history[:limit]
+
+    redis_client = get_redis(decode_responses=False)
+    segments_key, index_key = _history_keys(dev_id)
+
+    # Camada quente: segmentos cujo pacote mais novo é posterior a `since`, do mais novo para o mais antigo
+    since = history_filter.since
+    seg_ids = redis_client.zrevrangebyscore(index_key, "+inf", since - _SEGMENT_TS_MARGIN if since is not None else "-inf")
+    _collect_segments(seg_ids, lambda ids: redis_client.hmget(segments_key, ids), history, limit, history_filter)
+
+    # Camada fria: segmentos mais antigos, em disco
+    if len(history) < limit:
+        with cold_segment_store.reader(dev_id) as reader:
+            _collect_segments(reader.seg_ids, lambda ids: [reader.get(seg_id) for seg_id in ids], history, limit, history_filter)
+
+    if len(history) < limit:
+        history.extend(packet for packet in _read_legacy_history(redis_client, dev_id) if history_filter.matches(packet))
+
+    return history[:limit]
+
+def get_packet_history(dev_id: str, return_compressed: bool = False, limit: int | None = None) -> list:
     """
     Mantém a funcionalidade de leitura.
-    Nota: Dados que ainda estão no buffer de disco (diskcache) e não foram para o Redis
-    não aparecerão aqui. Se consistência em tempo real for crítica,
-    seria necessário ler do Redis E do Diskcache e mesclar na leitura.
+    Apenas os segmentos necessários para cobrir `limit` pacotes (padrão: HISTORY_LIMIT) são lidos e descomprimidos.
     """
+    limit = min(limit or settings.HISTORY_LIMIT, settings.HISTORY_LIMIT)
+
     try:
-        # Fazendo merge dos possíveis pacotes salvos no disco
-        _merge_disk_to_redis(dev_id)
+        history = _read_history(dev_id, limit)
 
-        # Obtendo histórico salvo no redis
-        redis_client = get_redis(decode_responses=False)
-        history_key = f"history:{dev_id}"
-        compressed_history = redis_client.get(history_key)
-        
         # Retornando os dados comprimidos ou descomprimidos
-        if compressed_history:
-            if return_compressed:
-                return compressed_history
-            
-            try:
-                decompressed_history = zlib.decompress(compressed_history)
-                history = json.loads(decompressed_history.decode('utf-8'))
-            except Exception as e:
-                logger.error(f"Houve um erro ao tentar descomprimir. Descartando histórico.")
-                history = []
+        if return_compressed:
+            return zlib.compress(json.dumps([render_packet(packet) for packet in history]).encode('utf-8')) if history else []
 
-            return history
-        
-        return []
+        return [render_packet(packet) for packet in history]
     
     except Exception as e:
         logger.info(f"Erro ao recuperar histórico para {dev_id}: {e}")
         return []
 
+def query_packet_history(
+        dev_id: str, since: float | None = None, until: float | None = None, limit: int = 100, cursor: str | None = None,
+        packet_type: str | None = None, alert_id: int | None = None
+    ) -> dict:
+    """
+    Consulta paginada do histórico, do mais novo para o mais antigo.
+    - since/until: janela de timestamps (epoch, inclusive);
+    - cursor: valor de `next_cursor` da página anterior, continua a partir do pacote seguinte;
+    - packet_type: um de PACKET_TYPES; alert_id: universal_alert_id.
+    `next_cursor` ("<timestamp>:<desempate>") é None quando não há mais páginas. O desempate conta os pacotes com
+    o mesmo timestamp do último já retornados, para que a próxima página não pule nem repita pacotes simultâneos.
+    """
+    if packet_type is not None and packet_type not in PACKET_TYPES:
+        raise ValueError(f"packet_type deve ser um de {', '.join(PACKET_TYPES)}")
+
+    limit = max(1, min(limit, settings.HISTORY_LIMIT))
+    before, skip = parse_history_cursor(cursor)
+
+    history = _read_history(dev_id, limit, _HistoryFilter(since, until, before, packet_type, alert_id, skip))[:limit]
+
+    next_cursor = None
+    if len(history) == limit:
+        last_timestamp = float(history[-1].get("timestamp", 0))
+        ties = sum(1 for packet in history if packet.get("timestamp", 0) == last_timestamp)
+        if last_timestamp == before:
+            ties += skip
+        next_cursor = f"{last_timestamp!r}:{ties}"
+
+    return {"data": [render_packet(packet) for packet in history], "next_cursor": next_cursor}
+
+def _append_segment(redis_client, dev_id: str, packets: list):
+    """
+    Adiciona um novo segmento com `packets` (em ordem de chegada). Os segmentos mais antigos que excedem
+    HISTORY_HOT_LIMIT são movidos, ainda comprimidos, para a camada fria em disco.
+    O total de pacotes da camada quente fica em `history:<dev_id>:hot_packets`, então o índice só é lido a partir
+    dos segmentos mais antigos, quando o limite é ultrapassado: o custo é proporcional ao lote, não ao histórico.
+    """
+    segments_key, index_key = _history_keys(dev_id)
+    hot_packets_key = f"history:{dev_id}:hot_packets"
+
+    newest_first = list(reversed(packets))
+    seg_id = _build_segment_id(newest_first)
+    _, max_ts, _ = _parse_segment_id(seg_id)
+
+    pipe = redis_client.pipeline()
+    pipe.hset(segments_key, seg_id, _encode_segment(newest_first))
+    pipe.zadd(index_key, {seg_id: max_ts})
+    pipe.incrby(hot_packets_key, len(packets))
+    hot_packets = pipe.execute()[-1]
+
+    # Contador recém-criado: dispositivo gravado antes dele (ou contador perdido), recontado uma única vez pelo índice
+    if hot_packets == len(packets):
+        hot_packets = sum(_parse_segment_id(hot_seg_id)[2] for hot_seg_id in redis_client.zrange(index_key, 0, -1))
+        redis_client.set(hot_packets_key, hot_packets)
+
+    if hot_packets <= settings.HISTORY_HOT_LIMIT:
+        return
+
+    # Mantendo na camada quente apenas os segmentos que cabem no limite: descarta os mais antigos enquanto
+    # os restantes ainda cobrem HISTORY_HOT_LIMIT pacotes
+    to_drop = []
+    dropped_packets = 0
+    start = 0
+    while True:
+        oldest = redis_client.zrange(index_key, start, start + _TRIM_READ_SEGMENTS - 1)
+        for old_seg_id in oldest:
+            count = _parse_segment_id(old_seg_id)[2]
+            if hot_packets - dropped_packets - count < settings.HISTORY_HOT_LIMIT:
+                break
+            to_drop.append(old_seg_id)
+            dropped_packets += count
+        else:
+            if len(oldest) == _TRIM_READ_SEGMENTS:
+                start += _TRIM_READ_SEGMENTS
+                continue
+        break
+
+    if to_drop:
+        blobs = redis_client.hmget(segments_key, to_drop)
+
+        # Do mais antigo para o mais novo; o histórico legado é sempre mais antigo que qualquer segmento
+        cold_segments = []
+        legacy_history = _read_legacy_history(redis_client, dev_id)
+        if legacy_history:
+            cold_segments.append((_build_segment_id(legacy_history), _encode_segment(legacy_history)))
+
+        for old_seg_id, blob in zip(to_drop, blobs):
+            if blob:
+                cold_segments.append((old_seg_id.decode() if isinstance(old_seg_id, bytes) else old_seg_id, blob))
+
+        try:
+            cold_segment_store.append(dev_id, cold_segments)
+        except Exception as e:
+            # Os segmentos permanecem no Redis e são movidos na próxima gravação
+            logger.error(f"Erro ao mover segmentos de {dev_id} para a camada fria: {e}")
+            return
+
+        pipe = redis_client.pipeline()
+        pipe.zrem(index_key, *to_drop)
+        pipe.hdel(segments_key, *to_drop)
+        pipe.incrby(hot_packets_key, -dropped_packets)
+        pipe.delete(f"history:{dev_id}")
+        pipe.execute()
+
+def compact_cold_history(dev_id: str) -> bool:
+    """
+    Compacta a camada fria de um dispositivo:
+    - descarta os segmentos mais antigos que não cabem em HISTORY_LIMIT - HISTORY_HOT_LIMIT pacotes;
+    - junta segmentos vizinhos menores que HISTORY_COLD_MIN_SEGMENT_PACKETS em segmentos de até
+      HISTORY_COLD_SEGMENT_PACKETS pacotes (recomprimidos com o codec atual).
+    Retorna True se os arquivos foram reescritos.
+    """
+    with cold_segment_store.reader(dev_id) as reader:
+        seg_ids = _select_segments(reader.seg_ids, max(0, settings.HISTORY_LIMIT - settings.HISTORY_HOT_LIMIT))
+        dropped = len(reader.seg_ids) - len(seg_ids)
+
+        # Do mais antigo para o mais novo
+        segments = [(seg_id, reader.get(seg_id)) for seg_id in reversed(seg_ids)]
+
+    compacted = []
+    group = []
+
+    def flush_group():
+        if len(group) == 1:
+            compacted.append(group[0])
+        elif group:
+            newest_first = []
+            for _, blob in reversed(group):
+                newest_first.extend(_decode_segment(blob))
+            compacted.append((_build_segment_id(newest_first), _encode_segment(newest_first)))
+        group.clear()
+
+    group_count = 0
+    for seg_id, blob in segments:
+        count = _parse_segment_id(seg_id)[2]
+        if count >= settings.HISTORY_COLD_MIN_SEGMENT_PACKETS or group_count + count > settings.HISTORY_COLD_SEGMENT_PACKETS:
+            flush_group()
+            group_count = 0
+
+        if count >= settings.HISTORY_COLD_MIN_SEGMENT_PACKETS:
+            compacted.append((seg_id, blob))
+            continue
+
+        group.append((seg_id, blob))
+        group_count += count
+
+    flush_group()
+
+    if not dropped and len(compacted) == len(segments):
+        return False
+
+    cold_segment_store.rewrite(dev_id, compacted)
+    logger.info(f"Camada fria de {dev_id} compactada: {len(segments) + dropped} -> {len(compacted)} segmentos.")
+    return True
+
 def _merge_disk_to_redis(dev_id: str, new_packets: list = None) -> bool:
     """
     Faz o merge dos dados em disco para o redis, lida com dados não enviados nos parâmetros
     """
 
-    history_key = f"history:{dev_id}"
-    
     try:
-        # Recupera histórico atual do Redis
         redis_client = get_redis(decode_responses=False)
-        compressed_history = redis_client.get(history_key)
-        if compressed_history:
-            try:
-                decompressed_history = zlib.decompress(compressed_history)
-                current_history = json.loads(decompressed_history.decode('utf-8'))
-
-            except Exception as e:
-                logger.error(f"Houve um erro ao tentar descomprimir. Descartando histórico.")
-                current_history = []
-
-        else:
-            current_history = []
 
         # Verificando presença de new_packets
         if not new_packets:
-            cache = Cache(settings.CACHE_DIR)
+            cache = get_buffer_store()
 
             buffer_key = f"buffer:{dev_id}"
-            new_packets = cache.get(buffer_key, default=[])
+            new_packets = cache.get(buffer_key, default=[], retry=True)
 
             if not new_packets:
                 logger.warning("Não a pacotes no disco para serem mesclados.")
                 return False
             
-            cache.delete(buffer_key)
+            cache.delete(buffer_key, retry=True)
 
-        # Merging
-        new_packets.reverse() 
-        full_history = new_packets + current_history
-        
-        # Aplica o limite
-        full_history = full_history[:settings.HISTORY_LIMIT]
-
-        # Comprime e Salva no Redis
-        updated_history_json = json.dumps(full_history).encode('utf-8')
-        compressed_updated_history = zlib.compress(updated_history_json)
-        redis_client.set(history_key, compressed_updated_history)
+        _append_segment(redis_client, dev_id, new_packets)
         
         return True
     except Exception as e:
         logger.error(f"Erro no merge Redis para {dev_id}: {e}")
         return False
 
-def history_worker_process():
+def get_history_queue(dev_id: str) -> str:
+    """
+    Fila do worker responsável pelo dispositivo. Com mais de um processo, os dispositivos são distribuídos
+    por hash estável do dev_id, garantindo que um mesmo dispositivo seja sempre tratado pelo mesmo worker.
+    """
+    if settings.HISTORY_WORKER_PROCESSES <= 1:
+        return settings.HISTORY_SERVICE_QUEUE
+
+    shard = zlib.crc32(str(dev_id).encode()) % settings.HISTORY_WORKER_PROCESSES
+    return f"{settings.HISTORY_SERVICE_QUEUE}:{shard}"
+
+def get_history_queues() -> list:
+    if settings.HISTORY_WORKER_PROCESSES <= 1:
+        return [settings.HISTORY_SERVICE_QUEUE]
+
+    return [f"{settings.HISTORY_SERVICE_QUEUE}:{shard}" for shard in range(settings.HISTORY_WORKER_PROCESSES)]
+
+def get_history_service_stats() -> dict:
+    """
+    Estatísticas publicadas por cada worker de histórico (fila, atraso e vazão).
+    """
+    pipe = redis_client.pipeline()
+    for queue in get_history_queues():
+        pipe.hgetall(f"{settings.HISTORY_SERVICE_STATS_KEY}:{queue}")
+        pipe.llen(queue)
+
+    results = pipe.execute()
+
+    stats = {}
+    for i, queue in enumerate(get_history_queues()):
+        worker_stats = results[i * 2] or {}
+        worker_stats["queue_length"] = results[i * 2 + 1]
+        stats[queue] = worker_stats
+
+    return stats
+
+def _flush_buffer(cache: FanoutCache, dev_id: str, buffer: list) -> bool:
+    logger.info(f"Batch atingido para {dev_id} ({len(buffer)} itens). Iniciando merge...")
+
+    success = _merge_disk_to_redis(dev_id, buffer)
+
+    if success:
+        cache.delete(f"buffer:{dev_id}", retry=True)
+    else:
+        # se houve erros salvamos o buffer e tentamos novamente depois
+        cache.set(f"buffer:{dev_id}", buffer, retry=True)
+
+    return success
+
+def _migrate_legacy_buffers(cache: FanoutCache, queue: str):
+    """
+    Move os buffers deste worker gravados no cache geral (formato anterior) para o armazenamento de buffers.
+    """
+    legacy_cache = Cache(settings.CACHE_DIR)
+    try:
+        for key in list(legacy_cache.iterkeys()):
+            if isinstance(key, str) and key.startswith("buffer:") and get_history_queue(key.removeprefix("buffer:")) == queue:
+                buffer = legacy_cache.get(key, default=[])
+                if buffer:
+                    current_buffer = cache.get(key, default=[], retry=True)
+                    cache.set(key, buffer + current_buffer, retry=True)
+                legacy_cache.delete(key)
+    finally:
+        legacy_cache.close()
+
+def history_worker_process(queue: str = None):
+    """
+    Consome a fila de histórico em lotes:
+    - retira até HISTORY_WORKER_BATCH_SIZE itens por vez;
+    - agrupa os pacotes por dispositivo, fazendo uma única leitura/escrita no buffer em disco por dispositivo e lote;
+    - grava o buffer como segmento ao atingir DISK_BATCH_SIZE pacotes ou HISTORY_FLUSH_INTERVAL segundos
+      (HISTORY_FLUSH_MAX_INTERVAL para buffers com menos de HISTORY_MIN_SEGMENT_PACKETS pacotes).
+    """
+    queue = queue or settings.HISTORY_SERVICE_QUEUE
 
     with logger.contextualize(log_label="HISTORY WORKER"):
-        logger.info("--- Iniciando Processo Worker de Histórico ---")
+        logger.info(f"--- Iniciando Processo Worker de Histórico fila={queue} ---")
         
-        cache = Cache(settings.CACHE_DIR)
+        cache = get_buffer_store()
         redis_client = get_redis(decode_responses=False)
+
+        _migrate_legacy_buffers(cache, queue)
+
+        # Momento em que cada buffer pendente recebeu seu primeiro pacote, para o flush por tempo
+        buffer_started_at = {}
+        # Pacotes em cada buffer pendente, para o tamanho mínimo do flush por tempo (desconhecido para os da inicialização)
+        buffer_sizes = {}
+        for key in cache:
+            if isinstance(key, str) and key.startswith("buffer:"):
+                dev_id = key.removeprefix("buffer:")
+                if get_history_queue(dev_id) == queue:
+                    buffer_started_at[dev_id] = time.monotonic()
+
+        processed = 0
+        lag = 0.0
+        last_stats_at = time.monotonic()
+        last_sweep_at = time.monotonic()
+
+        # Compactação da camada fria: a cada HISTORY_COLD_COMPACT_INTERVAL segundos, os dispositivos deste worker
+        # são enfileirados e compactados aos poucos, sem atrasar o consumo da fila
+        last_compaction_at = time.monotonic()
+        to_compact = []
         
         while True:
             try:
-                item = redis_client.blpop(settings.HISTORY_SERVICE_QUEUE, timeout=5)
-                
-                if item:
-                    item = json.loads(item[1])
-                    dev_id = item['dev_id']
-                    packet_data = item['packet']
-
-                    # Obtendo os pacotes já salvos em disco, ou criando uma nova lista
-                    buffer_key = f"buffer:{dev_id}"
-                    
-                    current_buffer = cache.get(buffer_key, default=[])
-                    current_buffer.append(packet_data)
-                    
-                    # Verifica se atingiu o limite
-                    if len(current_buffer) >= settings.DISK_BATCH_SIZE:
-                        logger.info(f"Batch atingido para {dev_id} ({len(current_buffer)} itens). Iniciando merge...")
-                        
-                        success = _merge_disk_to_redis(dev_id, current_buffer)
-                        
-                        if success:
-                            cache.delete(buffer_key)
-                        else:
-                            # se houve erros salvamos o buffer e tentamos novamente depois
-                            cache.set(buffer_key, current_buffer)
-                    else:
-                        # Caso não atingiu o limite, salvamos o buffer
-                        cache.set(buffer_key, current_buffer)
+                items = redis_client.lpop(queue, settings.HISTORY_WORKER_BATCH_SIZE)
+                if not items:
+                    item = redis_client.blpop(queue, timeout=1)
+                    items = [item[1]] if item else []
+
+                if items:
+                    # Agrupando os pacotes do lote por dispositivo. Um item inválido é descartado sozinho,
+                    # sem levar junto os pacotes dos outros dispositivos do lote
+                    grouped = {}
+                    for raw_item in items:
+                        try:
+                            dev_id, packet = _decode_queue_item(raw_item)
+                            queued_at = packet['timestamp']
+                        except Exception as e:
+                            logger.error(f"Item inválido descartado da fila: {e} item={raw_item[:64]!r}")
+                            continue
+
+                        grouped.setdefault(dev_id, []).append(packet)
+                        # Atraso do item mais recente do lote: tempo entre o enfileiramento e o processamento
+                        lag = max(0.0, time.time() - queued_at)
+
+                    processed += len(items)
+
+                    for dev_id, packets in grouped.items():
+                        try:
+                            # Obtendo os pacotes já salvos em disco, ou criando uma nova lista
+                            buffer_key = f"buffer:{dev_id}"
+
+                            current_buffer = cache.get(buffer_key, default=[], retry=True)
+                            current_buffer.extend(packets)
+
+                            # Verifica se atingiu o limite
+                            if len(current_buffer) >= settings.DISK_BATCH_SIZE:
+                                if _flush_buffer(cache, dev_id, current_buffer):
+                                    buffer_started_at.pop(dev_id, None)
+                                    buffer_sizes.pop(dev_id, None)
+                            else:
+                                # Caso não atingiu o limite, salvamos o buffer
+                                cache.set(buffer_key, current_buffer, retry=True)
+                                buffer_started_at.setdefault(dev_id, time.monotonic())
+                                buffer_sizes[dev_id] = len(current_buffer)
+                        except Exception as e:
+                            logger.error(f"Erro ao processar {len(packets)} pacote(s) de histórico de {dev_id}: {e}")
+
+                now = time.monotonic()
+
+                # Flush por tempo: buffers parados há mais de HISTORY_FLUSH_INTERVAL segundos
+                if now - last_sweep_at >= 1:
+                    last_sweep_at = now
+                    # Buffers com menos de HISTORY_MIN_SEGMENT_PACKETS pacotes aguardam até HISTORY_FLUSH_MAX_INTERVAL,
+                    # para que dispositivos pouco ativos não gerem muitos segmentos minúsculos (a leitura já inclui o buffer)
+                    expired = [
+                        dev_id for dev_id, started_at in buffer_started_at.items()
+                        if now - started_at >= settings.HISTORY_FLUSH_MAX_INTERVAL
+                        or (now - started_at >= settings.HISTORY_FLUSH_INTERVAL and buffer_sizes.get(dev_id, settings.HISTORY_MIN_SEGMENT_PACKETS) >= settings.HISTORY_MIN_SEGMENT_PACKETS)
+                    ]
+                    for dev_id in expired:
+                        buffer = cache.get(f"buffer:{dev_id}", default=[], retry=True)
+                        if not buffer or _flush_buffer(cache, dev_id, buffer):
+                            buffer_started_at.pop(dev_id, None)
+                            buffer_sizes.pop(dev_id, None)
+
+                    if now - last_compaction_at >= settings.HISTORY_COLD_COMPACT_INTERVAL:
+                        last_compaction_at = now
+                        to_compact = [dev_id for dev_id in cold_segment_store.devices() if get_history_queue(dev_id) == queue]
+
+                    for dev_id in to_compact[-settings.HISTORY_COLD_COMPACT_BATCH:]:
+                        try:
+                            compact_cold_history(dev_id)
+                        except Exception as e:
+                            logger.error(f"Erro ao compactar camada fria de {dev_id}: {e}")
+                    del to_compact[-settings.HISTORY_COLD_COMPACT_BATCH:]
+
+                # Publicando estatísticas de vazão e atraso
+                if now - last_stats_at >= settings.HISTORY_STATS_INTERVAL:
+                    items_per_sec = processed / (now - last_stats_at)
+                    stats = {
+                        "items_per_sec": round(items_per_sec, 2),
+                        "lag_seconds": round(lag, 3),
+                        "buffered_devices": len(buffer_started_at),
+                        "updated_at": time.time(),
+                    }
+                    redis_client.hset(f"{settings.HISTORY_SERVICE_STATS_KEY}:{queue}", mapping=stats)
+                    logger.info(f"Vazão: {stats['items_per_sec']} itens/s, atraso: {stats['lag_seconds']}s, dispositivos em buffer: {stats['buffered_devices']}")
+
+                    processed = 0
+                    last_stats_at = now
 
             except Exception as e:
                 import traceback
@@ -163,8 +933,19 @@ def history_worker_process():
                 logger.info(f"Erro crítico no loop: {e}")
                 time.sleep(1) 
 
-def start_history_service():
-    p = multiprocessing.Process(target=history_worker_process)
-    p.daemon = True
-    p.start()
-    return p
\ No newline at end of file
+def start_history_service() -> list:
+    processes = []
+    for queue in get_history_queues():
+        # Com o armazenamento em memória, a fila só existe neste processo: o worker roda em uma thread
+        if settings.STORAGE_BACKEND == "memory":
+            p = threading.Thread(target=history_worker_process, args=(queue,), daemon=True)
+            p.start()
+            processes.append(p)
+            continue
+
+        p = multiprocessing.Process(target=history_worker_process, args=(queue,))
+        p.daemon = True
+        p.start()
+        processes.append(p)
+
+    return processes
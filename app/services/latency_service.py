@@ -0,0 +1,333 @@
+import threading
+import time
+
+from app.config.settings import settings
+
+# Etapas do pipeline de tradução, medidas por pacote recebido:
+#   frame: do recv que trouxe o primeiro byte do frame até o frame estar completo no handler
+#   decode: process_packet (CRC, decodificação, mapeamento) descontadas as demais etapas e o Redis
+#   redis: soma dos comandos Redis feitos durante o pacote
+#   build, history, session, send: construção do pacote de saída, histórico, obtenção da sessão e MainServerSession.send
+#   ack: do frame completo até o ACK ao rastreador ser enfileirado
+#   total: process_packet inteiro
+STAGES = ("frame", "decode", "redis", "build", "history", "session", "send", "ack", "total")
+
+# Histograma log-linear no estilo HDR, em microssegundos: valores até 2*_SUB_BUCKETS são exatos,
+# acima disso cada potência de 2 é dividida em _SUB_BUCKETS faixas (erro relativo < 1/_SUB_BUCKETS)
+_SUB_BUCKET_BITS = 6
+_SUB_BUCKETS = 1 << _SUB_BUCKET_BITS
+_LINEAR_LIMIT = _SUB_BUCKETS * 2
+_MAX_VALUE_US = 60_000_000 # Valores acima de 60s são registrados como 60s
+
+def _bucket_index(value: int) -> int:
+    if value < _LINEAR_LIMIT:
+        return value
+
+    shift = value.bit_length() - _SUB_BUCKET_BITS - 1
+    return _LINEAR_LIMIT + (shift - 1) * _SUB_BUCKETS + (value >> shift) - _SUB_BUCKETS
+
+def _bucket_upper_bound(index: int) -> int:
+    """
+    Maior valor (µs) que cai no bucket.
+    """
+    if index < _LINEAR_LIMIT:
+        return index
+
+    shift = (index - _LINEAR_LIMIT) // _SUB_BUCKETS + 1
+    sub_bucket = (index - _LINEAR_LIMIT) % _SUB_BUCKETS + _SUB_BUCKETS
+    return ((sub_bucket + 1) << shift) - 1
+
+_BUCKET_COUNT = _bucket_index(_MAX_VALUE_US) + 1
+
+class LatencyHistogram:
+    """
+    Histograma de durações. Registrar é um índice calculado com bit_length e um incremento;
+    os contadores não usam lock (uma contagem pode se perder sob concorrência, o que não altera as estatísticas).
+    """
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * _BUCKET_COUNT
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float):
+        value = int(seconds * 1e6)
+        if value < 0:
+            value = 0
+        elif value > _MAX_VALUE_US:
+            value = _MAX_VALUE_US
+
+        self.counts[_bucket_index(value)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, percent: float) -> float:
+        """
+        Duração (segundos) abaixo da qual estão `percent`% dos registros.
+        """
+        counts = list(self.counts)
+        total = sum(counts)
+        if not total:
+            return 0.0
+
+        target = max(1, round(total * percent / 100))
+        seen = 0
+        for index, count in enumerate(counts):
+            seen += count
+            if seen >= target:
+                return min(_bucket_upper_bound(index) / 1e6, self.max)
+
+        return self.max
+
+    def count_at_or_below(self, seconds: float) -> int:
+        limit = _bucket_index(min(int(seconds * 1e6), _MAX_VALUE_US))
+        return sum(self.counts[:limit + 1])
+
+    def cumulative_counts(self, bounds: tuple) -> list:
+        """
+        Quantidade de registros menores ou iguais a cada limite de `bounds` (segundos, em ordem crescente), em uma passada.
+        """
+        counts = self.counts
+        cumulative = []
+        total = 0
+        start = 0
+        for bound in bounds:
+            end = _bucket_index(min(int(bound * 1e6), _MAX_VALUE_US)) + 1
+            total += sum(counts[start:end])
+            cumulative.append(total)
+            start = end
+
+        return cumulative
+
+    def summary(self) -> dict:
+        count = self.count
+        return {
+            "count": count,
+            "mean_ms": round(self.total / count * 1000, 3) if count else 0.0,
+            "p50_ms": round(self.percentile(50) * 1000, 3),
+            "p90_ms": round(self.percentile(90) * 1000, 3),
+            "p99_ms": round(self.percentile(99) * 1000, 3),
+            "p999_ms": round(self.percentile(99.9) * 1000, 3),
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+class RedisUsage:
+    """
+    Idas e voltas (um comando ou um pipeline) e comandos Redis por pacote de um protocolo e tipo de pacote.
+    """
+    __slots__ = ("packets", "round_trips", "commands", "max_round_trips", "max_commands")
+
+    def __init__(self):
+        self.packets = 0
+        self.round_trips = 0
+        self.commands = 0
+        self.max_round_trips = 0
+        self.max_commands = 0
+
+    def record(self, round_trips: int, commands: int):
+        self.packets += 1
+        self.round_trips += round_trips
+        self.commands += commands
+        if round_trips > self.max_round_trips:
+            self.max_round_trips = round_trips
+        if commands > self.max_commands:
+            self.max_commands = commands
+
+    def summary(self) -> dict:
+        packets = self.packets or 1
+        return {
+            "packets": self.packets,
+            "round_trips_per_packet": round(self.round_trips / packets, 2),
+            "max_round_trips": self.max_round_trips,
+            "commands_per_packet": round(self.commands / packets, 2),
+            "max_commands": self.max_commands,
+        }
+
+class _PacketTrace:
+    __slots__ = ("protocol", "start", "redis", "accounted", "packet_type", "round_trips", "commands")
+
+    def __init__(self, protocol: str, start: float):
+        self.protocol = protocol
+        self.start = start
+        self.redis = 0.0
+        self.accounted = 0.0
+        self.packet_type = None
+        self.round_trips = 0
+        self.commands = 0
+
+class _ThreadTrace(threading.local):
+    # Valor padrão na classe: ler o rastro de uma thread sem rastro não levanta AttributeError
+    trace = None
+
+class LatencyTracker:
+    """
+    Histogramas de latência por protocolo de entrada e etapa (STAGES).
+    O handler abre um rastro por pacote (`begin`/`end`) na própria thread; as etapas medidas nessa thread
+    (`mark`/`stage`, Redis, ACK) são atribuídas ao protocolo do rastro. Desligado (LATENCY_HISTOGRAMS_ENABLED),
+    nenhum rastro é aberto e cada ponto de medição custa apenas a consulta de um atributo thread-local.
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+                    cls._instance.enabled = settings.LATENCY_HISTOGRAMS_ENABLED
+                    cls._instance.since = time.time()
+                    cls._instance._histograms = {}
+                    cls._instance._redis_usage = {}
+                    cls._instance._local = _ThreadTrace()
+
+        return cls._instance
+
+    def configure(self, enabled: bool | None = None, reset: bool = False):
+        if enabled is not None:
+            self.enabled = bool(enabled)
+
+        if reset:
+            self._histograms = {}
+            self._redis_usage = {}
+            self.since = time.time()
+
+    def _histogram(self, protocol: str, stage: str) -> LatencyHistogram:
+        histograms = self._histograms.get(protocol)
+        if histograms is None:
+            histograms = self._histograms.setdefault(protocol, {})
+
+        histogram = histograms.get(stage)
+        if histogram is None:
+            histogram = histograms.setdefault(stage, LatencyHistogram())
+
+        return histogram
+
+    def record(self, protocol: str, stage: str, seconds: float):
+        self._histogram(protocol, stage).record(seconds)
+
+    # ====================================== Rastro por pacote =========================================
+
+    def begin(self, protocol: str, frame_seconds: float | None = None):
+        """
+        Abre o rastro do pacote que a thread vai processar, registrando a etapa "frame".
+        """
+        if not self.enabled:
+            self._local.trace = None
+            return
+
+        self._local.trace = _PacketTrace(protocol, time.perf_counter())
+        if frame_seconds is not None:
+            self.record(protocol, "frame", frame_seconds)
+
+    def end(self):
+        trace = self._local.trace
+        if trace is None:
+            return
+
+        self._local.trace = None
+        total = time.perf_counter() - trace.start
+        self.record(trace.protocol, "total", total)
+        self.record(trace.protocol, "redis", trace.redis)
+        self.record(trace.protocol, "decode", max(total - trace.accounted - trace.redis, 0.0))
+
+        # Pacotes que não geraram envio ao servidor principal (login, pacotes de informação, descartados)
+        packet_type = trace.packet_type or "unsent"
+        usage = self._redis_usage.get((trace.protocol, packet_type))
+        if usage is None:
+            usage = self._redis_usage.setdefault((trace.protocol, packet_type), RedisUsage())
+        usage.record(trace.round_trips, trace.commands)
+
+    def mark(self) -> tuple:
+        """
+        Início de uma etapa. Retorna (instante, tempo de Redis já acumulado no pacote).
+        """
+        trace = self._local.trace
+        return time.perf_counter(), trace.redis if trace is not None else 0.0
+
+    def stage(self, stage: str, mark: tuple) -> float:
+        """
+        Fim de uma etapa iniciada em `mark`. Retorna a duração em segundos (mesmo sem rastro aberto).
+        """
+        elapsed = time.perf_counter() - mark[0]
+
+        trace = self._local.trace
+        if trace is not None:
+            # O Redis feito dentro da etapa já está em `trace.redis`
+            trace.accounted += elapsed - (trace.redis - mark[1])
+            self.record(trace.protocol, stage, elapsed)
+
+        return elapsed
+
+    def tracing(self) -> bool:
+        return self._local.trace is not None
+
+    def add_redis(self, seconds: float, commands: int = 1):
+        """
+        Uma ida e volta ao Redis (`commands` > 1 para pipelines) feita pela thread.
+        """
+        trace = self._local.trace
+        if trace is not None:
+            trace.redis += seconds
+            trace.round_trips += 1
+            trace.commands += commands
+
+    def set_packet_type(self, packet_type: str):
+        """
+        Tipo do pacote em processamento, informado no primeiro envio ao servidor principal.
+        """
+        trace = self._local.trace
+        if trace is not None and trace.packet_type is None:
+            trace.packet_type = packet_type
+
+    def ack(self):
+        trace = self._local.trace
+        if trace is not None:
+            self.record(trace.protocol, "ack", time.perf_counter() - trace.start)
+
+    # ====================================== Leitura ===================================================
+
+    def snapshot(self, protocol: str | None = None) -> dict:
+        histograms = self._histograms
+        protocols = [protocol] if protocol else sorted(histograms)
+
+        return {
+            "enabled": self.enabled,
+            "since": self.since,
+            "protocols": {
+                name: {
+                    stage: histograms[name][stage].summary()
+                    for stage in STAGES if stage in histograms.get(name, {})
+                }
+                for name in protocols if name in histograms
+            },
+            "redis_usage": self.redis_usage(protocol),
+        }
+
+    def redis_usage(self, protocol: str | None = None) -> dict:
+        """
+        {protocolo: {tipo de pacote: resumo de RedisUsage}}.
+        """
+        usage = {}
+        for (name, packet_type), stats in sorted(list(self._redis_usage.items())):
+            if protocol is None or name == protocol:
+                usage.setdefault(name, {})[packet_type] = stats.summary()
+
+        return usage
+
+    def redis_usage_stats(self) -> dict:
+        """
+        {(protocolo, tipo de pacote): RedisUsage} (cópia rasa).
+        """
+        return dict(self._redis_usage)
+
+    def histograms(self) -> dict:
+        """
+        {protocolo: {etapa: LatencyHistogram}} (cópia rasa).
+        """
+        return {protocol: dict(stages) for protocol, stages in list(self._histograms.items())}
+
+latency_tracker = LatencyTracker()
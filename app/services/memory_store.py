@@ -0,0 +1,613 @@
+"""
+Backend de armazenamento em memória (STORAGE_BACKEND="memory"), com a interface do redis.Redis para o subconjunto
+de comandos usado pelo gateway: chaves, strings, hashes, listas (inclusive BLPOP), conjuntos, conjuntos ordenados
+e pipelines.
+
+Os valores são guardados em bytes, codificados como no redis-py (str em UTF-8, números pela representação textual,
+outros tipos levantam DataError), e devolvidos como str quando `decode_responses` é True. Expiração (`expire`,
+`set(ex=...)`) é verificada na leitura.
+
+Os dados vivem no processo: não há persistência nem compartilhamento entre processos.
+"""
+import fnmatch
+import threading
+import time
+
+from redis.exceptions import DataError, ResponseError
+
+_WRONGTYPE = "WRONGTYPE Operation against a key holding the wrong kind of value"
+
+# Implementação de cada comando, pelo nome do comando no Redis
+_handlers = {}
+
+def _handler(command: str):
+    def register(func):
+        _handlers[command] = func
+        return func
+
+    return register
+
+def _encode(value) -> bytes:
+    if isinstance(value, bytes):
+        return value
+    if isinstance(value, str):
+        return value.encode()
+    if isinstance(value, memoryview):
+        return value.tobytes()
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise DataError(f"Invalid input of type: '{type(value).__name__}'. Convert to a bytes, string, int or float first.")
+
+    return repr(value).encode()
+
+def _score_bound(value) -> tuple[float, bool]:
+    """
+    Limite de ZRANGEBYSCORE: número, "-inf"/"+inf" ou "(número" (exclusivo). Retorna (valor, exclusivo).
+    """
+    if isinstance(value, (bytes, str)):
+        value = value.decode() if isinstance(value, bytes) else value
+        if value.startswith("("):
+            return float(value[1:]), True
+
+    return float(value), False
+
+def _slice(length: int, start: int, end: int) -> slice:
+    # Índices inclusivos e negativos, como no Redis
+    start = max(start + length if start < 0 else start, 0)
+    end = end + length if end < 0 else end
+    return slice(start, max(end + 1, start))
+
+class _SortedSet(dict):
+    """
+    Membro -> score; distinto de um hash na verificação de tipo.
+    """
+
+class MemoryStore:
+    """
+    Dados de um banco: chaves, expirações e o lock que torna cada comando (e cada pipeline) atômico.
+    Clientes com `decode_responses` diferentes podem usar o mesmo MemoryStore, como dois clientes do mesmo banco.
+    """
+    def __init__(self):
+        self.data = {}
+        self.expires = {}
+        self.lock = threading.RLock()
+        # Sinalizada a cada inserção em lista, para o BLPOP
+        self.pushed = threading.Condition(self.lock)
+
+class MemoryRedis:
+    """
+    Cliente em memória. Assim como no redis-py, cada comando passa por `execute_command`, ponto de extensão
+    para instrumentação (redis_service.TimedMemoryRedis).
+    """
+    def __init__(self, store: MemoryStore | None = None, decode_responses: bool = True):
+        self.store = store if store is not None else MemoryStore()
+        self.decode_responses = decode_responses
+
+    def execute_command(self, *args, **options):
+        with self.store.lock:
+            return _handlers[args[0]](self, *args[1:])
+
+    # ====================================== Auxiliares ================================================
+
+    def _decode(self, value):
+        if value is None or not self.decode_responses:
+            return value
+
+        return value.decode()
+
+    def _live(self, key: bytes):
+        expires_at = self.store.expires.get(key)
+        if expires_at is not None and expires_at <= time.monotonic():
+            self.store.data.pop(key, None)
+            del self.store.expires[key]
+
+        return self.store.data.get(key)
+
+    def _get(self, name, kind: type, create: bool = False):
+        key = _encode(name)
+        value = self._live(key)
+        if value is None:
+            if not create:
+                return None
+            value = self.store.data[key] = kind()
+        elif type(value) is not kind:
+            raise ResponseError(_WRONGTYPE)
+
+        return value
+
+    def _drop_if_empty(self, name, value):
+        if not value:
+            key = _encode(name)
+            self.store.data.pop(key, None)
+            self.store.expires.pop(key, None)
+
+    # ====================================== Chaves ====================================================
+
+    def ping(self) -> bool:
+        return True
+
+    def exists(self, *names) -> int:
+        return self.execute_command("EXISTS", *names)
+
+    @_handler("EXISTS")
+    def _exists(self, *names) -> int:
+        return sum(1 for name in names if self._live(_encode(name)) is not None)
+
+    def delete(self, *names) -> int:
+        return self.execute_command("DEL", *names)
+
+    @_handler("DEL")
+    def _delete(self, *names) -> int:
+        deleted = 0
+        for name in names:
+            key = _encode(name)
+            if self._live(key) is not None:
+                del self.store.data[key]
+                self.store.expires.pop(key, None)
+                deleted += 1
+
+        return deleted
+
+    def expire(self, name, seconds) -> bool:
+        return self.execute_command("EXPIRE", name, seconds)
+
+    @_handler("EXPIRE")
+    def _expire(self, name, seconds) -> bool:
+        key = _encode(name)
+        if self._live(key) is None:
+            return False
+
+        self.store.expires[key] = time.monotonic() + float(seconds)
+        return True
+
+    def keys(self, pattern="*") -> list:
+        return self.execute_command("KEYS", pattern)
+
+    @_handler("KEYS")
+    def _keys(self, pattern="*") -> list:
+        pattern = _encode(pattern).decode()
+        return [self._decode(key) for key in list(self.store.data) if self._live(key) is not None and fnmatch.fnmatchcase(key.decode(), pattern)]
+
+    def scan_iter(self, match=None, count=None, _type=None):
+        yield from self.keys(match or "*")
+
+    def flushdb(self) -> bool:
+        return self.execute_command("FLUSHDB")
+
+    @_handler("FLUSHDB")
+    def _flushdb(self) -> bool:
+        self.store.data.clear()
+        self.store.expires.clear()
+        return True
+
+    # ====================================== Strings ===================================================
+
+    def get(self, name):
+        return self.execute_command("GET", name)
+
+    @_handler("GET")
+    def _get_string(self, name):
+        return self._decode(self._get(name, bytes))
+
+    def set(self, name, value, ex=None, nx: bool = False):
+        return self.execute_command("SET", name, value, ex, nx)
+
+    @_handler("SET")
+    def _set(self, name, value, ex=None, nx: bool = False):
+        key = _encode(name)
+        if nx and self._live(key) is not None:
+            return None
+
+        self.store.data[key] = _encode(value)
+        self.store.expires.pop(key, None)
+        if ex is not None:
+            self.store.expires[key] = time.monotonic() + float(ex)
+
+        return True
+
+    def incrby(self, name, amount: int = 1) -> int:
+        return self.execute_command("INCRBY", name, amount)
+
+    def incr(self, name, amount: int = 1) -> int:
+        return self.execute_command("INCRBY", name, amount)
+
+    @_handler("INCRBY")
+    def _incrby(self, name, amount: int = 1) -> int:
+        value = int(self._get(name, bytes) or 0) + int(amount)
+        self.store.data[_encode(name)] = str(value).encode()
+        return value
+
+    # ====================================== Hashes ====================================================
+
+    def hset(self, name, key=None, value=None, mapping: dict | None = None, items: list | None = None) -> int:
+        pairs = []
+        if key is not None:
+            pairs.append((key, value))
+        if mapping:
+            pairs.extend(mapping.items())
+        if items:
+            pairs.extend(zip(items[::2], items[1::2]))
+        if not pairs:
+            raise DataError("'hset' with no key value pairs")
+
+        return self.execute_command("HSET", name, pairs)
+
+    def hmset(self, name, mapping: dict) -> bool:
+        if not mapping:
+            raise DataError("'hmset' with 'mapping' of length 0")
+
+        return self.execute_command("HMSET", name, list(mapping.items()))
+
+    @_handler("HSET")
+    def _hset(self, name, pairs: list) -> int:
+        hash_value = self._get(name, dict, create=True)
+        added = 0
+        for field, field_value in pairs:
+            field = _encode(field)
+            added += field not in hash_value
+            hash_value[field] = _encode(field_value)
+
+        return added
+
+    @_handler("HMSET")
+    def _hmset(self, name, pairs: list) -> bool:
+        self._hset(name, pairs)
+        return True
+
+    def hsetnx(self, name, key, value) -> bool:
+        return self.execute_command("HSETNX", name, key, value)
+
+    @_handler("HSETNX")
+    def _hsetnx(self, name, key, value) -> bool:
+        hash_value = self._get(name, dict, create=True)
+        field = _encode(key)
+        if field in hash_value:
+            return False
+
+        hash_value[field] = _encode(value)
+        return True
+
+    def hget(self, name, key):
+        return self.execute_command("HGET", name, key)
+
+    @_handler("HGET")
+    def _hget(self, name, key):
+        hash_value = self._get(name, dict)
+        return self._decode(hash_value.get(_encode(key))) if hash_value else None
+
+    def hmget(self, name, keys, *args) -> list:
+        fields = list(keys) if isinstance(keys, (list, tuple)) else [keys]
+        fields.extend(args)
+        return self.execute_command("HMGET", name, fields)
+
+    @_handler("HMGET")
+    def _hmget(self, name, fields: list) -> list:
+        hash_value = self._get(name, dict) or {}
+        return [self._decode(hash_value.get(_encode(field))) for field in fields]
+
+    def hgetall(self, name) -> dict:
+        return self.execute_command("HGETALL", name)
+
+    @_handler("HGETALL")
+    def _hgetall(self, name) -> dict:
+        hash_value = self._get(name, dict) or {}
+        return {self._decode(field): self._decode(value) for field, value in hash_value.items()}
+
+    def hdel(self, name, *keys) -> int:
+        return self.execute_command("HDEL", name, *keys)
+
+    @_handler("HDEL")
+    def _hdel(self, name, *keys) -> int:
+        hash_value = self._get(name, dict)
+        if not hash_value:
+            return 0
+
+        deleted = sum(1 for key in keys if hash_value.pop(_encode(key), None) is not None)
+        self._drop_if_empty(name, hash_value)
+        return deleted
+
+    def hexists(self, name, key) -> bool:
+        return self.execute_command("HEXISTS", name, key)
+
+    @_handler("HEXISTS")
+    def _hexists(self, name, key) -> bool:
+        return _encode(key) in (self._get(name, dict) or {})
+
+    def hlen(self, name) -> int:
+        return self.execute_command("HLEN", name)
+
+    @_handler("HLEN")
+    def _hlen(self, name) -> int:
+        return len(self._get(name, dict) or {})
+
+    def hkeys(self, name) -> list:
+        return self.execute_command("HKEYS", name)
+
+    @_handler("HKEYS")
+    def _hkeys(self, name) -> list:
+        return [self._decode(field) for field in (self._get(name, dict) or {})]
+
+    def hincrby(self, name, key, amount: int = 1) -> int:
+        return self.execute_command("HINCRBY", name, key, amount)
+
+    @_handler("HINCRBY")
+    def _hincrby(self, name, key, amount: int = 1) -> int:
+        hash_value = self._get(name, dict, create=True)
+        field = _encode(key)
+        value = int(hash_value.get(field, b"0")) + int(amount)
+        hash_value[field] = str(value).encode()
+        return value
+
+    # ====================================== Listas ====================================================
+
+    def rpush(self, name, *values) -> int:
+        return self.execute_command("RPUSH", name, *values)
+
+    @_handler("RPUSH")
+    def _rpush(self, name, *values) -> int:
+        list_value = self._get(name, list, create=True)
+        list_value.extend(_encode(value) for value in values)
+        self.store.pushed.notify_all()
+        return len(list_value)
+
+    def lpush(self, name, *values) -> int:
+        return self.execute_command("LPUSH", name, *values)
+
+    @_handler("LPUSH")
+    def _lpush(self, name, *values) -> int:
+        list_value = self._get(name, list, create=True)
+        for value in values:
+            list_value.insert(0, _encode(value))
+        self.store.pushed.notify_all()
+        return len(list_value)
+
+    def lpop(self, name, count: int | None = None):
+        return self.execute_command("LPOP", name, count)
+
+    @_handler("LPOP")
+    def _lpop(self, name, count: int | None = None):
+        list_value = self._get(name, list)
+        if not list_value:
+            return None
+
+        if count is None:
+            values = [list_value.pop(0)]
+        else:
+            values = list_value[:count]
+            del list_value[:count]
+        self._drop_if_empty(name, list_value)
+
+        values = [self._decode(value) for value in values]
+        return values[0] if count is None else values
+
+    def rpop(self, name):
+        return self.execute_command("RPOP", name)
+
+    @_handler("RPOP")
+    def _rpop(self, name):
+        list_value = self._get(name, list)
+        if not list_value:
+            return None
+
+        value = list_value.pop()
+        self._drop_if_empty(name, list_value)
+        return self._decode(value)
+
+    def blpop(self, keys, timeout: float = 0):
+        keys = [keys] if isinstance(keys, (bytes, str)) else list(keys)
+        return self.execute_command("BLPOP", keys, timeout)
+
+    @_handler("BLPOP")
+    def _blpop(self, keys: list, timeout: float = 0):
+        # O wait libera o lock do banco enquanto aguarda uma inserção
+        deadline = time.monotonic() + timeout if timeout else None
+        while True:
+            for name in keys:
+                value = self._lpop(name)
+                if value is not None:
+                    return (self._decode(_encode(name)), value)
+
+            remaining = deadline - time.monotonic() if deadline is not None else None
+            if remaining is not None and remaining <= 0:
+                return None
+            self.store.pushed.wait(remaining)
+
+    def llen(self, name) -> int:
+        return self.execute_command("LLEN", name)
+
+    @_handler("LLEN")
+    def _llen(self, name) -> int:
+        return len(self._get(name, list) or ())
+
+    def lrange(self, name, start: int, end: int) -> list:
+        return self.execute_command("LRANGE", name, start, end)
+
+    @_handler("LRANGE")
+    def _lrange(self, name, start: int, end: int) -> list:
+        list_value = self._get(name, list) or []
+        return [self._decode(value) for value in list_value[_slice(len(list_value), start, end)]]
+
+    def ltrim(self, name, start: int, end: int) -> bool:
+        return self.execute_command("LTRIM", name, start, end)
+
+    @_handler("LTRIM")
+    def _ltrim(self, name, start: int, end: int) -> bool:
+        list_value = self._get(name, list)
+        if list_value is not None:
+            list_value[:] = list_value[_slice(len(list_value), start, end)]
+            self._drop_if_empty(name, list_value)
+
+        return True
+
+    # ====================================== Conjuntos =================================================
+
+    def sadd(self, name, *values) -> int:
+        return self.execute_command("SADD", name, *values)
+
+    @_handler("SADD")
+    def _sadd(self, name, *values) -> int:
+        set_value = self._get(name, set, create=True)
+        before = len(set_value)
+        set_value.update(_encode(value) for value in values)
+        return len(set_value) - before
+
+    def srem(self, name, *values) -> int:
+        return self.execute_command("SREM", name, *values)
+
+    @_handler("SREM")
+    def _srem(self, name, *values) -> int:
+        set_value = self._get(name, set)
+        if not set_value:
+            return 0
+
+        before = len(set_value)
+        set_value.difference_update(_encode(value) for value in values)
+        self._drop_if_empty(name, set_value)
+        return before - len(set_value)
+
+    def smembers(self, name) -> set:
+        return self.execute_command("SMEMBERS", name)
+
+    @_handler("SMEMBERS")
+    def _smembers(self, name) -> set:
+        return {self._decode(value) for value in (self._get(name, set) or ())}
+
+    def sismember(self, name, value) -> bool:
+        return self.execute_command("SISMEMBER", name, value)
+
+    @_handler("SISMEMBER")
+    def _sismember(self, name, value) -> bool:
+        return _encode(value) in (self._get(name, set) or ())
+
+    def scard(self, name) -> int:
+        return self.execute_command("SCARD", name)
+
+    @_handler("SCARD")
+    def _scard(self, name) -> int:
+        return len(self._get(name, set) or ())
+
+    # ====================================== Conjuntos ordenados =======================================
+
+    def zadd(self, name, mapping: dict) -> int:
+        if not mapping:
+            raise DataError("ZADD requires at least one element/score pair")
+
+        return self.execute_command("ZADD", name, list(mapping.items()))
+
+    @_handler("ZADD")
+    def _zadd(self, name, pairs: list) -> int:
+        zset = self._get(name, _SortedSet, create=True)
+        added = 0
+        for member, score in pairs:
+            member = _encode(member)
+            added += member not in zset
+            zset[member] = float(score)
+
+        return added
+
+    def zrem(self, name, *values) -> int:
+        return self.execute_command("ZREM", name, *values)
+
+    @_handler("ZREM")
+    def _zrem(self, name, *values) -> int:
+        zset = self._get(name, _SortedSet)
+        if not zset:
+            return 0
+
+        removed = sum(1 for value in values if zset.pop(_encode(value), None) is not None)
+        self._drop_if_empty(name, zset)
+        return removed
+
+    def zcard(self, name) -> int:
+        return self.execute_command("ZCARD", name)
+
+    @_handler("ZCARD")
+    def _zcard(self, name) -> int:
+        return len(self._get(name, _SortedSet) or ())
+
+    def _ranked(self, name, withscores: bool) -> list:
+        # Do maior para o menor score, empates pelo membro em ordem reversa, como no ZREVRANGE
+        zset = self._get(name, _SortedSet) or {}
+        ranked = sorted(zset.items(), key=lambda item: (item[1], item[0]), reverse=True)
+        if withscores:
+            return [(self._decode(member), score) for member, score in ranked]
+
+        return [self._decode(member) for member, _ in ranked]
+
+    def zrange(self, name, start: int, end: int, withscores: bool = False) -> list:
+        return self.execute_command("ZRANGE", name, start, end, withscores)
+
+    @_handler("ZRANGE")
+    def _zrange(self, name, start: int, end: int, withscores: bool = False) -> list:
+        ranked = self._ranked(name, withscores)[::-1]
+        return ranked[_slice(len(ranked), start, end)]
+
+    def zrevrange(self, name, start: int, end: int, withscores: bool = False) -> list:
+        return self.execute_command("ZREVRANGE", name, start, end, withscores)
+
+    @_handler("ZREVRANGE")
+    def _zrevrange(self, name, start: int, end: int, withscores: bool = False) -> list:
+        ranked = self._ranked(name, withscores)
+        return ranked[_slice(len(ranked), start, end)]
+
+    def zrevrangebyscore(self, name, max, min, start: int | None = None, num: int | None = None, withscores: bool = False) -> list:
+        if (start is None) != (num is None):
+            raise DataError("``start`` and ``num`` must both be specified")
+
+        return self.execute_command("ZREVRANGEBYSCORE", name, max, min, start, num, withscores)
+
+    @_handler("ZREVRANGEBYSCORE")
+    def _zrevrangebyscore(self, name, max, min, start: int | None = None, num: int | None = None, withscores: bool = False) -> list:
+        high, high_exclusive = _score_bound(max)
+        low, low_exclusive = _score_bound(min)
+
+        ranked = [
+            item for item in self._ranked(name, True)
+            if (low < item[1] if low_exclusive else low <= item[1]) and (item[1] < high if high_exclusive else item[1] <= high)
+        ]
+        if start is not None:
+            ranked = ranked[start:start + num] if num >= 0 else ranked[start:]
+
+        return ranked if withscores else [member for member, _ in ranked]
+
+    # ====================================== Pipelines =================================================
+
+    def pipeline(self, transaction: bool = True, shard_hint=None) -> "MemoryPipeline":
+        return MemoryPipeline(self.store, self.decode_responses)
+
+class MemoryPipeline(MemoryRedis):
+    """
+    Enfileira os comandos e os executa em `execute`, sob o lock do banco (atômico, como MULTI/EXEC).
+    """
+    def __init__(self, store: MemoryStore, decode_responses: bool = True):
+        super().__init__(store, decode_responses)
+        self.command_stack = []
+
+    def execute_command(self, *args, **options):
+        self.command_stack.append(args)
+        return self
+
+    def __len__(self) -> int:
+        return len(self.command_stack)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.reset()
+
+    def reset(self):
+        self.command_stack = []
+
+    def execute(self, raise_on_error: bool = True) -> list:
+        stack, self.command_stack = self.command_stack, []
+        results = []
+        with self.store.lock:
+            for args in stack:
+                try:
+                    results.append(_handlers[args[0]](self, *args[1:]))
+                except ResponseError as e:
+                    if raise_on_error:
+                        raise
+                    results.append(e)
+
+        return results
@@ -0,0 +1,160 @@
+import threading
+import time
+
+from app.core.logger import get_logger
+from app.services.latency_service import latency_tracker, LatencyHistogram, STAGES
+
+logger = get_logger(__name__)
+
+# Contadores: nome -> (descrição, nomes dos labels)
+COUNTERS = {
+    "gateway_packets_received_total": ("Frames completos recebidos dos rastreadores", ("protocol",)),
+    "gateway_packets_translated_total": ("Pacotes traduzidos para o servidor principal", ("input_protocol", "output_protocol", "packet_type")),
+    "gateway_packets_sent_total": ("Escritas no socket do servidor principal (inclui login, voltagem e heartbeats)", ("output_protocol",)),
+    "gateway_crc_failures_total": ("Frames descartados por CRC inválido", ("protocol",)),
+    "gateway_undecodable_frames_total": ("Frames ou bytes descartados sem tradução", ("protocol", "reason")),
+    "gateway_upstream_connects_total": ("Tentativas de conexão com o servidor principal", ("output_protocol", "result")),
+    "gateway_upstream_reconnects_total": ("Conexões com o servidor principal reabertas por uma sessão que já havia conectado", ("output_protocol",)),
+    "gateway_redis_commands_total": ("Comandos Redis executados (um pipeline conta como um comando PIPELINE)", ("command",)),
+}
+
+# Limites (segundos) dos buckets exportados a partir dos histogramas internos
+HISTOGRAM_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Metrics:
+    """
+    Contadores do gateway no formato de exposição do Prometheus.
+    Incrementar é uma atualização de dicionário sem lock (uma contagem pode se perder sob concorrência);
+    os gauges são calculados apenas na coleta (`render`).
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+                    cls._instance._counters = {}
+                    cls._instance.redis_latency = LatencyHistogram()
+
+        return cls._instance
+
+    def inc(self, name: str, *labels, amount: int = 1):
+        key = (name, labels)
+        self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe_redis(self, command, seconds: float):
+        self.inc("gateway_redis_commands_total", command)
+        self.redis_latency.record(seconds)
+
+    def counter(self, name: str, *labels) -> int:
+        return self._counters.get((name, labels), 0)
+
+    # ====================================== Exposição =================================================
+
+    def _render_counters(self, lines: list):
+        by_name = {}
+        for (name, labels), value in list(self._counters.items()):
+            by_name.setdefault(name, []).append((labels, value))
+
+        for name, (description, label_names) in COUNTERS.items():
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} counter")
+            for labels, value in sorted(by_name.get(name, ())):
+                lines.append(f"{name}{_labels(label_names, labels)} {value}")
+
+    @staticmethod
+    def _render_histogram(lines: list, name: str, label_names: tuple, labels: tuple, histogram: LatencyHistogram):
+        for bound, count in zip(HISTOGRAM_BUCKETS, histogram.cumulative_counts(HISTOGRAM_BUCKETS)):
+            le = 'le="' + str(bound) + '"'
+            lines.append(f"{name}_bucket{_labels(label_names, labels, le)} {count}")
+
+        le = 'le="+Inf"'
+        lines.append(f"{name}_bucket{_labels(label_names, labels, le)} {histogram.count}")
+        lines.append(f"{name}_sum{_labels(label_names, labels)} {histogram.total}")
+        lines.append(f"{name}_count{_labels(label_names, labels)} {histogram.count}")
+
+    @staticmethod
+    def _render_gauge(lines: list, name: str, description: str, label_names: tuple, samples):
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} gauge")
+        for labels, value in samples:
+            lines.append(f"{name}{_labels(label_names, labels)} {value}")
+
+    def render(self) -> str:
+        # Importados aqui: os gerenciadores de sessão importam este módulo
+        from app.src.session.input_sessions_manager import input_sessions_manager
+        from app.src.session.output_sessions_manager import output_sessions_manager
+        from app.services.history_service import get_history_service_stats
+
+        lines = []
+        self._render_counters(lines)
+
+        lines.append("# HELP gateway_redis_command_seconds Duração dos comandos Redis")
+        lines.append("# TYPE gateway_redis_command_seconds histogram")
+        self._render_histogram(lines, "gateway_redis_command_seconds", (), (), self.redis_latency)
+
+        lines.append("# HELP gateway_stage_seconds Duração de cada etapa do pipeline de tradução por pacote (latency_service)")
+        lines.append("# TYPE gateway_stage_seconds histogram")
+        for protocol, stages in sorted(latency_tracker.histograms().items()):
+            for stage in STAGES:
+                if stage in stages:
+                    self._render_histogram(lines, "gateway_stage_seconds", ("protocol", "stage"), (protocol, stage), stages[stage])
+
+        usage = sorted(latency_tracker.redis_usage_stats().items())
+        self._render_gauge(lines, "gateway_packet_redis_round_trips_max", "Maior quantidade de idas e voltas ao Redis em um pacote", ("protocol", "packet_type"),
+                           [(key, stats.max_round_trips) for key, stats in usage])
+        lines.append("# HELP gateway_packet_redis_round_trips_total Idas e voltas ao Redis feitas pelos pacotes rastreados (dividir por gateway_traced_packets_total)")
+        lines.append("# TYPE gateway_packet_redis_round_trips_total counter")
+        for key, stats in usage:
+            lines.append(f"gateway_packet_redis_round_trips_total{_labels(('protocol', 'packet_type'), key)} {stats.round_trips}")
+        lines.append("# HELP gateway_traced_packets_total Pacotes processados com o rastro de latência ligado")
+        lines.append("# TYPE gateway_traced_packets_total counter")
+        for key, stats in usage:
+            lines.append(f"gateway_traced_packets_total{_labels(('protocol', 'packet_type'), key)} {stats.packets}")
+
+        # Sessões: contagens por protocolo sem consultar o Redis
+        input_sessions = {}
+        for conn in list(input_sessions_manager.active_trackers.values()):
+            protocol = conn.protocol or ""
+            input_sessions[protocol] = input_sessions.get(protocol, 0) + 1
+        self._render_gauge(lines, "gateway_input_sessions", "Sessões ativas de rastreadores", ("protocol",), sorted(((protocol,), count) for protocol, count in input_sessions.items()))
+
+        output_sessions = {}
+        for session in list(output_sessions_manager._sessions.values()):
+            key = (session.output_protocol or "", "true" if session._is_connected else "false")
+            output_sessions[key] = output_sessions.get(key, 0) + 1
+        self._render_gauge(lines, "gateway_output_sessions", "Sessões com o servidor principal", ("output_protocol", "connected"), sorted(output_sessions.items()))
+
+        self._render_gauge(lines, "gateway_threads", "Threads do processo", (), [((), threading.active_count())])
+
+        # Histórico: publicado pelos workers no Redis (um pipeline por coleta)
+        try:
+            history_stats = get_history_service_stats()
+        except Exception as e:
+            logger.warning(f"Falha ao obter estatísticas do histórico para /metrics: {e}", log_label="SERVIDOR")
+            history_stats = {}
+
+        now = time.time()
+        self._render_gauge(lines, "gateway_history_queue_length", "Itens aguardando na fila do worker de histórico", ("queue",),
+                           [((queue,), stats.get("queue_length") or 0) for queue, stats in history_stats.items()])
+        self._render_gauge(lines, "gateway_history_lag_seconds", "Atraso do item mais antigo processado pelo worker de histórico", ("queue",),
+                           [((queue,), stats["lag_seconds"]) for queue, stats in history_stats.items() if stats.get("lag_seconds") is not None])
+        self._render_gauge(lines, "gateway_history_stats_age_seconds", "Tempo desde a última publicação de estatísticas do worker", ("queue",),
+                           [((queue,), round(now - float(stats["updated_at"]), 3)) for queue, stats in history_stats.items() if stats.get("updated_at")])
+
+        lines.append("")
+        return "\n".join(lines)
+
+metrics = Metrics()
@@ -1,33 +1,120 @@
 
+import threading
+import time
 import redis
+from redis.client import Pipeline
 
 from app.core.logger import get_logger
 from app.config.settings import settings
-from functools import lru_cache
+from app.services.latency_service import latency_tracker
+from app.services.memory_store import MemoryPipeline, MemoryRedis, MemoryStore
+from app.services.metrics_service import metrics
 
 logger = get_logger(__name__)
 
-@lru_cache(maxsize=1)
-def get_redis(db: int | None = None, host: str | None = None, port: int | None = None, password: str | None = None, decode_responses: bool = True):
-    redis_conn = None
+# Observadores de cada ida e volta ao Redis: hook(comando, quantidade de comandos, segundos).
+# Um pipeline é uma ida e volta com o comando "PIPELINE" e a quantidade de comandos enfileirados.
+_round_trip_hooks = []
 
-    db = db if db is not None else settings.REDIS_DB_MAIN
-    host = host if host is not None else settings.REDIS_HOST
-    port = port if port is not None else settings.REDIS_PORT
-    password = password if password is not None else settings.REDIS_PASSWORD
+def add_round_trip_hook(hook):
+    _round_trip_hooks.append(hook)
+
+def remove_round_trip_hook(hook):
+    if hook in _round_trip_hooks:
+        _round_trip_hooks.remove(hook)
+
+def _observe_round_trip(command, commands: int, seconds: float):
+    metrics.observe_redis(command, seconds)
+    # Atribuída ao pacote em processamento na thread (protocolo e tipo de pacote)
+    latency_tracker.add_redis(seconds, commands)
+
+    for hook in _round_trip_hooks:
+        hook(command, commands, seconds)
+
+class _TimedPipeline(Pipeline):
+    """
+    Pipeline que registra a ida e volta do `execute` (métricas, pacote em processamento e observadores).
+    """
+
+    def execute(self, raise_on_error: bool = True):
+        commands = len(self.command_stack)
+        start = time.perf_counter()
+        try:
+            return super().execute(raise_on_error)
+        finally:
+            _observe_round_trip("PIPELINE", commands, time.perf_counter() - start)
+
+class TimedRedis(redis.Redis):
+    """
+    Cliente Redis que registra cada comando como uma ida e volta: contagem e duração (metrics_service),
+    tempo e quantidade por pacote em processamento na thread (latency_service) e observadores registrados.
+    """
+
+    def execute_command(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            return super().execute_command(*args, **options)
+        finally:
+            _observe_round_trip(args[0], 1, time.perf_counter() - start)
+
+    def pipeline(self, transaction: bool = True, shard_hint=None) -> Pipeline:
+        return _TimedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+class _TimedMemoryPipeline(MemoryPipeline):
+    """
+    Pipeline em memória instrumentado como o _TimedPipeline.
+    """
+
+    def execute(self, raise_on_error: bool = True):
+        commands = len(self.command_stack)
+        start = time.perf_counter()
+        try:
+            return super().execute(raise_on_error)
+        finally:
+            _observe_round_trip("PIPELINE", commands, time.perf_counter() - start)
+
+class TimedMemoryRedis(MemoryRedis):
+    """
+    Cliente em memória instrumentado como o TimedRedis: cada comando conta como uma ida e volta, para que métricas,
+    rastro de latência e orçamentos de idas e voltas valham também sem um servidor Redis.
+    """
+
+    def execute_command(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            return super().execute_command(*args, **options)
+        finally:
+            _observe_round_trip(args[0], 1, time.perf_counter() - start)
+
+    def pipeline(self, transaction: bool = True, shard_hint=None) -> MemoryPipeline:
+        return _TimedMemoryPipeline(self.store, self.decode_responses)
+
+# Backends de armazenamento, selecionados por settings.STORAGE_BACKEND: nome -> fábrica(db, host, port, password, decode_responses).
+# A fábrica retorna um cliente com a interface do redis.Redis para o subconjunto usado pelo gateway: chaves (exists, delete,
+# expire, scan_iter), strings (get, set, incr), hashes (hset, hmset, hsetnx, hget, hmget, hgetall, hdel, hincrby),
+# listas (rpush, lpop, blpop, llen, ltrim), conjuntos (sadd, srem, smembers, sismember), conjuntos ordenados
+# (zadd, zrem, zrange, zrevrange, zrevrangebyscore) e pipeline()/execute().
+_storage_backends = {}
+
+def register_storage_backend(name: str, factory):
+    _storage_backends[name] = factory
+
+def _connect_redis(db: int, host: str, port: int, password: str, decode_responses: bool):
+    redis_conn = None
     logger.info(f"Connecting to Redis DB {db} at {host}:{port} with ConnectionPool", log_label="SERVIDOR")
 
     try:
         connection_pool = redis.ConnectionPool(max_connections=50, db=db, host=host, port=port, password=password, decode_responses=decode_responses)
-        redis_conn = redis.Redis(connection_pool=connection_pool)
+        redis_conn = TimedRedis(connection_pool=connection_pool)
         redis_conn.ping()
         logger.info(f"Successfully connected to Redis DB {db} at {host}:{port}", log_label="SERVIDOR")
     except redis.ConnectionError as e:
         import traceback
         import inspect
 
+        # Quadro de quem chamou get_redis
         frame = inspect.currentframe()
-        caller_frame = frame.f_back
+        caller_frame = frame.f_back.f_back
         
         filename = caller_frame.f_code.co_filename
         line_number = caller_frame.f_lineno
@@ -39,4 +126,39 @@ def get_redis(db: int | None = None, host: str | None = None, port: int | None =
         logger.info(traceback.format_exc(), log_label="SERVIDOR")
         exit(1)
 
-    return redis_conn
\ No newline at end of file
+    return redis_conn
+
+# Um banco em memória por número de banco, compartilhado pelos clientes com e sem decode_responses
+_memory_stores = {}
+
+def _connect_memory(db: int, host: str, port: int, password: str, decode_responses: bool):
+    store = _memory_stores.setdefault(db, MemoryStore())
+    logger.info(f"Usando armazenamento em memória para o DB {db}", log_label="SERVIDOR")
+    return TimedMemoryRedis(store, decode_responses)
+
+register_storage_backend("redis", _connect_redis)
+register_storage_backend("memory", _connect_memory)
+
+# Um cliente por backend e parâmetros de conexão (os módulos pedem variantes com e sem decode_responses e outros bancos)
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_redis(db: int | None = None, host: str | None = None, port: int | None = None, password: str | None = None, decode_responses: bool = True):
+    db = db if db is not None else settings.REDIS_DB_MAIN
+    host = host if host is not None else settings.REDIS_HOST
+    port = port if port is not None else settings.REDIS_PORT
+    password = password if password is not None else settings.REDIS_PASSWORD
+    key = (settings.STORAGE_BACKEND, db, host, port, password, decode_responses)
+
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                factory = _storage_backends.get(settings.STORAGE_BACKEND)
+                if factory is None:
+                    raise ValueError(f"Backend de armazenamento desconhecido: {settings.STORAGE_BACKEND} (disponíveis: {', '.join(_storage_backends)})")
+
+                client = _clients[key] = factory(db, host, port, password, decode_responses)
+
+    return client
@@ -1,13 +1,16 @@
 import socket
 import struct
 
-from app.core.logger import get_logger
+from app.core.logger import get_logger, lazy
 from .processor import process_packet
 from app.src.session.input_sessions_manager import input_sessions_manager
+from app.src.session.tracker_connection import TrackerConnection
 from app.services.redis_service import get_redis
+from app.services.metrics_service import metrics
 from app.src.session.output_sessions_manager import output_sessions_manager
 
 logger = get_logger(__name__)
+packet_logger = get_logger(__name__, sampled=True)
 redis_client = get_redis()
 
 def handle_connection(conn: socket.socket, addr):
@@ -15,6 +18,7 @@ def handle_connection(conn: socket.socket, addr):
     Lida com uma única conexão de cliente GP900M, gerenciando o estado da sessão.
     """
     logger.info(f"Nova conexão GP900M recebida endereco={addr}", log_label="SERVIDOR")
+    conn = TrackerConnection(conn, addr, "gp900m")
     buffer = b''
     dev_id_session = None
 
@@ -59,11 +63,16 @@ def handle_connection(conn: socket.socket, addr):
 
                             # Corpo do pacote que vai para o processador: Ack(1) + DevID(8) + Serial(2) + Timestamp(4) + Event + LengthByteLen + LengthBody
                             packet_body = raw_packet[1:]
-                            logger.info(f"Recebido pacote GP900M: {packet_body.hex()}")
+                            packet_logger.debug("Recebido pacote GP900M: {}", lazy(packet_body.hex))
 
                             # Chama o processador, passando o ID da sessão
                             payload_starts_at -= 1 # Retirando um pois passaremos o pacote depois do Byte de start packet_body[1:]
-                            new_dev_id = process_packet(payload_starts_at, packet_body, conn)
+                            conn.begin_packet(bool(buffer))
+                            try:
+                                new_dev_id = process_packet(payload_starts_at, packet_body, conn)
+                            finally:
+                                # Fecha o rastro de latência mesmo se o processamento falhar, para não contaminar o próximo pacote
+                                conn.end_packet()
                             
                             if new_dev_id and new_dev_id != dev_id_session:
                                 dev_id_session = new_dev_id
@@ -105,15 +114,20 @@ def handle_connection(conn: socket.socket, addr):
                         if next_start != -1:
                             dados_descartados = buffer[:next_start]
                             logger.warning(f"Dados desalinhados no buffer, descartando {len(dados_descartados)} bytes dados={dados_descartados.hex()}")
+                            metrics.inc("gateway_undecodable_frames_total", "gp900m", "misaligned")
                             buffer = buffer[next_start:]
                         else:
                             # Nenhum início válido encontrado, limpa o buffer
                             buffer = b''
+
+                # Enviando, em uma única escrita, os ACKs gerados por esse recv
+                conn.flush()
     
     except (ConnectionResetError, BrokenPipeError):
         logger.warning(f"Conexão GP900M fechada abruptamente endereco={addr}, device_id={dev_id_session}", log_label="SERVIDOR")
     except Exception:
         logger.exception(f"Erro fatal na conexão GP900M endereco={addr}, device_id={dev_id_session}", log_label="SERVIDOR")
+        metrics.inc("gateway_undecodable_frames_total", "gp900m", "error")
     finally:
         logger.debug(f"[DIAGNOSTIC] Entering finally block for GP900M handler (addr={addr}, dev_id={dev_id_session}", log_label="SERVIDOR")
         if dev_id_session:
@@ -126,7 +140,9 @@ def handle_connection(conn: socket.socket, addr):
 
         try:
             conn.shutdown(socket.SHUT_RDWR)
-            conn.close()
-            conn = None
         except Exception as e:
-            logger.error(f"Impossível limpar conexão com rastreador dev_id={dev_id_session}", log_label="SERVIDOR")
\ No newline at end of file
+            logger.error(f"Impossível limpar conexão com rastreador dev_id={dev_id_session}", log_label="SERVIDOR")
+        finally:
+            # Sempre fechar, mesmo se o shutdown falhar (ex.: conexão resetada): encerra a thread escritora e libera o socket
+            conn.close()
+            conn = None
\ No newline at end of file
@@ -4,7 +4,7 @@ import json
 import copy
 from dateutil import parser
 
-from app.core.logger import get_logger
+from app.core.logger import get_logger, lazy
 from app.services.redis_service import get_redis
 from ..utils import handle_ignition_change
 from app.config.settings import settings
@@ -37,13 +37,13 @@ def decode_general_report(payload: bytes):
         if (mask >> 1) & 0b1: # GPS timestamp present
             gps_timestamp_bytes = payload[parser_at:parser_at + 4]
             data["timestamp"] = decode_timestamp(gps_timestamp_bytes)
-            logger.debug(f"gps_timestamp_bytes={gps_timestamp_bytes.hex()}, timestamp={data['timestamp']}")
+            logger.debug("gps_timestamp_bytes={}, timestamp={}", lazy(gps_timestamp_bytes.hex), data['timestamp'])
 
             parser_at += 4
 
         if (mask >> 2) & 0b1: # Lat e Lon present
             lat_long_bytes = payload[parser_at:parser_at + 8]
-            logger.debug(f"lat_long_bytes={lat_long_bytes.hex()}")
+            logger.debug("lat_long_bytes={}", lazy(lat_long_bytes.hex))
             
             encodedLat, encodedLon = struct.unpack(">II", lat_long_bytes)
             latitude = (encodedLat / 1000000.0) - 90.0
@@ -57,7 +57,7 @@ def decode_general_report(payload: bytes):
 
         if (mask >> 3) & 0b1: # Speed And Direction Degrees present
             speed_degree = payload[parser_at:parser_at + 3]
-            logger.debug(f"speed_degree={speed_degree.hex()}")
+            logger.debug("speed_degree={}", lazy(speed_degree.hex))
 
             speed_kmh, direction = struct.unpack(">BH", speed_degree)
             
@@ -87,7 +87,7 @@ def decode_general_report(payload: bytes):
 
         if (mask >> 6) & 0b1: # Main Voltage present
             main_voltage_bytes = payload[parser_at:parser_at + 2]
-            logger.debug(f"main_voltage_bytes={main_voltage_bytes.hex()}")
+            logger.debug("main_voltage_bytes={}", lazy(main_voltage_bytes.hex))
 
             main_voltage = int.from_bytes(main_voltage_bytes, "big")
             voltage = main_voltage / 1000
@@ -137,7 +137,7 @@ def decode_general_report(payload: bytes):
 
         if (mask >> 14) & 0b1: # Odometer present
             odometer_bytes = payload[parser_at:parser_at + 4]
-            logger.debug(f"odometer_bytes={odometer_bytes.hex()}")
+            logger.debug("odometer_bytes={}", lazy(odometer_bytes.hex))
 
             odometer = int.from_bytes(odometer_bytes, "big")
 
@@ -5,6 +5,7 @@ from .. import utils
 from app.src.session.output_sessions_manager import send_to_main_server
 from app.core.logger import get_logger
 from app.services.redis_service import get_redis
+from app.services.metrics_service import metrics
 
 
 logger = get_logger(__name__)
@@ -51,15 +52,15 @@ def process_packet(payload_starts_at: int, packet_body: bytes, conn: socket.sock
         if packet_data:
             utils.log_mapped_packet(packet_data, "GP900M")
 
-            send_to_main_server(dev_id_str, packet_data, serial_number, packet_body.hex(), "GP900M")
+            send_to_main_server(dev_id_str, packet_data, serial_number, packet_body, "GP900M")
 
         last_alarm = None
         if alarm_packet_data:
             last_alarm = alarm_packet_data.get("universal_alert_id")
-            send_to_main_server(dev_id_str, alarm_packet_data, serial_number, packet_body.hex(), "GP900M", "alert" if isinstance(last_alarm, int) else "command_reply")
+            send_to_main_server(dev_id_str, alarm_packet_data, serial_number, packet_body, "GP900M", "alert" if isinstance(last_alarm, int) else "command_reply")
         
         if ign_alarm_packet_data and not last_alarm or ign_alarm_packet_data and last_alarm != ign_alarm_packet_data.get("universal_alert_id"):
-            send_to_main_server(dev_id_str, ign_alarm_packet_data, serial_number, packet_body.hex(), "GP900M", "alert")
+            send_to_main_server(dev_id_str, ign_alarm_packet_data, serial_number, packet_body, "GP900M", "alert")
 
         if needs_response: 
             response_to_device = builder.build_generic_response(payload_type, serial_number)
@@ -74,6 +75,7 @@ def process_packet(payload_starts_at: int, packet_body: bytes, conn: socket.sock
             
     else:
         logger.warning(f"Protocolo GP900M não mapeado: {hex(payload_type)} device_id={dev_id_str}")
+        metrics.inc("gateway_undecodable_frames_total", "gp900m", "unmapped")
         if needs_response: 
             response_to_device = builder.build_generic_response(payload_type, serial_number)
 
@@ -1,13 +1,16 @@
 import socket
 import struct
 
-from app.core.logger import get_logger
+from app.core.logger import get_logger, lazy
 from .processor import process_packet
 from app.src.session.input_sessions_manager import input_sessions_manager
+from app.src.session.tracker_connection import TrackerConnection
 from app.services.redis_service import get_redis
+from app.services.metrics_service import metrics
 from app.src.session.output_sessions_manager import output_sessions_manager
 
 logger = get_logger(__name__)
+packet_logger = get_logger(__name__, sampled=True)
 redis_client = get_redis()
 
 def handle_connection(conn: socket.socket, addr):
@@ -15,6 +18,7 @@ def handle_connection(conn: socket.socket, addr):
     Lida com uma única conexão de cliente J16W, gerenciando o estado da sessão.
     """
     logger.info(f"Nova conexão J16W recebida endereco={addr}", log_label="SERVIDOR")
+    conn = TrackerConnection(conn, addr, "j16w")
     buffer = b''
     dev_id_session = None
 
@@ -48,14 +52,20 @@ def handle_connection(conn: socket.socket, addr):
                             # Validação dos bits de parada
                             if not raw_packet.endswith(b'\x0d\x0a'):
                                 logger.warning(f"Pacote J16W com stop bits inválidos, descartando. pacote={raw_packet.hex()}")
+                                metrics.inc("gateway_undecodable_frames_total", "j16w", "stop_bits")
                                 continue
                             
                             # Corpo do pacote que vai para o processador: [Length(1) + Proto(1) + Conteúdo + Serial(2) + CRC(2)]
                             packet_body = raw_packet[2:-2]
-                            logger.info(f"Recebido pacote J16W (x79: {is_x79}): {packet_body.hex()}")
+                            packet_logger.debug("Recebido pacote J16W (x79: {}): {}", is_x79, lazy(packet_body.hex))
 
                             # Chama o processador, passando o ID da sessão
-                            new_dev_id = process_packet(dev_id_session, packet_body, conn, is_x79)
+                            conn.begin_packet(bool(buffer))
+                            try:
+                                new_dev_id = process_packet(dev_id_session, packet_body, conn, is_x79)
+                            finally:
+                                # Fecha o rastro de latência mesmo se o processamento falhar, para não contaminar o próximo pacote
+                                conn.end_packet()
                             
                             if new_dev_id and new_dev_id != dev_id_session:
                                 dev_id_session = new_dev_id
@@ -101,15 +111,20 @@ def handle_connection(conn: socket.socket, addr):
                         if next_start != -1:
                             dados_descartados = buffer[:next_start]
                             logger.warning(f"Dados desalinhados no buffer, descartando {len(dados_descartados)} bytes dados={dados_descartados.hex()}")
+                            metrics.inc("gateway_undecodable_frames_total", "j16w", "misaligned")
                             buffer = buffer[next_start:]
                         else:
                             # Nenhum início válido encontrado, limpa o buffer
                             buffer = b''
+
+                # Enviando, em uma única escrita, os ACKs gerados por esse recv
+                conn.flush()
     
     except (ConnectionResetError, BrokenPipeError):
         logger.warning(f"Conexão J16W fechada abruptamente endereco={addr}, device_id={dev_id_session}", log_label="SERVIDOR")
     except Exception:
         logger.exception(f"Erro fatal na conexão J16W endereco={addr}, device_id={dev_id_session}", log_label="SERVIDOR")
+        metrics.inc("gateway_undecodable_frames_total", "j16w", "error")
     finally:
         logger.debug(f"[DIAGNOSTIC] Entering finally block for J16W handler (addr={addr}, dev_id={dev_id_session}", log_label="SERVIDOR")
         if dev_id_session:
@@ -122,7 +137,9 @@ def handle_connection(conn: socket.socket, addr):
 
         try:
             conn.shutdown(socket.SHUT_RDWR)
-            conn.close()
-            conn = None
         except Exception as e:
-            logger.error(f"Impossível limpar conexão com rastreador dev_id={dev_id_session}", log_label="SERVIDOR")
\ No newline at end of file
+            logger.error(f"Impossível limpar conexão com rastreador dev_id={dev_id_session}", log_label="SERVIDOR")
+        finally:
+            # Sempre fechar, mesmo se o shutdown falhar (ex.: conexão resetada): encerra a thread escritora e libera o socket
+            conn.close()
+            conn = None
\ No newline at end of file
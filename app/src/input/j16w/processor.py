@@ -6,6 +6,7 @@ from .. import utils
 from app.src.session.output_sessions_manager import send_to_main_server
 from app.core.logger import get_logger
 from app.services.redis_service import get_redis
+from app.services.metrics_service import metrics
 
 
 logger = get_logger(__name__)
@@ -28,6 +29,7 @@ def process_packet(dev_id_str: str | None, packet_body: bytes, conn: socket.sock
 
     if received_crc != calculated_crc:
         logger.warning(f"Checksum J16W inválido! pacote={packet_body.hex()}, crc_recebido={hex(received_crc)}, crc_calculado={hex(calculated_crc)}")
+        metrics.inc("gateway_crc_failures_total", "j16w")
         return None, None
     
     protocol_number = packet_body[1] if not is_x79 else packet_body[2]
@@ -50,10 +52,10 @@ def process_packet(dev_id_str: str | None, packet_body: bytes, conn: socket.sock
             location_packet_data, ign_alert_packet_data = mapper.handle_location_packet(dev_id_str, serial_number, content_body, protocol_number)
             if location_packet_data:
                 utils.log_mapped_packet(location_packet_data, "J16W")
-                send_to_main_server(dev_id_str, location_packet_data, serial_number, packet_body.hex(), "J16W")
+                send_to_main_server(dev_id_str, location_packet_data, serial_number, packet_body, "J16W")
 
             if ign_alert_packet_data:
-                send_to_main_server(dev_id_str, ign_alert_packet_data, serial_number, packet_body.hex(), "J16W", "alert", True)
+                send_to_main_server(dev_id_str, ign_alert_packet_data, serial_number, packet_body, "J16W", "alert", True)
                 
         else:
             logger.warning(f"Pacote de localização J16W recebido antes do login. Ignorando. pacote={packet_body.hex()}")
@@ -62,7 +64,7 @@ def process_packet(dev_id_str: str | None, packet_body: bytes, conn: socket.sock
     elif protocol_number == 0x13: # Pacote de Heartbeat/Status
         if dev_id_str:
             mapper.handle_heartbeat_packet(dev_id_str, serial_number, content_body)
-            send_to_main_server(dev_id_str, serial=serial_number, raw_packet_hex=packet_body.hex(), original_protocol="J16W", type="heartbeat")
+            send_to_main_server(dev_id_str, serial=serial_number, raw_packet=packet_body, original_protocol="J16W", type="heartbeat")
 
         else:
             logger.warning(f"Pacote de heartbeat J16W recebido antes do login. Ignorando. pacote={packet_body.hex()}")
@@ -73,7 +75,7 @@ def process_packet(dev_id_str: str | None, packet_body: bytes, conn: socket.sock
             alarm_packet_data = mapper.handle_alarm_packet(dev_id_str, content_body)
             if alarm_packet_data:
                 utils.log_mapped_packet(alarm_packet_data, "NT40")
-                send_to_main_server(dev_id_str, alarm_packet_data, serial_number, packet_body.hex(), "J16W", type="alert")
+                send_to_main_server(dev_id_str, alarm_packet_data, serial_number, packet_body, "J16W", type="alert")
 
         else:
             logger.warning(f"Pacote de alarme J16W recebido antes do login. Ignorando. pacote={packet_body.hex()}")
@@ -93,13 +95,14 @@ def process_packet(dev_id_str: str | None, packet_body: bytes, conn: socket.sock
             reply_command_packet_data = mapper.handle_reply_command_packet(dev_id_str, content_body)
             if reply_command_packet_data:
                 utils.log_mapped_packet(reply_command_packet_data, "NT40")
-                send_to_main_server(dev_id_str, reply_command_packet_data, serial_number, packet_body.hex(), type="command_reply", original_protocol="J16W")
+                send_to_main_server(dev_id_str, reply_command_packet_data, serial_number, packet_body, type="command_reply", original_protocol="J16W")
 
         else:
             logger.warning(f"Pacote de reply command J16W recebido antes do login. Ignorando. pacote={packet_body.hex()}")
 
     else:
         logger.warning(f"Protocolo J16W não mapeado: {hex(protocol_number)} device_id={dev_id_str}")
+        metrics.inc("gateway_undecodable_frames_total", "j16w", "unmapped")
         if protocol_number == 0x12:
             logger.info(f"Dispositivo J16W comunicando na variação x12, enviando comando de alteração.")
             switch_command = builder.build_command(dev_id_str, serial_number, "SZCS#GT06SEL=1")
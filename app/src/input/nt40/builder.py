@@ -1,6 +1,6 @@
 import struct
 
-from app.core.logger import get_logger
+from app.core.logger import get_logger, lazy
 from .. import utils
 from app.src.session.input_sessions_manager import input_sessions_manager
 
@@ -27,7 +27,7 @@ def build_generic_response(protocol_number: str, serial_number: int):
         b"\x0d\x0a"
     )
 
-    logger.debug(f"Construido pacote de resposta GTO6: {response_packet.hex()}")
+    logger.debug("Construido pacote de resposta GTO6: {}", lazy(response_packet.hex))
 
     return response_packet
 
@@ -5,6 +5,7 @@ from . import builder, mapper
 from .. import utils
 from app.core.logger import get_logger
 from app.services.redis_service import get_redis
+from app.services.metrics_service import metrics
 from app.src.session.output_sessions_manager import send_to_main_server
 
 
@@ -29,6 +30,7 @@ def process_packet(dev_id_str: str | None, packet_body: bytes, conn: socket.sock
 
     if received_crc != calculated_crc:
         logger.warning(f"Checksum NT40 inválido! pacote={packet_body.hex()}, crc_recebido={hex(received_crc)}, crc_calculado={hex(calculated_crc)}")
+        metrics.inc("gateway_crc_failures_total", "nt40")
         return None, None
     
     protocol_number = packet_body[1]
@@ -51,17 +53,17 @@ def process_packet(dev_id_str: str | None, packet_body: bytes, conn: socket.sock
             packet_data, alarm_from_location_packet_data, ign_alert_packet_data = mapper.handle_location_packet(dev_id_str, serial_number, content_body, protocol_number)
             if packet_data:
                 utils.log_mapped_packet(packet_data, "NT40")
-                send_to_main_server(dev_id_str, packet_data, serial_number, packet_body.hex(), original_protocol="NT40")
+                send_to_main_server(dev_id_str, packet_data, serial_number, packet_body, original_protocol="NT40")
 
             alarm_id = None
             if alarm_from_location_packet_data and alarm_from_location_packet_data.get("universal_alert_id"):
                 alarm_id = alarm_from_location_packet_data.get("universal_alert_id")
 
-                send_to_main_server(dev_id_str, alarm_from_location_packet_data, serial_number, packet_body.hex(), original_protocol="NT40", type="alert")
+                send_to_main_server(dev_id_str, alarm_from_location_packet_data, serial_number, packet_body, original_protocol="NT40", type="alert")
             
             if ign_alert_packet_data and ign_alert_packet_data.get("universal_alert_id"):
                 if not alarm_id or alarm_id != ign_alert_packet_data.get("universal_alert_id"):
-                    send_to_main_server(dev_id_str, ign_alert_packet_data, serial_number, packet_body.hex(), original_protocol="NT40", type="alert", managed_alert=True)
+                    send_to_main_server(dev_id_str, ign_alert_packet_data, serial_number, packet_body, original_protocol="NT40", type="alert", managed_alert=True)
 
         else:
             logger.warning(f"Pacote de localização NT40 recebido antes do login. Ignorando. pacote={packet_body.hex()}")
@@ -70,7 +72,7 @@ def process_packet(dev_id_str: str | None, packet_body: bytes, conn: socket.sock
     elif protocol_number == 0x13: # Pacote de Heartbeat/Status
         if dev_id_str:
             mapper.handle_heartbeat_packet(dev_id_str, serial_number, content_body)
-            send_to_main_server(dev_id_str, serial=serial_number, raw_packet_hex=packet_body.hex(), original_protocol="NT40", type="heartbeat")
+            send_to_main_server(dev_id_str, serial=serial_number, raw_packet=packet_body, original_protocol="NT40", type="heartbeat")
 
         else:
             logger.warning(f"Pacote de heartbeat NT40 recebido antes do login. Ignorando. pacote={packet_body.hex()}")
@@ -81,7 +83,7 @@ def process_packet(dev_id_str: str | None, packet_body: bytes, conn: socket.sock
             alarm_packet = mapper.handle_alarm_packet(dev_id_str, content_body)
             if alarm_packet:
                 utils.log_mapped_packet(alarm_packet, "NT40")
-                send_to_main_server(dev_id_str, alarm_packet, serial_number, packet_body.hex(), original_protocol="NT40", type="alert")
+                send_to_main_server(dev_id_str, alarm_packet, serial_number, packet_body, original_protocol="NT40", type="alert")
 
         else:
             logger.warning(f"Pacote de alarme NT40 recebido antes do login. Ignorando. pacote={packet_body.hex()}")
@@ -92,13 +94,14 @@ def process_packet(dev_id_str: str | None, packet_body: bytes, conn: socket.sock
             reply_packet = mapper.handle_reply_command_packet(dev_id_str, content_body)
             if reply_packet:
                 utils.log_mapped_packet(reply_packet, "NT40")
-                send_to_main_server(dev_id_str, reply_packet, serial_number, packet_body.hex(), original_protocol="NT40", type="command_reply")
+                send_to_main_server(dev_id_str, reply_packet, serial_number, packet_body, original_protocol="NT40", type="command_reply")
                 
         else:
             logger.warning(f"Pacote de reply command NT40 recebido antes do login. Ignorando. pacote={packet_body.hex()}")
 
     else:
         logger.warning(f"Protocolo NT40 não mapeado: {hex(protocol_number)} device_id={dev_id_str}")
+        metrics.inc("gateway_undecodable_frames_total", "nt40", "unmapped")
         response_to_device = builder.build_generic_response(protocol_number, serial_number)
 
     if response_to_device:
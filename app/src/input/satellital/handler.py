@@ -3,8 +3,10 @@ import json
 
 from app.core.logger import get_logger
 from app.services.redis_service import get_redis
+from app.services.metrics_service import metrics
 from . import processor
 from app.src.session.input_sessions_manager import input_sessions_manager
+from app.src.session.tracker_connection import TrackerConnection
 
 logger = get_logger(__name__)
 redis_client = get_redis()
@@ -17,6 +19,7 @@ def handle_connection(conn: socket.socket, addr):
     Handles a single satellital client connection, managing the session state.
     """
     logger.info(f"New Satellite connection received address={addr}", log_label="SERVIDOR")
+    conn = TrackerConnection(conn, addr, "satellital")
     buffer = b''
     esn_id = None
 
@@ -50,9 +53,15 @@ def handle_connection(conn: socket.socket, addr):
 
                 if data:
                     try:
-                        processor.process_packet(data)
+                        conn.begin_packet()
+                        try:
+                            processor.process_packet(data)
+                        finally:
+                            # Fecha o rastro de latência mesmo se o processamento falhar, para não contaminar o próximo pacote
+                            conn.end_packet()
                     except Exception as e:
                         logger.error(f"Error processing data: {e}")
+                        metrics.inc("gateway_undecodable_frames_total", "satellital", "error")
                     buffer = b''
                 else:
                     logger.debug("No complete data packet yet.")
@@ -61,12 +70,15 @@ def handle_connection(conn: socket.socket, addr):
         logger.warning(f"Satellite connection closed abruptly address={addr}, esn_id={esn_id}", log_label="SERVIDOR")
     except Exception:
         logger.exception(f"Fatal error in Satellite connection address={addr}, esn_id={esn_id}", log_label="SERVIDOR")
+        metrics.inc("gateway_undecodable_frames_total", "satellital", "error")
     finally:
         logger.info(f"Closing connection and Satellite thread address={addr}, esn_id={esn_id}", log_label="SERVIDOR")
 
         try:
             conn.shutdown(socket.SHUT_RDWR)
-            conn.close()
-            conn = None
         except Exception as e:
-            logger.error(f"Impossible to clean connection with tracker esn_id={esn_id}", log_label="SERVIDOR")
\ No newline at end of file
+            logger.error(f"Impossible to clean connection with tracker esn_id={esn_id}", log_label="SERVIDOR")
+        finally:
+            # Sempre fechar, mesmo se o shutdown falhar (ex.: conexão resetada): encerra a thread escritora e libera o socket
+            conn.close()
+            conn = None
\ No newline at end of file
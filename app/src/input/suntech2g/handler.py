@@ -1,15 +1,19 @@
 import socket
 from app.core.logger import get_logger
 from app.services.redis_service import get_redis
+from app.services.metrics_service import metrics
 from . import processor
 from app.src.session.input_sessions_manager import input_sessions_manager
+from app.src.session.tracker_connection import TrackerConnection
 from app.src.session.output_sessions_manager import output_sessions_manager
 
 logger = get_logger(__name__)
+packet_logger = get_logger(__name__, sampled=True)
 redis_client = get_redis()
 
 def handle_connection(conn: socket.socket, addr):
     logger.info(f"New connection from {addr}", log_label="SERVIDOR")
+    conn = TrackerConnection(conn, addr, "suntech2g")
     buffer = b''
     dev_id_session = None
 
@@ -21,7 +25,7 @@ def handle_connection(conn: socket.socket, addr):
                     logger.info(f"Connection with {addr} closed by client.")
                     break
 
-                logger.debug(f"Raw data received: {data}")
+                logger.debug("Raw data received: {}", data)
                 buffer += data
 
                 while b'\r' in buffer:
@@ -30,9 +34,14 @@ def handle_connection(conn: socket.socket, addr):
                     buffer = buffer[packet_end_index:].lstrip(b'\r\n')
                     
                     packet_str = raw_packet.decode('ascii', errors='ignore')
-                    logger.info(f"Recebido pacote SUNTECH2G: {packet_str}")
+                    packet_logger.debug("Recebido pacote SUNTECH2G: {}", packet_str)
 
-                    new_dev_id = processor.process_packet(packet_str)
+                    conn.begin_packet(bool(buffer))
+                    try:
+                        new_dev_id = processor.process_packet(packet_str)
+                    finally:
+                        # Fecha o rastro de latência mesmo se o processamento falhar, para não contaminar o próximo pacote
+                        conn.end_packet()
 
                     if new_dev_id and new_dev_id != dev_id_session:
                         dev_id_session = new_dev_id
@@ -63,6 +72,9 @@ def handle_connection(conn: socket.socket, addr):
                             redis_client.hset(f"tracker:{dev_id_session}", "protocol", "suntech2g")
                             logger.info(f"Dispositivo SUNTECH2G autenticado na sessão")
 
+                # Enviando, em uma única escrita, os ACKs gerados por esse recv
+                conn.flush()
+
 
     except ConnectionResetError:
         logger.warning(f"Connection with {addr} was reset.", log_label="SERVIDOR")
@@ -70,6 +82,7 @@ def handle_connection(conn: socket.socket, addr):
         import traceback
         traceback.print_exc()
         logger.error(f"Error in connection with {addr}: {e}", log_label="SERVIDOR")
+        metrics.inc("gateway_undecodable_frames_total", "suntech2g", "error")
     finally:
         if dev_id_session:
             with logger.contextualize(log_label=dev_id_session):
@@ -79,7 +92,9 @@ def handle_connection(conn: socket.socket, addr):
 
         try:
             conn.shutdown(socket.SHUT_RDWR)
-            conn.close()
-            conn = None
         except Exception as e:
-            logger.error(f"Impossible to shutdown connection with {addr}: {e}", log_label="SERVIDOR")
\ No newline at end of file
+            logger.error(f"Impossible to shutdown connection with {addr}: {e}", log_label="SERVIDOR")
+        finally:
+            # Sempre fechar, mesmo se o shutdown falhar (ex.: conexão resetada): encerra a thread escritora e libera o socket
+            conn.close()
+            conn = None
\ No newline at end of file
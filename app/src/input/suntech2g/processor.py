@@ -1,10 +1,12 @@
 from app.core.logger import get_logger
 from app.services.redis_service import get_redis
+from app.services.metrics_service import metrics
 from . import mapper
 from .. import utils
 from app.src.session.output_sessions_manager import send_to_main_server
 
 logger = get_logger(__name__)
+packet_logger = get_logger(__name__, sampled=True)
 redis_client = get_redis()
 
 def process_packet(packet_str: str):
@@ -28,10 +30,11 @@ def process_packet(packet_str: str):
     if not dev_id or not dev_id.isdigit:
         logger.warning(f"Dev id {dev_id} encontrado no pacote {packet_str} não é um ID válido.")
 
-    logger.info(f"Processing Suntech packet: {packet_str} dev_id={dev_id}")
+    packet_logger.debug("Processing Suntech packet: {} dev_id={}", packet_str, dev_id)
 
     if not dev_id:
         logger.warning(f"Could not extract dev_id from packet: {packet_str}")
+        metrics.inc("gateway_undecodable_frames_total", "suntech2g", "invalid")
         return None
         
     logger.info(f"Processing packet from device: {dev_id}")
@@ -68,16 +71,16 @@ def process_packet(packet_str: str):
             serial = int(serial)
 
         if type == "heartbeat":
-            send_to_main_server(dev_id, serial=serial, raw_packet_hex=packet_str, original_protocol="suntech2g", type=type)
+            send_to_main_server(dev_id, serial=serial, raw_packet=packet_str, original_protocol="suntech2g", type=type)
         else:
-            send_to_main_server(dev_id, packet_data=packet_data, serial=serial, raw_packet_hex=packet_str, original_protocol="suntech2g", type=type)
+            send_to_main_server(dev_id, packet_data=packet_data, serial=serial, raw_packet=packet_str, original_protocol="suntech2g", type=type)
 
     if ign_alert_packet_data and ign_alert_packet_data.get("universal_alert_id"):
         if not serial:
             serial = redis_client.hget(f"tracker:{dev_id}", "last_serial") or 0
             serial = int(serial)
 
-        send_to_main_server(dev_id, packet_data=ign_alert_packet_data, serial=serial, raw_packet_hex=packet_str, original_protocol="suntech2g", type="alert", managed_alert=True)
+        send_to_main_server(dev_id, packet_data=ign_alert_packet_data, serial=serial, raw_packet=packet_str, original_protocol="suntech2g", type="alert", managed_alert=True)
 
 
     return dev_id
\ No newline at end of file
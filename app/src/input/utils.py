@@ -3,29 +3,26 @@ from math import radians, sin, cos, sqrt, atan2
 from dateutil.relativedelta import relativedelta
 
 from app.services.redis_service import get_redis
-from app.core.logger import get_logger
+from app.core.logger import get_logger, lazy
 
 redis_client = get_redis()
 logger = get_logger(__name__)
+packet_logger = get_logger(__name__, sampled=True)
 
 # IDs de Alerta Suntech4G que são INFERIDOS, não traduzidos diretamente
 IGNITION_ON_UNIVERSAL_ALERT_ID: int = 6533
 IGNITION_OFF_UNIVERSAL_ALERT_ID: int = 6534
 
+def _format_mapped_packet(mapped_data: dict) -> str:
+    return "".join(f"\n  - {key}: {value}" for key, value in mapped_data.items())
+
 def log_mapped_packet(mapped_data: dict, protocol_name: str):
     """
-    Recebe um dicionário de dados mapeados e formata uma string de log legível.
+    Registra um dicionário de dados mapeados em uma única mensagem legível (amostrada).
+    A formatação só acontece se a mensagem for emitida.
     """
-    header = f"--- Pacote {protocol_name.upper()} Mapeado ---"
-    footer = "-" * len(header)
-    
-    logger.info(header)
-    
-    for key, value in mapped_data.items():
-        logger.info(f"  - {key}: {value}")
-
-    logger.info(footer)
-    
+    packet_logger.info("--- Pacote {} Mapeado ---{}", protocol_name.upper(), lazy(_format_mapped_packet, mapped_data), protocol=protocol_name)
+
 
 def crc_itu(data_bytes: bytes) -> int:
     config = Configuration(
@@ -6,6 +6,7 @@ from .. import utils
 from app.src.session.output_sessions_manager import send_to_main_server
 from app.core.logger import get_logger
 from app.services.redis_service import get_redis
+from app.services.metrics_service import metrics
 
 redis_client = get_redis()
 logger = get_logger(__name__)
@@ -28,6 +29,7 @@ def process_packet(dev_id_str: str | None, packet_body: bytes, conn: socket.sock
 
     if received_crc != calculated_crc:
         logger.warning(f"Checksum VL01 inválido! pacote={packet_body.hex()}, crc_recebido={hex(received_crc)}, crc_calculado={hex(calculated_crc)}")
+        metrics.inc("gateway_crc_failures_total", "vl01")
         return None, None
     
     protocol_number = packet_body[1] if not is_x79 else packet_body[2]
@@ -51,10 +53,10 @@ def process_packet(dev_id_str: str | None, packet_body: bytes, conn: socket.sock
             location_packet_data, ign_alert_packet_data = mapper.handle_location_packet(dev_id_str, serial_number, content_body)
             if location_packet_data:
                 utils.log_mapped_packet(location_packet_data, "VL01")
-                send_to_main_server(dev_id_str, location_packet_data, serial_number, packet_body.hex(), "VL01")
+                send_to_main_server(dev_id_str, location_packet_data, serial_number, packet_body, "VL01")
 
             if ign_alert_packet_data:
-                send_to_main_server(dev_id_str, ign_alert_packet_data, serial_number, packet_body.hex(), "VL01", "alert", True)
+                send_to_main_server(dev_id_str, ign_alert_packet_data, serial_number, packet_body, "VL01", "alert", True)
 
         else:
             logger.warning(f"Pacote de localização/alarme VL01 recebido antes do login. Ignorando. pacote={packet_body.hex()}")
@@ -67,7 +69,7 @@ def process_packet(dev_id_str: str | None, packet_body: bytes, conn: socket.sock
             alarm_packet_data = mapper.handle_alarm_packet(dev_id_str, serial_number, content_body)
             if alarm_packet_data:
                 utils.log_mapped_packet(alarm_packet_data, "VL01")
-                send_to_main_server(dev_id_str, alarm_packet_data, serial_number, packet_body.hex(), original_protocol="VL01", type="alert")
+                send_to_main_server(dev_id_str, alarm_packet_data, serial_number, packet_body, original_protocol="VL01", type="alert")
 
         else:
             logger.warning(f"Pacote de localização/alarme VL01 recebido antes do login. Ignorando. pacote={packet_body.hex()}")
@@ -87,7 +89,7 @@ def process_packet(dev_id_str: str | None, packet_body: bytes, conn: socket.sock
     elif protocol_number == 0x13: # Pacote de Heartbeat/Status
         if dev_id_str:
             mapper.handle_heartbeat_packet(dev_id_str, serial_number, content_body)
-            send_to_main_server(dev_id_str, serial=serial_number, raw_packet_hex=packet_body.hex(), original_protocol="VL01", type="heartbeat")
+            send_to_main_server(dev_id_str, serial=serial_number, raw_packet=packet_body, original_protocol="VL01", type="heartbeat")
 
         else:
             logger.warning(f"Pacote de heartbeat VL01 recebido antes do login. Ignorando. pacote={packet_body.hex()}")
@@ -99,12 +101,13 @@ def process_packet(dev_id_str: str | None, packet_body: bytes, conn: socket.sock
             reply_command_packet_data = mapper.handle_reply_command_packet(dev_id_str, content_body)
             if reply_command_packet_data:
                 utils.log_mapped_packet(reply_command_packet_data, "VL01")
-                send_to_main_server(dev_id_str, reply_command_packet_data, serial_number, packet_body.hex(), original_protocol="VL01", type="command_reply")
+                send_to_main_server(dev_id_str, reply_command_packet_data, serial_number, packet_body, original_protocol="VL01", type="command_reply")
 
         else:
             logger.warning(f"Pacote de reply command VL01 recebido antes do login. Ignorando. pacote={packet_body.hex()}")
     else:
         logger.warning(f"Protocolo VL01 não mapeado: {hex(protocol_number)} device_id={dev_id_str}")
+        metrics.inc("gateway_undecodable_frames_total", "vl01", "unmapped")
         response_to_device = builder.build_generic_response(protocol_number, serial_number)
 
     if response_to_device:
@@ -4,12 +4,13 @@ import json
 import copy
 from dateutil import parser
 
-from app.core.logger import get_logger
+from app.core.logger import get_logger, lazy
 from app.services.redis_service import get_redis
 from app.config.settings import settings
 from ..utils import handle_ignition_change, haversine
 
 logger = get_logger(__name__)
+packet_logger = get_logger(__name__, sampled=True)
 redis_client = get_redis()
 
 def _decode_location_packet_xA0(body: bytes):
@@ -308,7 +309,7 @@ def handle_alarm_packet(dev_id_str: str, body: bytes):
         logger.warning(f"Alarme VL03 não mapeado recebido device_id={dev_id_str}, alarm_code={hex(alarm_code)}")
 
 def handle_heartbeat_packet(dev_id_str: str, serial: int, body: bytes):
-    logger.info(f"Pacote de heartbeat recebido de {dev_id_str}, body={body.hex()}")
+    packet_logger.debug("Pacote de heartbeat recebido de {}, body={}", dev_id_str, lazy(body.hex))
     # O pacote de Heartbeat (0x13) contém informações de status
     redis_data = {
         "last_active_timestamp": datetime.now().isoformat(),
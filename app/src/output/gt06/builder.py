@@ -1,7 +1,7 @@
 import struct
 from datetime import datetime, timezone
 
-from app.core.logger import get_logger
+from app.core.logger import get_logger, lazy
 from app.src.input.utils import crc_itu
 from app.services.redis_service import get_redis
 from ..utils import get_output_dev_id
@@ -125,7 +125,7 @@ def build_location_packet(dev_id, packet_data: dict, serial_number: int, *args)
         b"\x0d\x0a"
     )
 
-    logger.debug(f"Construído pacote de localização GT06 (Protocol {hex(protocol_number)}): {final_packet.hex()}")
+    logger.debug("Construído pacote de localização GT06 (Protocol {}): {}", hex(protocol_number), lazy(final_packet.hex))
     return final_packet
 
 def imei_to_bcd(imei: str) -> bytes:
@@ -172,7 +172,7 @@ def build_login_packet(imei: str, serial_number: int) -> bytes:
         b"\x0d\x0a"
     )
 
-    logger.debug(f"Construído pacote de login GT06: {full_packet.hex()}")
+    logger.debug("Construído pacote de login GT06: {}", lazy(full_packet.hex))
     return full_packet
 
 
@@ -327,7 +327,7 @@ def build_alarm_packet(dev_id: str, packet_data: dict, serial_number: int, *args
         b"\x0d\x0a"
     )
 
-    logger.debug(f"Construído pacote de Alarme GT06 (Protocol {hex(protocol_number)}): {final_packet.hex()}")
+    logger.debug("Construído pacote de Alarme GT06 (Protocol {}): {}", hex(protocol_number), lazy(final_packet.hex))
     return final_packet
 
 def build_reply_packet(dev_id: str, packet_data: dict, serial_number: int, *args) -> bytes:
@@ -382,7 +382,7 @@ def build_reply_packet(dev_id: str, packet_data: dict, serial_number: int, *args
         b"\x0d\x0a"
     )
 
-    logger.debug(f"Construído pacote de Resposta do Terminal GT06 (Protocol {hex(protocol_number)}): {final_packet.hex()}")
+    logger.debug("Construído pacote de Resposta do Terminal GT06 (Protocol {}): {}", hex(protocol_number), lazy(final_packet.hex))
     return final_packet
 
 def build_voltage_info_packet(packet_data: dict, serial_number: int) -> bytes:
@@ -419,5 +419,5 @@ def build_voltage_info_packet(packet_data: dict, serial_number: int) -> bytes:
         b"\x0d\x0a"   
     )
 
-    logger.info(f"Construído pacote de Informação (Protocol {hex(protocol_number)}): {final_packet.hex()}")
+    logger.info("Construído pacote de Informação (Protocol {}): {}", hex(protocol_number), lazy(final_packet.hex))
     return final_packet
\ No newline at end of file
@@ -44,8 +44,8 @@ def build_location_alarm_packet(dev_id: str, packet_data: dict, serial: int, typ
             return b""
 
     logger.debug(
-        f"Construindo pacote Suntech: HDR={hdr}, DevID={dev_id}, Realtime={is_realtime}, "
-        f"GlobalAlertID={universal_alert_id}, AlertID={suntech_alert_id}, GeoFenceID={geo_fence_id}, LocationData={packet_data}"
+        "Construindo pacote Suntech: HDR={}, DevID={}, Realtime={}, GlobalAlertID={}, AlertID={}, GeoFenceID={}, LocationData={}",
+        hdr, dev_id, is_realtime, universal_alert_id, suntech_alert_id, geo_fence_id, packet_data
     )
 
     device_info = redis_client.hgetall(f"tracker:{dev_id}")
@@ -125,7 +125,7 @@ def build_location_alarm_packet(dev_id: str, packet_data: dict, serial: int, typ
         fields.extend(telemetry_fields)
     
     packet = ";".join(fields)
-    logger.debug(f"Pacote Suntech final construído: {packet}")
+    logger.debug("Pacote Suntech final construído: {}", packet)
     return packet.encode("ascii")
 
 
@@ -135,7 +135,7 @@ def build_heartbeat_packet(dev_id: str, *args) -> str:
     cutted_dev_id = dev_id_normalized[-10:]
 
     packet = f"ALV;{cutted_dev_id}"
-    logger.debug(f"Construído pacote Suntech ALV: {packet}")
+    logger.debug("Construído pacote Suntech ALV: {}", packet)
     return packet.encode("ascii")
 
 def build_reply_packet(dev_id: str, packet_data: dict, *args) -> str:
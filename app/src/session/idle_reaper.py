@@ -0,0 +1,49 @@
+import threading
+from typing import Callable, Hashable
+
+from app.core.logger import get_logger
+from app.services.expiry_service import expiry_service
+
+logger = get_logger(__name__)
+
+class IdleReaper:
+    """
+    Fecha conexões ociosas usando o serviço de expiração.
+
+    Cada conexão observada tem um prazo de leitura; toda atividade (`touch`) adia esse prazo.
+    Quando o prazo vence, o callback `on_idle` da conexão é chamado e a contagem do tipo é incrementada.
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+                    cls._instance.reaped = {"input": 0, "output": 0}
+
+        return cls._instance
+
+    def watch(self, kind: str, key: Hashable, timeout: int, on_idle: Callable[[], None]):
+        expiry_service.schedule((kind, key), timeout, lambda: self._reap(kind, on_idle))
+
+    def touch(self, kind: str, key: Hashable, timeout: int):
+        expiry_service.touch((kind, key), timeout)
+
+    def forget(self, kind: str, key: Hashable):
+        expiry_service.cancel((kind, key))
+
+    def _reap(self, kind: str, on_idle: Callable[[], None]):
+        with self._lock:
+            self.reaped[kind] = self.reaped.get(kind, 0) + 1
+
+        on_idle()
+
+        totals = ", ".join(f"{k}={v}" for k, v in self.reaped.items())
+        logger.info(f"Conexão ociosa encerrada ({kind}). Total encerradas: {totals}", log_label="IDLE REAPER")
+
+    def get_stats(self) -> dict:
+        return dict(self.reaped)
+
+idle_reaper = IdleReaper()
@@ -5,16 +5,22 @@ import importlib
 from typing import Literal
 import json
 
-from app.core.logger import get_logger
+from app.core.logger import get_logger, lazy
 from app.services.redis_service import get_redis
 from app.services.history_service import add_packet_to_history
+from app.services.flight_recorder_service import flight_recorder, OUTBOUND, UPSTREAM
+from app.services.latency_service import latency_tracker
+from app.services.metrics_service import metrics
 from app.config.output_protocol_settings import output_protocol_settings
 from app.src.output.suntech4g.builder import build_login_packet as build_suntech_login_packet
 from app.src.output.gt06.builder import build_login_packet as build_gt06_login_packet, build_voltage_info_packet as build_gt06_voltage_info_packet
 from .input_sessions_manager import input_sessions_manager
+from .idle_reaper import idle_reaper
+from .utils import enable_tcp_keepalive, StripedLock
 from app.config.settings import settings
 
 logger = get_logger(__name__)
+packet_logger = get_logger(__name__, sampled=True)
 redis_client = get_redis()
 
 class MainServerSession:
@@ -32,7 +38,9 @@ class MainServerSession:
         self.lock = threading.RLock()
 
         self._is_connected = False
+        self._is_deleted = False # Sessão removida do OutputSessionsManager, não deve reconectar
         self._conection_retries = 0
+        self._has_connected = False # Já conectou alguma vez (as próximas conexões são reconexões)
         self._is_gt06_login_step = False
         self._is_realtime = False
         self._is_sending_realtime_location = False
@@ -43,6 +51,10 @@ class MainServerSession:
             if self._is_connected:
                 return True
 
+            if self._is_deleted:
+                logger.info(f"Sessão já removida do gerenciador, conexão não será aberta. dev_id={self.dev_id}")
+                return False
+
             try:
                 if not self.output_protocol:
                     logger.info(f"Impossível iniciar conexão com server principal, tipo de protocolo de saída não especificado. dev_id={self.dev_id}")
@@ -57,8 +69,19 @@ class MainServerSession:
 
                 logger.info(f"Iniciando nova conexão para {address[0]}:{address[1]}")
                 self.sock = socket.create_connection(address, timeout=5)
+                enable_tcp_keepalive(
+                    self.sock,
+                    settings.MAIN_SERVER_TCP_KEEPALIVE_IDLE,
+                    settings.MAIN_SERVER_TCP_KEEPALIVE_INTERVAL,
+                    settings.MAIN_SERVER_TCP_KEEPALIVE_COUNT,
+                )
                 self._is_connected = True
 
+                metrics.inc("gateway_upstream_connects_total", self.output_protocol, "success")
+                if self._has_connected:
+                    metrics.inc("gateway_upstream_reconnects_total", self.output_protocol)
+                self._has_connected = True
+
                 logger.info(f"Criando Thread para ouvir comandos do lado do server. dev_id={self.dev_id}")
                 self._reader_thread = threading.Thread(target=self._reader_loop, daemon=True)
                 self._reader_thread.start()
@@ -70,6 +93,7 @@ class MainServerSession:
                 return True
             except Exception:
                 logger.exception(f"Falha ao conectar ao servidor principal device_id={self.dev_id}")
+                metrics.inc("gateway_upstream_connects_total", self.output_protocol, "failure")
                 self._is_connected = False
                 return False
     
@@ -79,7 +103,7 @@ class MainServerSession:
             logger.info(f"Enviando pacote MNT para apresentar a conexão dev_id={self.dev_id}")
             mnt_packet = build_suntech_login_packet(self.dev_id)
 
-            self.sock.sendall(mnt_packet)
+            self._sendall(mnt_packet)
             logger.info(f"Pacote de apresentação MNT enviado. dev_id={self.dev_id}")
         
         elif self.output_protocol == "gt06":
@@ -88,10 +112,22 @@ class MainServerSession:
 
             login_packet = build_gt06_login_packet(self.dev_id, self.serial)
 
-            self.sock.sendall(login_packet)
+            self._sendall(login_packet)
 
             logger.info(f"Pacote de Login enviado. dev_id={self.dev_id}")
 
+    def _sendall(self, packet: bytes, timings: dict | None = None):
+        """
+        Escreve no socket do servidor principal, registrando o pacote e as etapas no flight recorder.
+        """
+        start = time.perf_counter()
+        self.sock.sendall(packet)
+        metrics.inc("gateway_packets_sent_total", self.output_protocol)
+
+        timings = dict(timings) if timings else {}
+        timings["send"] = time.perf_counter() - start
+        flight_recorder.record(self.dev_id, OUTBOUND, packet, timings)
+
     def handle_gt06_login(self, data):
         self._is_gt06_login_step = False
         logger.info(f"The server replyed the login data packet, dev_id={self.dev_id} data={data.hex()}")
@@ -109,6 +145,9 @@ class MainServerSession:
                         logger.warning(f"Conexão fechada pelo servidor principal (recv vazio) device_id={self.dev_id}")
                         self.disconnect()
                         break
+
+                    command_timings = {}
+                    flight_recorder.record(self.dev_id, UPSTREAM, data, command_timings)
                     
                     # Lida com resposta do servidor para pacotes de login
                     if self._is_gt06_login_step:
@@ -124,7 +163,9 @@ class MainServerSession:
                         logger.error(f"Mapeador de comandos universais para o protocolo de saida '{str(self.output_protocol).upper()}' não encontrado. dev_id={self.dev_id}")
                         return
                     
+                    start = time.perf_counter()
                     universal_command = mapper_func(self.dev_id, data)
+                    command_timings["map"] = time.perf_counter() - start
                     if not universal_command:
                         logger.error(f"Comando universal não encontrado, output_protocol={self.output_protocol}, dev_id={self.dev_id}")
                         return
@@ -170,7 +211,9 @@ class MainServerSession:
                         continue
 
                     logger.info(f"Roteando comando para o processador do protocolo: '{str(self.input_protocol).upper()}'")
+                    start = time.perf_counter()
                     processor_func(self.dev_id, self.serial, universal_command)
+                    command_timings["route"] = time.perf_counter() - start
 
 
                 except socket.timeout:
@@ -223,14 +266,34 @@ class MainServerSession:
         logger.info(f"Roteando comando para o processador do protocolo: '{str(self.input_protocol).upper()}'")
         processor_func(self.dev_id, self.serial, command)
 
-    def send(self, packet: bytes, current_output_protocol: str = None, packet_data: dict = None):
+    def _reap_idle(self):
+        logger.warning(f"Sessão com o servidor principal sem envios há mais de {settings.MAIN_SERVER_SESSION_IDLE_TIMEOUT}s, encerrando. dev_id={self.dev_id}", log_label=self.dev_id)
+
+        # Chamado na thread única do serviço de expiração: o disconnect aguarda o lock da sessão, que um send pode
+        # segurar por bastante tempo (ex.: espera do login GT06), então a remoção acontece em outra thread
+        threading.Thread(target=self._delete_idle, daemon=True).start()
+
+    def _delete_idle(self):
+        with logger.contextualize(log_label=self.dev_id):
+            output_sessions_manager.delete_session(self.dev_id, session=self)
+
+    def send(self, packet: bytes, current_output_protocol: str = None, packet_data: dict = None, timings: dict = None) -> bool:
+        """
+        Envia o pacote ao servidor principal. Retorna False se o pacote não foi enviado.
+        """
+        idle_reaper.touch("output", self, settings.MAIN_SERVER_SESSION_IDLE_TIMEOUT)
+
         with self.lock:
             if not self._is_connected:
+                # Sessão removida (ex.: pelo reaper de ociosidade) depois de obtida: quem chamou deve obter uma nova
+                if self._is_deleted:
+                    return False
+
                 logger.warning(f"Conexão perdida, tentando reconectar... dev_id={self.dev_id}")
 
                 if not self.connect():
                     logger.error(f"Não foi possível conectar ao servidor principal. Pacote descartado. dev_id={self.dev_id}")
-                    return
+                    return False
             
             # ====================================== Atualizando variáveis de instância ========================================================
             # ==================================================================================================================================
@@ -269,7 +332,7 @@ class MainServerSession:
                 self.output_protocol = current_output_protocol
                 if not self.connect():
                     logger.error(f"Não foi possível conectar ao servidor principal com o novo protocolo. Pacote descartado. dev_id={self.dev_id}")
-                    return
+                    return False
             
             # =============================================== Checagem de variaveis ============================================================
             # ==================================================================================================================================
@@ -320,14 +383,15 @@ class MainServerSession:
 
                     voltage_packet = build_gt06_voltage_info_packet({"voltage": voltage}, int(self.serial))
                     logger.info(f"Enviando pacote de voltagem antes do pacote de localização/alerta em tempo real. dev_id={self.dev_id} voltage={voltage}V")
-                    self.sock.sendall(voltage_packet)
+                    self._sendall(voltage_packet)
 
-                logger.info(f"Encaminhando pacote de {len(packet)} bytes device_id={self.dev_id}")
+                packet_logger.info("Encaminhando pacote de {} bytes device_id={}", len(packet), self.dev_id)
 
                 if self.output_protocol == "suntech4g":
                     packet += b'\r'
 
-                self.sock.sendall(packet)
+                self._sendall(packet, timings)
+                return True
             except (ConnectionResetError, BrokenPipeError) as e:
                 logger.warning(f"Conexão com servidor Principal caiu ao enviar ({type(e).__name__}) device_id={self.dev_id}")
 
@@ -335,17 +399,19 @@ class MainServerSession:
                     self._conection_retries += 1
 
                     if self.connect():
-                        self.send(packet)
+                        return self.send(packet)
                         
                 else:
                     logger.error(f"Número máximo de tentativas de conexão para essa sessão atingida dev_id={self.dev_id}")
                     self._conection_retries = 0
                     self.disconnect()
-                    return
+
+                return False
 
             except Exception:
                 logger.exception(f"Erro inesperado ao enviar pacote device_id={self.dev_id}")
                 self.disconnect()
+                return False
 
     def disconnect(self):
         with self.lock:
@@ -370,58 +436,61 @@ class OutputSessionsManager:
                 if cls._instance is None:
                     cls._instance = super().__new__(cls)
                     cls._instance._sessions = {}
-                    cls._instance.lock = threading.Lock()
+                    cls._instance._stripes = StripedLock(settings.SESSION_LOCK_STRIPES)
 
         return cls._instance
 
     def get_session(self, dev_id: str, output_protocol: str, serial: str) -> MainServerSession:
-        with self.lock:
-            if dev_id not in self._sessions:
+        with self._stripes.for_key(dev_id):
+            session = self._sessions.get(dev_id)
+            if session is None:
                 logger.info(f"Nenhuma sessão encontrada no MainServerSessionsManager. Criando uma nova. dev_id={dev_id}")
-                self._sessions[dev_id] = MainServerSession(dev_id, output_protocol, serial)
+                session = MainServerSession(dev_id, output_protocol, serial)
+                self._sessions[dev_id] = session
                 redis_client.sadd("output_sessions:active_trackers", dev_id)
-            
-            session = self._sessions[dev_id]
-            session.connect()
 
-            return session
+                idle_reaper.watch("output", session, settings.MAIN_SERVER_SESSION_IDLE_TIMEOUT, session._reap_idle)
+
+        # A conexão (bloqueante) acontece fora do lock do registro, protegida apenas pelo lock da própria sessão
+        session.connect()
+
+        return session
     
-    def delete_session(self, dev_id: str):
-        with self.lock:
-            if dev_id in self._sessions:
-                logger.info(f"Deletando sessão do MainServerSessionsManager para dev_id={dev_id}")
-                session = self._sessions[dev_id]
-                session.disconnect()
-                del self._sessions[dev_id]
-                redis_client.srem("output_sessions:active_trackers", dev_id)
-
-                logger.info(f"Sessão para dev_id={dev_id} deletada do MainServerSessionsManager.")
+    def delete_session(self, dev_id: str, session: MainServerSession = None):
+        """
+        Deleta a sessão de saída do dispositivo. Se `session` for informada, deleta apenas se ela ainda for a sessão registrada.
+        """
+        with self._stripes.for_key(dev_id):
+            registered = self._sessions.get(dev_id)
+            if registered is None or (session is not None and registered is not session):
+                return
+
+            logger.info(f"Deletando sessão do MainServerSessionsManager para dev_id={dev_id}")
+            del self._sessions[dev_id]
+            registered._is_deleted = True
+            idle_reaper.forget("output", registered)
+            redis_client.srem("output_sessions:active_trackers", dev_id)
+
+        registered.disconnect()
+        logger.info(f"Sessão para dev_id={dev_id} deletada do MainServerSessionsManager.")
     
     def exists(self, dev_id, use_redis: bool = False):
-        with self._lock:
-            if use_redis:
-                return redis_client.sismember("output_sessions:active_trackers", str(dev_id))
-            
-            socket_obj = self._sessions.get(str(dev_id))
-            if socket_obj is None:
-                return False
-            
-            try:
-                return socket_obj.fileno() != -1
-            except OSError:
-                return False
+        if use_redis:
+            return redis_client.sismember("output_sessions:active_trackers", str(dev_id))
+        
+        session = self._sessions.get(str(dev_id))
+        return session is not None and session._is_connected
     
     def get_sessions(self, use_redis: bool = False):
         if use_redis:
             return redis_client.smembers("output_sessions:active_trackers")
         
-        else: return self._sessions.keys()
+        else: return list(self._sessions)
     
     def is_sending_realtime_location(self, dev_id: str):
 
-        if dev_id in self._sessions:
-            session = self._sessions[dev_id]
-
+        session = self._sessions.get(dev_id)
+        if session is not None:
             return session._is_sending_realtime_location
         
         return False
@@ -432,7 +501,7 @@ output_sessions_manager = OutputSessionsManager()
 
 def send_to_main_server(
         dev_id: str, packet_data: dict = None, serial: str = None, 
-        raw_packet_hex: str = None, original_protocol: str = None, 
+        raw_packet: bytes | str = None, original_protocol: str = None, 
         type: Literal["location", "heartbeat", "alert", "command_reply"] = "location",
         managed_alert: bool = False
     ):
@@ -453,22 +522,24 @@ def send_to_main_server(
         
         redis_client.hset(f"tracker:{dev_id}", "output_protocol", output_protocol)
     
+    latency_tracker.set_packet_type(type)
+
     # Construção do pacote de saída, usando o builder de pacote do procolo de saída anteriormente especificado
     output_packet_builder = output_protocol_settings.OUTPUT_PROTOCOL_PACKET_BUILDERS.get(output_protocol).get(type)
 
+    mark = latency_tracker.mark()
     if not managed_alert:
         output_packet = output_packet_builder(dev_id, packet_data, serial, type)
     else:
         output_packet = output_packet_builder(dev_id, packet_data, serial, type, managed_alert=managed_alert)
+    timings = {"build": latency_tracker.stage("build", mark)}
 
     # Lógica de envios
     if output_packet:
 
-        # Preparando os pacotes printáveis, para log.
+        # Pacotes Suntech são texto, e vão assim para o histórico
         if output_protocol == "suntech4g":
             str_output_packet = output_packet.decode("ascii")
-        else:
-            str_output_packet = output_packet.hex()
 
         # Refinando alguns dados no dicionário de dados
         if packet_data is not None:
@@ -481,16 +552,32 @@ def send_to_main_server(
                 last_voltage = redis_client.hget(f"tracker:{dev_id}", "last_voltage")
                 packet_data["last_voltage"] = last_voltage if last_voltage else "1.11"
 
-        # Logging
-        logger.info(f"Pacote de {type.upper()} {output_protocol.upper()} traduzido de pacote {str(original_protocol).upper()}:")
-        logger.info(f"{str_output_packet}")
+        # Logging (os bytes de cada pacote ficam no flight recorder)
+        packet_logger.info("Pacote de {} {} traduzido de pacote {}", type.upper(), output_protocol.upper(), str(original_protocol).upper())
+        logger.debug("Pacote traduzido: {}", lazy(output_packet.hex))
+
+        # Adicionando o pacote ao histórico do dispositivo (pacotes binários são guardados como bytes)
+        mark = latency_tracker.mark()
+        add_packet_to_history(
+            dev_id, raw_packet, str_output_packet if output_protocol == "suntech4g" else output_packet,
+            packet_type=type, alert_id=packet_data.get("universal_alert_id") if packet_data else None
+        )
+        timings["history"] = latency_tracker.stage("history", mark)
 
-        # Adicionando o pacote ao histórico do dispositivo
-        add_packet_to_history(dev_id, raw_packet_hex, str_output_packet)
-        
         # Obtendo a sessão de saída do dispositivo
+        mark = latency_tracker.mark()
         session = output_sessions_manager.get_session(dev_id, output_protocol, serial)
-        session.send(output_packet, output_protocol, packet_data)
+        timings["session"] = latency_tracker.stage("session", mark)
+
+        mark = latency_tracker.mark()
+        if not session.send(output_packet, output_protocol, packet_data, timings) and session._is_deleted:
+            # A sessão foi removida pelo reaper de ociosidade entre get_session e o envio: uma nova tentativa com a sessão nova
+            logger.info(f"Sessão removida antes do envio, obtendo uma nova. dev_id={dev_id}")
+            session = output_sessions_manager.get_session(dev_id, output_protocol, serial)
+            session.send(output_packet, output_protocol, packet_data, timings)
+        latency_tracker.stage("send", mark)
+
+        metrics.inc("gateway_packets_translated_total", str(original_protocol or protocol).lower().replace("-", "_"), output_protocol, type)
 
         # Heartbeats para GT06 - Após o envio de qualquer pacote gt06, enviamos um heartbeat
         if output_protocol == 'gt06':
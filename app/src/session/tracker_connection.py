@@ -0,0 +1,225 @@
+import socket
+import threading
+import time
+import queue
+
+from app.core.logger import get_logger
+from app.config.settings import settings
+from app.services.flight_recorder_service import flight_recorder, INBOUND, TO_DEVICE
+from app.services.latency_service import latency_tracker
+from app.services.metrics_service import metrics
+from .idle_reaper import idle_reaper
+from .utils import enable_tcp_keepalive
+
+logger = get_logger(__name__)
+
+_CLOSE = object()
+
+# Eventos guardados até o login, quando o dev_id ainda não é conhecido
+_PRE_LOGIN_EVENTS = 8
+
+class TrackerConnection:
+    """
+    Envolve o socket de um rastreador com um único escritor, alimentado por uma fila.
+
+    Todas as escritas (ACKs do handler, comandos vindos do servidor principal e da API)
+    passam pela fila e são enviadas por uma thread dedicada, evitando escritas parciais intercaladas.
+    Escritas feitas pela thread do handler são acumuladas e enviadas de uma vez em `flush()`,
+    coalescendo todos os ACKs gerados por um mesmo `recv` em um único `sendall`.
+
+    A conexão também mantém o próprio estado de vida (`alive`), atualizado no ciclo de vida do socket:
+    EOF ou erro no `recv` (incluindo falha de keepalive TCP), falha de escrita e fechamento.
+    Se nada for recebido dentro do prazo ocioso do protocolo, o `IdleReaper` encerra a conexão.
+    """
+
+    def __init__(self, sock: socket.socket, addr=None, protocol: str = None):
+        self.sock = sock
+        self.addr = addr
+        self.protocol = protocol
+        self.dev_id = None
+
+        protocol_config = settings.INPUT_PROTOCOL_HANDLERS.get(protocol, {})
+        self.idle_timeout = protocol_config.get("idle_timeout", settings.DEFAULT_TRACKER_IDLE_TIMEOUT)
+
+        self._owner_thread = threading.get_ident()
+        self._pending = []
+        self._queue = queue.Queue()
+        self._closed = False
+        self.alive = True
+
+        # Flight recorder: tempo de processamento de cada recv, medido no recv seguinte
+        self._pre_login_events = []
+        self._last_inbound_timings = None
+        self._last_recv_at = 0.0
+
+        # Histogramas de latência: instante do recv que trouxe o primeiro byte do frame em montagem
+        self._frame_started_at = None
+
+        enable_tcp_keepalive(
+            self.sock,
+            settings.TRACKER_TCP_KEEPALIVE_IDLE,
+            settings.TRACKER_TCP_KEEPALIVE_INTERVAL,
+            settings.TRACKER_TCP_KEEPALIVE_COUNT,
+        )
+        idle_reaper.watch("input", self, self.idle_timeout, self._reap_idle)
+
+        self._writer_thread = threading.Thread(target=self._writer_loop, daemon=True)
+        self._writer_thread.start()
+
+    # ====================================== Escrita ===================================================
+
+    def sendall(self, data: bytes):
+        """
+        Enfileira `data` para envio. Se chamado pela thread do handler, os dados aguardam o próximo `flush()`.
+        """
+        if not data or self._closed:
+            return
+
+        if threading.get_ident() == self._owner_thread:
+            self._pending.append(data)
+            latency_tracker.ack()
+        else:
+            self._queue.put(data)
+
+    def flush(self):
+        """
+        Envia ao escritor, em uma única escrita, tudo que a thread do handler acumulou.
+        """
+        if not self._pending:
+            return
+
+        data = b''.join(self._pending)
+        self._pending = []
+
+        if not self._closed:
+            self._queue.put(data)
+
+    def _writer_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is _CLOSE:
+                return
+
+            # Drenando o que mais estiver na fila para enviar tudo com uma única syscall
+            chunks = [item]
+            stop = False
+            while True:
+                try:
+                    next_item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+
+                if next_item is _CLOSE:
+                    stop = True
+                    break
+                chunks.append(next_item)
+
+            data = b''.join(chunks)
+            try:
+                start = time.perf_counter()
+                self.sock.sendall(data)
+                self._record(TO_DEVICE, data, {"send": time.perf_counter() - start})
+            except OSError as e:
+                logger.warning(f"Falha ao escrever no socket do rastreador endereco={self.addr}, device_id={self.dev_id}: {e}", log_label=self.dev_id or "SERVIDOR")
+                self._closed = True
+                self.alive = False
+                try:
+                    # Força o handler a sair do recv e limpar a sessão
+                    self.sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+                return
+
+            if stop:
+                return
+
+    # ====================================== Socket ====================================================
+
+    def recv(self, bufsize: int, flags: int = 0) -> bytes:
+        if self._last_inbound_timings is not None:
+            self._last_inbound_timings["process"] = time.perf_counter() - self._last_recv_at
+            self._last_inbound_timings = None
+
+        try:
+            data = self.sock.recv(bufsize, flags)
+        except OSError:
+            self.alive = False
+            raise
+
+        if not data:
+            self.alive = False
+        else:
+            idle_reaper.touch("input", self, self.idle_timeout)
+
+            if settings.FLIGHT_RECORDER_ENABLED or latency_tracker.enabled:
+                self._last_recv_at = time.perf_counter()
+                if self._frame_started_at is None:
+                    self._frame_started_at = self._last_recv_at
+
+            if settings.FLIGHT_RECORDER_ENABLED:
+                self._last_inbound_timings = {}
+                self._record(INBOUND, data, self._last_inbound_timings)
+
+        return data
+
+    def begin_packet(self, pending: bool = False):
+        """
+        Chamado pelo handler com um frame completo, antes de processá-lo: abre o rastro de latência do pacote.
+        `pending` indica que sobraram no buffer bytes do próximo frame (recebidos no último recv).
+        """
+        metrics.inc("gateway_packets_received_total", self.protocol)
+
+        if not latency_tracker.enabled:
+            self._frame_started_at = None
+            return
+
+        frame_seconds = time.perf_counter() - self._frame_started_at if self._frame_started_at is not None else None
+        self._frame_started_at = self._last_recv_at if pending else None
+        latency_tracker.begin(self.protocol, frame_seconds)
+
+    def end_packet(self):
+        latency_tracker.end()
+
+    def _record(self, kind: int, data: bytes, timings: dict):
+        if not self.dev_id:
+            if len(self._pre_login_events) < _PRE_LOGIN_EVENTS:
+                self._pre_login_events.append((kind, data, timings))
+            return
+
+        if self._pre_login_events:
+            pre_login_events, self._pre_login_events = self._pre_login_events, []
+            for event in pre_login_events:
+                flight_recorder.record(self.dev_id, *event)
+
+        flight_recorder.record(self.dev_id, kind, data, timings)
+
+    def _reap_idle(self):
+        logger.warning(f"Rastreador sem comunicar há mais de {self.idle_timeout}s, encerrando conexão. endereco={self.addr}, device_id={self.dev_id}", log_label=self.dev_id or "SERVIDOR")
+        self.alive = False
+        try:
+            # O recv do handler retorna e a limpeza das sessões acontece no próprio handler
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def fileno(self) -> int:
+        return self.sock.fileno()
+
+    def getpeername(self):
+        return self.sock.getpeername()
+
+    def shutdown(self, how: int):
+        try:
+            self.sock.shutdown(how)
+        except OSError:
+            # Conexão já resetada pelo rastreador (ENOTCONN): o close ainda precisa acontecer
+            pass
+
+    def close(self):
+        self.alive = False
+        idle_reaper.forget("input", self)
+        if not self._closed:
+            self._closed = True
+            self._queue.put(_CLOSE)
+
+        self.sock.close()
@@ -0,0 +1,32 @@
+import socket
+import threading
+
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+def enable_tcp_keepalive(sock: socket.socket, idle: int, interval: int, count: int):
+    """
+    Liga o keepalive TCP no socket, para que conexões meio-abertas resultem em erro
+    em vez de ficarem penduradas indefinidamente.
+    """
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        if hasattr(socket, "TCP_KEEPIDLE"):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, idle)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, interval)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT, count)
+    except OSError as e:
+        logger.warning(f"Não foi possível configurar o keepalive TCP: {e}", log_label="SERVIDOR")
+
+class StripedLock:
+    """
+    Conjunto fixo de locks indexados pelo hash da chave.
+    Operações em chaves diferentes raramente disputam o mesmo lock, ao contrário de um lock global.
+    """
+
+    def __init__(self, stripes: int):
+        self._locks = [threading.Lock() for _ in range(max(1, stripes))]
+
+    def for_key(self, key) -> threading.Lock:
+        return self._locks[hash(key) % len(self._locks)]
@@ -0,0 +1,40 @@
+import schedule
+import time
+
+from app.core.logger import get_logger
+from app.config.settings import settings
+from app.services.codec_service import codec_registry
+from app.services.history_service import train_history_dictionary
+
+logger = get_logger(__name__)
+
+# Agenda própria, para não disputar a agenda global do `schedule` com os demais workers
+scheduler = schedule.Scheduler()
+
+def orchestrator():
+    # Sem dicionário ainda: treina assim que houver histórico suficiente
+    if codec_registry.get_current_version() is None:
+        history_dictionary_worker()
+        scheduler.every(1).hours.do(train_first_dictionary)
+
+    scheduler.every(settings.HISTORY_ZDICT_RETRAIN_DAYS).days.at("03:00").do(history_dictionary_worker)
+
+    while True:
+        scheduler.run_pending()
+        time.sleep(60)
+
+def train_first_dictionary():
+    if codec_registry.get_current_version() is not None:
+        return schedule.CancelJob
+
+    history_dictionary_worker()
+
+def history_dictionary_worker():
+    with logger.contextualize(log_label="HISTORY CODEC WORKER"):
+        try:
+            version = train_history_dictionary()
+            if version is not None:
+                logger.info(f"Dicionário de compressão do histórico treinado. versão={version}")
+
+        except Exception as e:
+            logger.error(f"Erro ao treinar dicionário de compressão do histórico: {e}")
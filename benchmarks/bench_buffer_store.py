@@ -0,0 +1,120 @@
+"""
+Benchmark do armazenamento de buffers do histórico com escritores concorrentes.
+
+Cada processo escritor simula um worker de histórico: lê, estende e regrava o buffer dos seus dispositivos
+(o ciclo feito a cada lote). Um processo leitor simula a API lendo buffers aleatórios.
+Compara um único `diskcache.Cache` (um banco SQLite) com `FanoutCache` em diferentes quantidades de shards.
+Não depende de Redis.
+
+Uso: python -m benchmarks.bench_buffer_store --writers 4 --seconds 5 --shards 1 8 16
+"""
+import argparse
+import multiprocessing
+import random
+import shutil
+import tempfile
+import time
+
+import diskcache
+
+
+def _open_store(directory: str, shards: int):
+    if shards <= 1:
+        return diskcache.Cache(directory, timeout=1.0)
+
+    return diskcache.FanoutCache(directory, shards=shards, timeout=1.0)
+
+
+def _writer(directory: str, shards: int, writer_index: int, devices: int, seconds: float, results):
+    store = _open_store(directory, shards)
+    packet = {"raw_packet": bytes(40), "translated_packet": "STT;" + "0" * 100, "timestamp": 0.0}
+
+    latencies = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        dev_id = f"{writer_index}-{random.randrange(devices)}"
+        key = f"buffer:{dev_id}"
+
+        start = time.perf_counter()
+        buffer = store.get(key, default=[], retry=True)
+        buffer.extend([packet] * 10)
+        if len(buffer) >= 500:
+            store.delete(key, retry=True)
+        else:
+            store.set(key, buffer, retry=True)
+        latencies.append(time.perf_counter() - start)
+
+    results.put(("writer", latencies))
+
+
+def _reader(directory: str, shards: int, writers: int, devices: int, seconds: float, results):
+    store = _open_store(directory, shards)
+
+    latencies = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        key = f"buffer:{random.randrange(writers)}-{random.randrange(devices)}"
+        start = time.perf_counter()
+        store.get(key, default=[], retry=True)
+        latencies.append(time.perf_counter() - start)
+
+    results.put(("reader", latencies))
+
+
+def _percentile(values: list, p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def bench(shards: int, writers: int, devices: int, seconds: float) -> dict:
+    directory = tempfile.mkdtemp(prefix="bench_buffer_store_")
+    try:
+        # Criando a estrutura antes de iniciar os processos
+        _open_store(directory, shards).close()
+
+        results = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=_writer, args=(directory, shards, i, devices, seconds, results)) for i in range(writers)]
+        processes.append(multiprocessing.Process(target=_reader, args=(directory, shards, writers, devices, seconds, results)))
+
+        for process in processes:
+            process.start()
+
+        collected = {"writer": [], "reader": []}
+        for _ in processes:
+            kind, latencies = results.get()
+            collected[kind].extend(latencies)
+
+        for process in processes:
+            process.join()
+
+        return {
+            "write_ops_per_sec": len(collected["writer"]) / seconds,
+            "write_p99_ms": _percentile(collected["writer"], 0.99) * 1000,
+            "read_ops_per_sec": len(collected["reader"]) / seconds,
+            "read_p99_ms": _percentile(collected["reader"], 0.99) * 1000,
+        }
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, default=4, help="processos escritores (workers de histórico)")
+    parser.add_argument("--devices", type=int, default=500, help="dispositivos por escritor")
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 8, 16], help="1 = um único diskcache.Cache")
+    args = parser.parse_args()
+
+    for shards in args.shards:
+        result = bench(shards, args.writers, args.devices, args.seconds)
+        label = "Cache (1 banco)" if shards <= 1 else f"FanoutCache ({shards} shards)"
+        print(
+            f"{label:<24} escrita: {result['write_ops_per_sec']:.0f} ops/s, p99={result['write_p99_ms']:.2f}ms | "
+            f"leitura: {result['read_ops_per_sec']:.0f} ops/s, p99={result['read_p99_ms']:.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
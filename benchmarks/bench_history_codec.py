@@ -0,0 +1,146 @@
+"""
+Benchmark dos codecs de compressão do histórico: taxa de compressão e tempo de (des)compressão por segmento.
+
+O corpus é sintético, misturando GT06 (localização, heartbeat, alarme) e Suntech (STT/ALT/ALV).
+Os segmentos são medidos no formato de registros binários do history_service e no formato JSON anterior
+(pacotes binários em hex). O dicionário é treinado com os pacotes de uma parte dos dispositivos e avaliado nos demais.
+
+Uso: python -m benchmarks.bench_history_codec --devices 200 --segment-sizes 10 50 500
+"""
+import argparse
+import json
+import random
+import struct
+import time
+
+from app.services.codec_service import ZlibCodec, ZdictCodec, train_dictionary
+from app.services.history_service import SEGMENT_MAGIC, _encode_record, render_packet
+
+
+def _gt06_location(serial: int, lat: float, lon: float, speed: int, course: int) -> bytes:
+    body = bytes([0x22]) + bytes([26, 1, 15, 12, random.randint(0, 59), random.randint(0, 59)])
+    body += bytes([0xCC]) + struct.pack(">IIBH", int(lat * 1800000) & 0xFFFFFFFF, int(lon * 1800000) & 0xFFFFFFFF, speed, course)
+    body += bytes.fromhex("02d4000b8c00a1b2") + struct.pack(">H", serial)
+    return b"\x78\x78" + bytes([len(body) + 2]) + body + struct.pack(">H", random.getrandbits(16)) + b"\r\n"
+
+
+def _gt06_heartbeat(serial: int) -> bytes:
+    body = bytes([0x13, 0x46, 0x06, 0x04, 0x00, 0x02]) + struct.pack(">H", serial)
+    return b"\x78\x78" + bytes([len(body) + 2]) + body + struct.pack(">H", random.getrandbits(16)) + b"\r\n"
+
+
+def _suntech_line(hdr: str, dev_id: str, serial: int, lat: float, lon: float, speed: float, course: float, alert_id: int = 0) -> str:
+    fields = [
+        hdr, dev_id, "FFF83F", "218", "1.0.11", "1", "20260115", time.strftime("%H:%M:%S"),
+        f"{lat:+.6f}", f"{lon:+.6f}", f"{speed:.2f}", f"{course:.2f}", "15", "1", "00000001", "00000000",
+    ]
+    if hdr == "STT":
+        fields += ["1", "1", f"{serial % 10000:04d}", ""]
+    else:
+        fields += [str(alert_id), "", "", ""]
+    fields += ["00028003", f"{random.uniform(11.5, 14.2):.2f}", "0.0", str(random.randint(1000, 900000)), "1"]
+    return ";".join(fields)
+
+
+def build_device_packets(dev_index: int, count: int) -> list:
+    imei = f"86{random.randint(10**12, 10**13 - 1)}"
+    output_id = imei[-10:]
+    gt06_input = dev_index % 2 == 0
+    lat, lon = random.uniform(-30, -5), random.uniform(-55, -35)
+    ts = time.time() - count * 30
+
+    packets = []
+    for serial in range(count):
+        lat += random.uniform(-0.001, 0.001)
+        lon += random.uniform(-0.001, 0.001)
+        speed = random.randint(0, 110)
+        course = random.randint(0, 359)
+        ts += random.uniform(10, 40)
+
+        kind = random.random()
+        if kind < 0.15:
+            raw = _gt06_heartbeat(serial) if gt06_input else f"ALV;{output_id}"
+            translated = f"ALV;{output_id}"
+        elif kind < 0.2:
+            raw = _gt06_location(serial, lat, lon, speed, course) if gt06_input else _suntech_line("ALT", imei, serial, lat, lon, speed, course, 33)
+            translated = _suntech_line("ALT", output_id, serial, lat, lon, speed, course, 33)
+        else:
+            raw = _gt06_location(serial, lat, lon, speed, course) if gt06_input else _suntech_line("STT", imei, serial, lat, lon, speed, course)
+            translated = _suntech_line("STT", output_id, serial, lat, lon, speed, course)
+
+        packets.append({"raw_packet": raw, "translated_packet": translated, "timestamp": ts})
+
+    return packets
+
+
+def encode_payload(segment: list, record_format: str) -> bytes:
+    if record_format == "json":
+        return json.dumps([render_packet(packet) for packet in reversed(segment)]).encode("utf-8")
+
+    return SEGMENT_MAGIC + b"".join(_encode_record(packet) for packet in reversed(segment))
+
+
+def encode_sample(packet: dict, record_format: str) -> bytes:
+    if record_format == "json":
+        return json.dumps(render_packet(packet)).encode("utf-8")
+
+    return _encode_record(packet)
+
+
+def bench_codec(codec, segments: list, record_format: str) -> dict:
+    payloads = [encode_payload(segment, record_format) for segment in segments]
+
+    start = time.perf_counter()
+    blobs = [codec.encode(payload) for payload in payloads]
+    encode_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for blob in blobs:
+        codec.decode(blob)
+    decode_time = time.perf_counter() - start
+
+    raw_size = sum(len(payload) for payload in payloads)
+    compressed_size = sum(len(blob) for blob in blobs)
+    return {
+        "ratio": raw_size / compressed_size,
+        "payload_bytes_per_segment": raw_size / len(blobs),
+        "bytes_per_segment": compressed_size / len(blobs),
+        "encode_us": encode_time / len(blobs) * 1e6,
+        "decode_us": decode_time / len(blobs) * 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--devices", type=int, default=200)
+    parser.add_argument("--packets", type=int, default=1000, help="pacotes por dispositivo")
+    parser.add_argument("--segment-sizes", type=int, nargs="+", default=[10, 50, 500])
+    parser.add_argument("--dict-size", type=int, default=4096)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    devices = [build_device_packets(i, args.packets) for i in range(args.devices)]
+    train_devices, test_devices = devices[: args.devices // 2], devices[args.devices // 2:]
+
+    for record_format in ("record", "json"):
+        samples = [encode_sample(packet, record_format) for packets in train_devices for packet in packets[:50]]
+        start = time.perf_counter()
+        zdict = train_dictionary(samples, size=args.dict_size)
+        print(f"\n=== Formato {record_format} ===")
+        print(f"Dicionário treinado com {len(samples)} pacotes: {len(zdict)} bytes em {time.perf_counter() - start:.2f}s")
+
+        codecs = [ZlibCodec(), ZdictCodec(1, zdict)]
+        for size in args.segment_sizes:
+            segments = [packets[i:i + size] for packets in test_devices for i in range(0, len(packets) - size + 1, size)]
+            print(f"Segmentos de {size} pacotes ({len(segments)} segmentos):")
+            for codec in codecs:
+                result = bench_codec(codec, segments, record_format)
+                print(
+                    f"  {codec.name:<6} sem compressão={result['payload_bytes_per_segment']:.0f}B  "
+                    f"comprimido={result['bytes_per_segment']:.0f}B  taxa={result['ratio']:.2f}x  "
+                    f"compressão={result['encode_us']:.0f}µs  descompressão={result['decode_us']:.0f}µs"
+                )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark de consultas `InputSessionsManager.exists` com muitas sessões e handlers concorrentes.
+
+Uso: python -m benchmarks.bench_input_sessions --sessions 10000 --threads 64 --seconds 5
+"""
+import argparse
+import random
+import threading
+import time
+
+from app.src.session.input_sessions_manager import input_sessions_manager
+
+
+class _FakeConnection:
+    """Conexão mínima: `exists` só consulta o estado de vida."""
+
+    def __init__(self, dev_id: str):
+        self.dev_id = dev_id
+        self.alive = True
+
+
+def run(sessions: int, threads: int, seconds: float) -> dict:
+    dev_ids = [str(860000000000000 + i) for i in range(sessions)]
+    for dev_id in dev_ids:
+        input_sessions_manager.active_trackers[dev_id] = _FakeConnection(dev_id)
+
+    stop = threading.Event()
+    counts = [0] * threads
+
+    def worker(idx: int):
+        rnd = random.Random(idx)
+        local_ids = [rnd.choice(dev_ids) for _ in range(1024)]
+        n = 0
+        while not stop.is_set():
+            for dev_id in local_ids:
+                input_sessions_manager.exists(dev_id)
+            n += len(local_ids)
+        counts[idx] = n
+
+    workers = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+
+    time.sleep(seconds)
+    stop.set()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    for dev_id in dev_ids:
+        input_sessions_manager.active_trackers.pop(dev_id, None)
+
+    total = sum(counts)
+    return {
+        "sessions": sessions,
+        "threads": threads,
+        "lookups": total,
+        "lookups_per_sec": int(total / elapsed),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=10000)
+    parser.add_argument("--threads", type=int, default=64)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    result = run(args.sessions, args.threads, args.seconds)
+    print(f"{result['lookups_per_sec']:,} lookups/s ({result['lookups']:,} consultas, {result['sessions']} sessões, {result['threads']} threads)")
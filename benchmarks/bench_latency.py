@@ -0,0 +1,81 @@
+"""
+Benchmark do custo da instrumentação de latência por pacote (latency_service).
+
+Reproduz os pontos de medição do caminho de um pacote: abertura do rastro, cinco comandos Redis,
+as etapas build/history/session/send, o ACK e o fechamento do rastro, em volta de um trabalho
+fixo simulado (`--work` iterações). Compara os histogramas ligados e desligados com o mesmo
+caminho sem os histogramas (apenas as medições das etapas para o flight recorder). Não depende de Redis.
+
+Uso: python -m benchmarks.bench_latency --packets 200000
+"""
+import argparse
+import time
+
+from app.services.latency_service import latency_tracker
+
+
+def _work(iterations: int):
+    total = 0
+    for value in range(iterations):
+        total += value
+    return total
+
+
+def packet_plain(work: int):
+    for _ in range(5):
+        _work(work)
+
+    # As etapas já eram cronometradas para o flight recorder
+    for _ in range(4):
+        start = time.perf_counter()
+        _work(work)
+        time.perf_counter() - start
+
+
+def packet_instrumented(work: int):
+    latency_tracker.begin("nt40", 0.00001)
+    for _ in range(5):
+        if latency_tracker.tracing():
+            start = time.perf_counter()
+            _work(work)
+            latency_tracker.add_redis(time.perf_counter() - start)
+        else:
+            _work(work)
+
+    for stage in ("build", "history", "session", "send"):
+        mark = latency_tracker.mark()
+        _work(work)
+        latency_tracker.stage(stage, mark)
+
+    latency_tracker.ack()
+    latency_tracker.end()
+
+
+def run(func, packets: int, work: int) -> float:
+    start = time.perf_counter()
+    for _ in range(packets):
+        func(work)
+
+    return (time.perf_counter() - start) / packets
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--packets", type=int, default=200000)
+    parser.add_argument("--work", type=int, default=10, help="iterações do trabalho simulado em cada etapa")
+    args = parser.parse_args()
+
+    baseline = run(packet_plain, args.packets, args.work)
+    print(f"{'sem histogramas':<20} {baseline * 1e6:>8.2f} µs/pacote")
+
+    for label, enabled in (("desligado", False), ("ligado", True)):
+        latency_tracker.configure(enabled=enabled, reset=True)
+        cost = run(packet_instrumented, args.packets, args.work)
+        print(f"{label:<20} {cost * 1e6:>8.2f} µs/pacote (+{(cost - baseline) * 1e6:.2f} µs)")
+
+    total = latency_tracker.snapshot()["protocols"]["nt40"]["total"]
+    print(f"Histograma 'total': p50={total['p50_ms']}ms p99={total['p99_ms']}ms max={total['max_ms']}ms")
+
+
+if __name__ == "__main__":
+    main()
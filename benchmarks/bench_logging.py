@@ -0,0 +1,139 @@
+"""
+Benchmark do custo do log por pacote com as configurações padrão (LOG_LEVEL, LOG_SAMPLE_EVERY).
+
+Reproduz as mensagens emitidas no caminho de um pacote de localização binário: frame recebido, pacote mapeado,
+ACK construído (DEBUG), pacote de saída construído (DEBUG) e encaminhamento ao servidor principal.
+O modo "anterior" usa o estilo antigo (f-strings formatadas antes da checagem de nível, uma mensagem por campo
+do pacote mapeado, sem amostragem); o modo "atual" usa formatação adiada e amostragem.
+O sink é direcionado para /dev/null, medindo formatação e escrita sem o custo do terminal, no modo síncrono
+e no assíncrono (fila limitada + thread escritora, com as mensagens descartadas contabilizadas).
+O cenário "exceção" mede `logger.exception` com e sem `diagnose`. `--write-latency` simula um stdout lento
+(pipe do journald cheio), que no modo síncrono trava a thread do rastreador. Não depende de Redis.
+
+Uso: python -m benchmarks.bench_logging --packets 20000 --threads 1 4 --sinks sync async --write-latency 0.0005
+"""
+import argparse
+import os
+import random
+import threading
+import time
+
+from app.core.logger import AsyncLogSink, get_logger, lazy, logger, logging_control
+
+bench_logger = get_logger("app.src.input.nt40.handler")
+packet_logger = get_logger("app.src.input.nt40.handler", sampled=True)
+
+
+class _SlowStream:
+    """/dev/null com uma latência fixa por escrita."""
+
+    def __init__(self, stream, latency: float):
+        self.stream = stream
+        self.latency = latency
+
+    def write(self, data: str):
+        if self.latency:
+            time.sleep(self.latency)
+        self.stream.write(data)
+
+    def flush(self):
+        self.stream.flush()
+
+
+def _mapped_packet() -> dict:
+    return {
+        "timestamp": "2026-01-15T12:00:00", "satellites": 12, "latitude": -23.550520, "longitude": -46.633308,
+        "speed_kmh": 62, "direction": 180, "gps_fixed": True, "is_realtime": True, "acc_status": 1,
+        "mcc": 724, "mnc": 11, "lac": 1234, "cell_id": 567890, "voltage": 12.6, "gps_odometer": 123456,
+    }
+
+
+def _format_mapped_packet(mapped_data: dict) -> str:
+    return "".join(f"\n  - {key}: {value}" for key, value in mapped_data.items())
+
+
+def packet_previous(packet_body: bytes, mapped: dict, output_packet: bytes):
+    bench_logger.info(f"Recebido pacote NT40: {packet_body.hex()}")
+
+    header = "--- Pacote NT40 Mapeado ---"
+    bench_logger.info(header)
+    for key, value in mapped.items():
+        bench_logger.info(f"  - {key}: {value}")
+    bench_logger.info("-" * len(header))
+
+    bench_logger.debug(f"Construido pacote de resposta GTO6: {packet_body[:10].hex()}")
+    bench_logger.debug(f"Construído pacote de localização GT06 (Protocol {hex(0x22)}): {output_packet.hex()}")
+    bench_logger.info(f"Encaminhando pacote de {len(output_packet)} bytes device_id=864943040000000")
+
+
+def packet_current(packet_body: bytes, mapped: dict, output_packet: bytes):
+    packet_logger.info("Recebido pacote NT40: {}", lazy(packet_body.hex))
+    packet_logger.info("--- Pacote {} Mapeado ---{}", "NT40", lazy(_format_mapped_packet, mapped), protocol="NT40")
+    bench_logger.debug("Construido pacote de resposta GTO6: {}", lazy(packet_body[:10].hex))
+    bench_logger.debug("Construído pacote de localização GT06 (Protocol {}): {}", hex(0x22), lazy(output_packet.hex))
+    packet_logger.info("Encaminhando pacote de {} bytes device_id={}", len(output_packet), "864943040000000")
+
+
+def packet_exception(packet_body: bytes, mapped: dict, output_packet: bytes):
+    try:
+        mapped["missing_field"]
+    except KeyError:
+        bench_logger.exception("Erro ao processar pacote NT40: {}", lazy(packet_body.hex))
+
+
+def run(func, packets: int, threads: int) -> float:
+    packet_body = random.randbytes(36)
+    output_packet = random.randbytes(40)
+    mapped = _mapped_packet()
+
+    def worker():
+        with logger.contextualize(log_label="864943040000000"):
+            for _ in range(packets // threads):
+                func(packet_body, mapped, output_packet)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+
+    return (packets // threads * threads) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--packets", type=int, default=20000)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--sinks", nargs="+", default=["sync", "async"], choices=["sync", "async"])
+    parser.add_argument("--write-latency", type=float, default=0.0, help="segundos por escrita no stream")
+    args = parser.parse_args()
+
+    stream = _SlowStream(open(os.devnull, "w"), args.write_latency)
+    config = logging_control.snapshot()
+    print(f"LOG_LEVEL={config['level']} LOG_SAMPLE_EVERY={config['sample_every']} latência de escrita={args.write_latency}s")
+
+    scenarios = (
+        ("anterior", packet_previous, False),
+        ("atual", packet_current, False),
+        ("exceção+diagnose", packet_exception, True),
+        ("exceção", packet_exception, False),
+    )
+    for sink_mode in args.sinks:
+        sink = AsyncLogSink(stream) if sink_mode == "async" else stream
+        logging_control.set_sink(sink)
+        print(f"\n=== Sink {sink_mode} ===")
+
+        for threads in args.threads:
+            for label, func, diagnose in scenarios:
+                logging_control.configure(diagnose=diagnose)
+                pps = run(func, args.packets, threads)
+                logging_control.flush()
+                print(f"{label:<17} threads={threads:<3} {pps:>10.0f} pacotes/s")
+
+        if sink_mode == "async":
+            print(f"Mensagens descartadas: {sink.stats()['dropped']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,378 @@
+"""
+Micro-benchmarks das funções quentes da tradução, medidas sobre um corpus congelado de frames por protocolo
+(`golden_frames.json`) e comparadas com a linha de base em `micro_baseline.json`.
+
+Casos: funções de decodificação e handlers de cada mapper de entrada, crc_itu, normalize_dev_id/get_output_dev_id,
+haversine e os builders de cada protocolo de saída (login, localização, alerta, heartbeat, resposta de comando).
+Os handlers rodam contra o armazenamento em memória (STORAGE_BACKEND="memory"): nenhum serviço é necessário.
+O log segue o nível configurado (LOG_LEVEL, ou --log-level), escrito em /dev/null.
+
+Cada caso é calibrado para durar cerca de --min-time segundos divididos em --repeat rodadas; o resultado é
+o menor tempo por chamada entre as rodadas; casos acima da tolerância são medidos de novo (--retries).
+Termina com código 1 se algum caso ficar mais de --tolerance acima da linha de base ou passar a levantar exceção;
+`--update` grava os tempos atuais como nova linha de base (casos que levantam exceção ficam registrados como erro).
+A linha de base só é comparável na mesma máquina: atualize-a ao trocar de ambiente.
+
+Uso: python -m benchmarks.bench_micro --filter nt40 output. --min-time 0.5
+     python -m benchmarks.bench_micro --update
+     python -m benchmarks.bench_micro --regenerate-corpus
+"""
+import argparse
+import gc
+import importlib
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+
+from app.config.settings import settings
+from benchmarks import corpus
+
+GOLDEN_FRAMES = os.path.join(os.path.dirname(__file__), "golden_frames.json")
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "micro_baseline.json")
+
+# Data fixa dos frames do corpus congelado
+GOLDEN_TIMESTAMP = datetime(2026, 1, 15, 12, 0, 0)
+LATITUDE, LONGITUDE = -23.55, -46.63
+
+# Protocolos com pacotes em texto (os demais são guardados em hex; o satelital tem bytes de início e fim)
+TEXT_PROTOCOLS = corpus.SUNTECH
+
+
+# ====================================== Corpus congelado ==========================================
+
+def generate_frames() -> dict:
+    frames = {}
+    for protocol in corpus.PROTOCOLS:
+        dev_id = corpus.device_id(protocol, 0)
+        packets = {
+            "login": corpus.login(protocol, dev_id, 1),
+            "location": corpus.location(protocol, dev_id, 2, LATITUDE, LONGITUDE, timestamp=GOLDEN_TIMESTAMP, mileage_km=1000),
+            # O heartbeat satelital leva data: fixada para o corpus não mudar a cada geração
+            "heartbeat": corpus.satellital_heartbeat(dev_id, GOLDEN_TIMESTAMP) if protocol == "satellital" else corpus.heartbeat(protocol, dev_id, 3),
+            "alarm": corpus.alarm(protocol, dev_id, 4, LATITUDE, LONGITUDE, timestamp=GOLDEN_TIMESTAMP),
+        }
+        encode = (lambda packet: packet.decode("ascii")) if protocol in TEXT_PROTOCOLS else bytes.hex
+        frames[protocol] = {kind: encode(packet) for kind, packet in packets.items() if packet is not None}
+
+    return frames
+
+
+def load_frames(path: str) -> dict:
+    with open(path) as file:
+        stored = json.load(file)
+
+    return {
+        protocol: {kind: packet.encode("ascii") if protocol in TEXT_PROTOCOLS else bytes.fromhex(packet) for kind, packet in packets.items()}
+        for protocol, packets in stored.items()
+    }
+
+
+def gt06_parts(frame: bytes) -> tuple:
+    """
+    (protocolo, conteúdo, serial) de um frame 78 78, como os processors da família GT06 recortam o corpo.
+    """
+    return frame[3], frame[4:-6], int.from_bytes(frame[-6:-4], "big")
+
+
+# ====================================== Casos =====================================================
+
+def _gt06_family_cases(protocol: str, dev_id: str, frames: dict) -> list:
+    mapper = importlib.import_module(f"app.src.input.{protocol}.mapper")
+    location_number, location, serial = gt06_parts(frames["location"])
+    _, heartbeat, heartbeat_serial = gt06_parts(frames["heartbeat"])
+    _, alarm, _ = gt06_parts(frames["alarm"])
+
+    decoders = {
+        "j16w": ("_decode_location_packet_x22",),
+        "j16x_j16": ("_decode_location_packet_x22",),
+        "nt40": ("decode_location_packet_x22",),
+        "vl01": ("_decode_location_packet",),
+        "vl03": ("_decode_location_packet_x22",),
+    }[protocol]
+
+    cases = [(f"{protocol}.{name}", getattr(mapper, name), (location,)) for name in decoders]
+    if protocol == "vl01":
+        cases.append((f"{protocol}.handle_location_packet", mapper.handle_location_packet, (dev_id, serial, location)))
+    else:
+        cases.append((f"{protocol}.handle_location_packet", mapper.handle_location_packet, (dev_id, serial, location, location_number)))
+
+    cases.append((f"{protocol}.handle_heartbeat_packet", mapper.handle_heartbeat_packet, (dev_id, heartbeat_serial, heartbeat)))
+    cases.append((f"{protocol}.handle_alarm_packet", mapper.handle_alarm_packet, (dev_id, alarm)))
+    return cases
+
+
+def _suntech_cases(protocol: str, frames: dict) -> list:
+    mapper = importlib.import_module(f"app.src.input.{protocol}.mapper")
+    # Sem o "\r" final, que o handler usa para separar os pacotes
+    stt = frames["location"].decode("ascii").rstrip("\r").split(";")
+    alt = frames["alarm"].decode("ascii").rstrip("\r").split(";")
+    if protocol == "suntech4g":
+        return [
+            (f"{protocol}.handle_stt_packet", mapper.handle_stt_packet, (stt,)),
+            (f"{protocol}.handle_alt_packet", mapper.handle_alt_packet, (alt,)),
+        ]
+
+    # ST300STT -> padrão ST300, como no processor
+    return [
+        (f"{protocol}.handle_stt_packet", mapper.handle_stt_packet, (stt, stt[0][:-3])),
+        (f"{protocol}.handle_alt_packet", mapper.handle_alt_packet, (alt, alt[0][:-3])),
+    ]
+
+
+def _gp900m_cases(frames: dict) -> list:
+    mapper = importlib.import_module("app.src.input.gp900m.mapper")
+    from app.src.input.gp900m.utils import get_dinamic_field
+
+    # Como no handler e no processor: corpo sem o byte inicial, evento no cabeçalho e payload após o tamanho
+    body = frames["location"][1:]
+    dev_id = body[1:9].hex()
+    serial = int.from_bytes(body[9:11], "big")
+    event, event_end = get_dinamic_field(body, 15)
+    _, payload_starts_at = get_dinamic_field(body, event_end)
+    payload = body[payload_starts_at:]
+    _, type_end = get_dinamic_field(payload, 0)
+    _, value_starts_at = get_dinamic_field(payload, type_end)
+
+    return [
+        ("gp900m.decode_general_report", mapper.decode_general_report, (payload[value_starts_at:],)),
+        ("gp900m.handle_general_report", mapper.handle_general_report, (dev_id, serial, payload, event, value_starts_at)),
+    ]
+
+
+def _satellital_cases(frames: dict) -> list:
+    mapper = importlib.import_module("app.src.input.satellital.mapper")
+    from app.src.input.satellital.handler import START_BIT, STOP_BIT
+
+    # O handler entrega ao mapper o JSON entre os bytes de início e fim
+    frame = frames["location"]
+    message = frame[frame.find(START_BIT) + len(START_BIT):frame.find(STOP_BIT, len(START_BIT))]
+    return [("satellital.handle_satelite_data", mapper.handle_satelite_data, (message,))]
+
+
+def _output_cases(sample_dev_id: str, location_data: dict, alert_data: dict) -> list:
+    from app.config.output_protocol_settings import output_protocol_settings
+    from app.src.output.gt06 import builder as gt06_builder
+    from app.src.output.suntech4g import builder as suntech_builder
+
+    reply_data = dict(location_data, REPLY="OUTPUT ON")
+    packet_data = {"location": location_data, "alert": alert_data, "heartbeat": location_data, "command_reply": reply_data}
+
+    cases = [
+        ("output.gt06.build_login_packet", gt06_builder.build_login_packet, (sample_dev_id, 1)),
+        ("output.gt06.build_voltage_info_packet", gt06_builder.build_voltage_info_packet, ({"voltage": 12.5}, 1)),
+        ("output.suntech4g.build_login_packet", suntech_builder.build_login_packet, (sample_dev_id,)),
+    ]
+    for output_protocol, builders in output_protocol_settings.OUTPUT_PROTOCOL_PACKET_BUILDERS.items():
+        for packet_type, builder in builders.items():
+            cases.append((f"output.{output_protocol}.{builder.__name__}[{packet_type}]", builder,
+                          (sample_dev_id, packet_data[packet_type], 5, packet_type)))
+
+    return cases
+
+
+def build_cases(frames: dict, redis_client) -> list:
+    """
+    Lista de (nome, função, argumentos). Os dispositivos do corpus são semeados no Redis em memória.
+    """
+    from app.src.input import utils as input_utils
+    from app.src.output import utils as output_utils
+
+    cases = []
+    for protocol in corpus.PROTOCOLS:
+        dev_id = corpus.device_id(protocol, 0)
+        corpus.seed(redis_client, protocol, dev_id, "suntech4g", LATITUDE, LONGITUDE)
+
+        if protocol in corpus.GT06_FAMILY:
+            cases.extend(_gt06_family_cases(protocol, dev_id, frames[protocol]))
+        elif protocol in corpus.SUNTECH:
+            cases.extend(_suntech_cases(protocol, frames[protocol]))
+        elif protocol == "gp900m":
+            cases.extend(_gp900m_cases(frames[protocol]))
+        elif protocol == "satellital":
+            cases.extend(_satellital_cases(frames[protocol]))
+
+    gt06_location = frames["nt40"]["location"]
+    sample_dev_id = corpus.device_id("nt40", 0)
+    cases.extend([
+        ("utils.crc_itu", input_utils.crc_itu, (gt06_location[2:-4],)),
+        ("utils.haversine", input_utils.haversine, (LATITUDE, LONGITUDE, LATITUDE + 0.01, LONGITUDE + 0.01)),
+        ("output.normalize_dev_id", output_utils.normalize_dev_id, (sample_dev_id,)),
+        ("output.get_output_dev_id[suntech4g]", output_utils.get_output_dev_id, (sample_dev_id, "suntech4g")),
+        ("output.get_output_dev_id[gt06]", output_utils.get_output_dev_id, (sample_dev_id, "gt06")),
+    ])
+
+    # Dados universais dos builders: a localização e o alerta decodificados pelo NT40 e pelo J16X/J16
+    from app.src.input.nt40 import mapper as nt40_mapper
+    from app.src.input.j16x_j16 import mapper as j16x_mapper
+    location_number, location, serial = gt06_parts(gt06_location)
+    location_data = nt40_mapper.handle_location_packet(sample_dev_id, serial, location, location_number)[0]
+    # O alarme do J16X/J16 não traz ACC nem voltagem: completado com a localização
+    alert_data = dict(location_data, **j16x_mapper.handle_alarm_packet(corpus.device_id("j16x_j16", 0), gt06_parts(frames["j16x_j16"]["alarm"])[1]))
+    cases.extend(_output_cases(sample_dev_id, location_data, alert_data))
+
+    return cases
+
+
+# ====================================== Medição ===================================================
+
+def _timed_loop(func, args: tuple, loops: int) -> float:
+    # Sem coletas do GC durante a rodada, como no timeit
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        for _ in range(loops):
+            func(*args)
+        return time.perf_counter() - start
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def measure(func, args: tuple, min_time: float, repeat: int) -> float:
+    """
+    Menor tempo por chamada (ns) entre `repeat` rodadas de `min_time / repeat` segundos cada.
+    """
+    target = min_time / repeat
+    loops = 1
+    while True:
+        elapsed = _timed_loop(func, args, loops)
+        if elapsed >= target:
+            break
+        loops = max(loops * 2, int(loops * target / max(elapsed, 1e-9) * 1.1))
+
+    best = elapsed
+    for _ in range(repeat - 1):
+        best = min(best, _timed_loop(func, args, loops))
+
+    return best / loops * 1e9
+
+
+def _format_ns(ns: float | None) -> str:
+    if ns is None:
+        return "-"
+    if ns >= 1e6:
+        return f"{ns / 1e6:.2f} ms"
+    if ns >= 1e3:
+        return f"{ns / 1e3:.2f} µs"
+    return f"{ns:.0f} ns"
+
+
+def run(args, redis_client) -> int:
+    """
+    Mede os casos, compara com a linha de base (ou a atualiza) e retorna a quantidade de falhas.
+    """
+    cases = build_cases(load_frames(args.frames), redis_client)
+    if args.filter:
+        cases = [case for case in cases if any(part in case[0] for part in args.filter)]
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baseline = json.load(file).get("cases", {})
+
+    print(f"{'caso':<58} {'por chamada':>12} {'base':>12} {'variação':>9}  resultado")
+
+    results = {}
+    failures = 0
+    for name, func, func_args in cases:
+        reference = baseline.get(name, {})
+        try:
+            func(*func_args)
+        except Exception as e:
+            results[name] = {"error": f"{type(e).__name__}: {e}"}
+            if args.update:
+                result = "atualizado"
+            elif "error" in reference:
+                result = "erro (já na base)"
+            else:
+                result = "ERRO"
+                failures += 1
+            print(f"{name:<58} {'-':>12} {_format_ns(reference.get('ns')):>12} {'-':>9}  {result}: {results[name]['error'][:80]}")
+            continue
+
+        ns = measure(func, func_args, args.min_time, args.repeat)
+        # Um caso acima da tolerância é medido de novo antes de ser reprovado: picos de carga da máquina
+        # não se repetem em todas as medições, uma regressão sim
+        for _ in range(args.retries):
+            if args.update or not reference.get("ns") or ns <= reference["ns"] * (1 + args.tolerance):
+                break
+            ns = min(ns, measure(func, func_args, args.min_time, args.repeat))
+
+        results[name] = {"ns": round(ns, 1)}
+
+        change = ns / reference["ns"] - 1 if reference.get("ns") else None
+        if args.update:
+            result = "atualizado"
+        elif change is None:
+            result = "sem base"
+        elif change > args.tolerance:
+            result = "REGRESSÃO"
+            failures += 1
+        else:
+            result = "ok"
+
+        print(f"{name:<58} {_format_ns(ns):>12} {_format_ns(reference.get('ns')):>12} "
+              f"{f'{change:+.0%}' if change is not None else '-':>9}  {result}")
+
+    if args.update:
+        stored = dict(baseline)
+        stored.update(results)
+
+        with open(args.baseline, "w") as file:
+            json.dump({
+                "python": platform.python_version(),
+                "machine": f"{platform.system()} {platform.machine()} {platform.processor() or ''}".strip(),
+                "updated_at": datetime.now().isoformat(timespec="seconds"),
+                "cases": dict(sorted(stored.items())),
+            }, file, indent=4)
+            file.write("\n")
+        print(f"Linha de base gravada em {args.baseline}")
+
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filter", nargs="+", help="apenas casos cujo nome contenha algum dos trechos")
+    parser.add_argument("--min-time", type=float, default=0.3, help="segundos de medição por caso")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="aumento relativo aceito sobre a linha de base")
+    parser.add_argument("--retries", type=int, default=2, help="novas medições de um caso acima da tolerância")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--frames", default=GOLDEN_FRAMES)
+    parser.add_argument("--log-level", help="nível do log durante a medição (padrão: LOG_LEVEL)")
+    parser.add_argument("--update", action="store_true", help="grava os tempos medidos como linha de base")
+    parser.add_argument("--regenerate-corpus", action="store_true", help="regrava o corpus congelado a partir de benchmarks/corpus.py")
+    args = parser.parse_args()
+
+    if args.regenerate_corpus:
+        with open(args.frames, "w") as file:
+            json.dump(generate_frames(), file, indent=4)
+            file.write("\n")
+        print(f"Corpus congelado gravado em {args.frames}")
+        return
+
+    # Antes de importar os módulos de app.src, que obtêm o cliente Redis na importação
+    settings.STORAGE_BACKEND = "memory"
+    from app.services.redis_service import get_redis
+    redis_client = get_redis()
+
+    from app.core.logger import SyncLogSink, logger, logging_control
+    logging_control.set_sink(SyncLogSink(open(os.devnull, "w")))
+    if args.log_level:
+        logging_control.configure(level=args.log_level)
+
+    with logger.contextualize(log_label="BENCHMARK"):
+        failures = run(args, redis_client)
+
+    if failures:
+        print(f"{failures} caso(s) acima da linha de base ou com erro")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Orçamento de idas e voltas ao Redis por pacote, por protocolo de entrada e tipo de pacote.
+
+Envia o corpus sintético (benchmarks/corpus.py) aos handlers reais por socketpair, com o servidor
+principal substituído pelo simulador local (benchmarks/upstream_simulator.py), e mede cada pacote com o rastro do latency_service
+(um comando ou um pipeline contam como uma ida e volta). Por padrão roda todos os protocolos de entrada do corpus.
+Termina com código 1 se algum tipo de pacote ultrapassar o orçamento de `redis_budgets.json` ou não tiver
+orçamento; `--update` grava os máximos observados como novo orçamento.
+
+Usa o armazenamento configurado e grava nas chaves dos dispositivos do corpus: rode contra um banco descartável,
+ou com STORAGE_BACKEND=memory, que dispensa o servidor Redis.
+
+Uso: REDIS_DB_MAIN=15 python -m benchmarks.bench_redis_budget --protocols nt40 suntech4g --packets 20
+     STORAGE_BACKEND=memory python -m benchmarks.bench_redis_budget
+"""
+import argparse
+import importlib
+import json
+import os
+import socket
+import sys
+import threading
+import time
+
+from app.config.settings import settings
+from app.config.output_protocol_settings import output_protocol_settings
+from app.services.latency_service import latency_tracker
+from app.services.redis_service import get_redis
+from benchmarks import corpus
+from benchmarks.upstream_simulator import UpstreamSimulator
+
+DEFAULT_BUDGETS = os.path.join(os.path.dirname(__file__), "redis_budgets.json")
+
+
+def traced_packets(protocol: str) -> int:
+    return sum(usage.packets for (name, _), usage in latency_tracker.redis_usage_stats().items() if name == protocol)
+
+
+def run_protocol(protocol: str, packets: int, output_protocol: str, timeout: float) -> int:
+    """
+    Envia o cenário do protocolo pacote a pacote, aguardando cada um ser rastreado. Retorna os pacotes sem rastro.
+    """
+    module_path, func_name = settings.INPUT_PROTOCOL_HANDLERS[protocol]["handler_path"].rsplit(".", 1)
+    handle_connection = getattr(importlib.import_module(module_path), func_name)
+
+    dev_id = corpus.DEVICES[protocol]
+    corpus.seed(get_redis(), protocol, dev_id, output_protocol)
+
+    device, gateway = socket.socketpair()
+    threading.Thread(target=handle_connection, args=(gateway, ("benchmark", 0)), daemon=True).start()
+
+    # ACKs e comandos enviados ao rastreador
+    def drain():
+        try:
+            while device.recv(4096):
+                pass
+        except OSError:
+            pass
+
+    threading.Thread(target=drain, daemon=True).start()
+
+    missing = 0
+    for _, packet in corpus.scenario(protocol, dev_id, packets):
+        before = traced_packets(protocol)
+        device.sendall(packet)
+
+        deadline = time.monotonic() + timeout
+        while traced_packets(protocol) <= before and time.monotonic() < deadline:
+            time.sleep(0.001)
+
+        if traced_packets(protocol) <= before:
+            missing += 1
+
+    device.close()
+    return missing
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--protocols", nargs="+", default=sorted(corpus.PROTOCOLS), choices=sorted(corpus.PROTOCOLS))
+    parser.add_argument("--packets", type=int, default=20, help="localizações por dispositivo")
+    parser.add_argument("--output-protocol", default="suntech4g", choices=sorted(output_protocol_settings.OUTPUT_PROTOCOL_PACKET_BUILDERS))
+    parser.add_argument("--budgets", default=DEFAULT_BUDGETS)
+    parser.add_argument("--timeout", type=float, default=5.0, help="espera máxima por pacote (segundos)")
+    parser.add_argument("--update", action="store_true", help="grava os máximos observados como orçamento")
+    args = parser.parse_args()
+
+    UpstreamSimulator().start().install()
+
+    latency_tracker.configure(enabled=True, reset=True)
+    for protocol in args.protocols:
+        missing = run_protocol(protocol, args.packets, args.output_protocol, args.timeout)
+        if missing:
+            print(f"{protocol}: {missing} pacote(s) não rastreado(s) em {args.timeout}s")
+
+    budgets = {}
+    if os.path.exists(args.budgets):
+        with open(args.budgets) as file:
+            budgets = json.load(file)
+
+    usage = latency_tracker.redis_usage()
+    print(f"{'protocolo':<12} {'tipo':<14} {'pacotes':>8} {'idas/pac':>9} {'máx':>5} {'cmds/pac':>9} {'orçamento':>10}  resultado")
+
+    failures = 0
+    for protocol in args.protocols:
+        for packet_type, stats in usage.get(protocol, {}).items():
+            budget = budgets.get(protocol, {}).get(packet_type)
+            if args.update:
+                budgets.setdefault(protocol, {})[packet_type] = stats["max_round_trips"]
+                result = "atualizado"
+            elif budget is None:
+                # Tipo de pacote sem orçamento não passa sem ser medido: rode com --update para registrá-lo
+                result = "SEM ORÇAMENTO"
+                failures += 1
+            elif stats["max_round_trips"] > budget:
+                result = "EXCEDIDO"
+                failures += 1
+            else:
+                result = "ok"
+
+            print(f"{protocol:<12} {packet_type:<14} {stats['packets']:>8} {stats['round_trips_per_packet']:>9} "
+                  f"{stats['max_round_trips']:>5} {stats['commands_per_packet']:>9} {str(budget if budget is not None else '-'):>10}  {result}")
+
+    if args.update:
+        with open(args.budgets, "w") as file:
+            json.dump(budgets, file, indent=4, sort_keys=True)
+            file.write("\n")
+        print(f"Orçamentos gravados em {args.budgets}")
+        return
+
+    if failures:
+        print(f"{failures} tipo(s) de pacote acima ou sem orçamento de idas e voltas ao Redis")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
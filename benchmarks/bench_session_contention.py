@@ -0,0 +1,186 @@
+"""
+Benchmark de contenção dos registros de sessões com milhares de threads de handler concorrentes.
+
+- Entrada: cada thread registra, consulta e remove a sessão do seu dispositivo em loop.
+- Saída: parte dos dispositivos tem um `connect` lento (upstream travado); mede-se a latência
+  de `get_session` dos demais, que não deve ser afetada.
+- Saída com reaper: cada thread envia pacotes pelo send_to_main_server com pausas em torno de um prazo de ociosidade
+  curto, e o reaper remove as sessões enquanto há envios; nenhum pacote pode ser descartado por uma sessão
+  removida entre get_session e o envio.
+
+Uso: python -m benchmarks.bench_session_contention --threads 2000 --seconds 5
+"""
+import argparse
+import random
+import threading
+import time
+
+from app.src.session.input_sessions_manager import input_sessions_manager
+from app.src.session import output_sessions_manager as output_module
+from app.src.session.output_sessions_manager import output_sessions_manager, send_to_main_server
+from app.src.session.idle_reaper import idle_reaper
+from app.services.redis_service import get_redis
+from app.config.settings import settings
+
+
+class _FakeConnection:
+    def __init__(self):
+        self.dev_id = None
+        self.alive = True
+
+
+def _percentile(values: list, p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def _run_threads(threads: int, seconds: float, target) -> float:
+    stop = threading.Event()
+    workers = [threading.Thread(target=target, args=(i, stop), daemon=True) for i in range(threads)]
+
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in workers:
+        t.join()
+
+    return time.perf_counter() - start
+
+
+def bench_input(threads: int, seconds: float) -> dict:
+    counts = [0] * threads
+
+    def worker(idx: int, stop: threading.Event):
+        dev_id = f"bench-in-{idx}"
+        conn = _FakeConnection()
+        n = 0
+        while not stop.is_set():
+            input_sessions_manager.register_session(dev_id, conn)
+            input_sessions_manager.exists(dev_id)
+            input_sessions_manager.remove_session(dev_id)
+            n += 3
+        counts[idx] = n
+
+    elapsed = _run_threads(threads, seconds, worker)
+    return {"ops_per_sec": int(sum(counts) / elapsed)}
+
+
+def bench_output(threads: int, seconds: float, slow_ratio: float, slow_connect: float) -> dict:
+    slow_every = max(1, int(1 / slow_ratio)) if slow_ratio > 0 else 0
+    original_connect = output_module.MainServerSession.connect
+
+    def fake_connect(session):
+        if slow_every and int(session.dev_id.split("-")[-1]) % slow_every == 0:
+            time.sleep(slow_connect)
+        return True
+
+    output_module.MainServerSession.connect = fake_connect
+    latencies = [[] for _ in range(threads)]
+
+    def worker(idx: int, stop: threading.Event):
+        dev_id = f"bench-out-{idx}"
+        is_slow = slow_every and idx % slow_every == 0
+        while not stop.is_set():
+            start = time.perf_counter()
+            output_sessions_manager.get_session(dev_id, "gt06", "0")
+            if not is_slow:
+                latencies[idx].append(time.perf_counter() - start)
+            output_sessions_manager.delete_session(dev_id)
+
+    try:
+        _run_threads(threads, seconds, worker)
+    finally:
+        output_module.MainServerSession.connect = original_connect
+
+    fast = [lat for per_thread in latencies for lat in per_thread]
+    return {
+        "get_session_calls": len(fast),
+        "p50_ms": round(_percentile(fast, 0.50) * 1000, 3),
+        "p99_ms": round(_percentile(fast, 0.99) * 1000, 3),
+    }
+
+
+def bench_output_reaping(threads: int, seconds: float, idle_timeout: float) -> dict:
+    original_connect = output_module.MainServerSession.connect
+    original_sendall = output_module.MainServerSession._sendall
+    original_add_packet_to_history = output_module.add_packet_to_history
+    original_idle_timeout = settings.MAIN_SERVER_SESSION_IDLE_TIMEOUT
+    sent = [0] * threads
+
+    def fake_connect(session):
+        # Mesmas regras do connect: sessão removida não reconecta
+        with session.lock:
+            if session._is_deleted:
+                return False
+            session._is_connected = True
+            return True
+
+    def fake_sendall(session, packet: bytes, timings: dict | None = None):
+        sent[int(session.dev_id.split("-")[-1])] += 1
+
+    def get_session_yielding(dev_id: str, output_protocol: str, serial: str):
+        # Cede a vez às outras threads entre get_session e o envio, como acontece sob carga
+        session = original_get_session(dev_id, output_protocol, serial)
+        time.sleep(0)
+        return session
+
+    original_get_session = output_sessions_manager.get_session
+    output_module.MainServerSession.connect = fake_connect
+    output_module.MainServerSession._sendall = fake_sendall
+    output_module.add_packet_to_history = lambda *args, **kwargs: None
+    output_sessions_manager.get_session = get_session_yielding
+    settings.MAIN_SERVER_SESSION_IDLE_TIMEOUT = idle_timeout
+
+    redis_client = get_redis()
+    for idx in range(threads):
+        redis_client.hset(f"tracker:bench-reap-{idx}", "output_protocol", "suntech4g")
+
+    calls = [0] * threads
+    reaped_before = idle_reaper.get_stats()["output"]
+
+    def worker(idx: int, stop: threading.Event):
+        dev_id = f"bench-reap-{idx}"
+        rng = random.Random(idx)
+        while not stop.is_set():
+            send_to_main_server(dev_id, serial="0", type="heartbeat")
+            calls[idx] += 1
+            # Pausas em torno do prazo de ociosidade: parte dos envios chega junto com a remoção da sessão
+            time.sleep(rng.uniform(0, 2 * idle_timeout))
+
+    try:
+        _run_threads(threads, seconds, worker)
+    finally:
+        output_module.MainServerSession.connect = original_connect
+        output_module.MainServerSession._sendall = original_sendall
+        output_module.add_packet_to_history = original_add_packet_to_history
+        settings.MAIN_SERVER_SESSION_IDLE_TIMEOUT = original_idle_timeout
+        del output_sessions_manager.get_session
+        for idx in range(threads):
+            output_sessions_manager.delete_session(f"bench-reap-{idx}")
+
+    return {"sends": sum(calls), "reaped": idle_reaper.get_stats()["output"] - reaped_before, "dropped": sum(calls) - sum(sent)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threads", type=int, default=2000)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--slow-ratio", type=float, default=0.01, help="Fração dos dispositivos com connect lento")
+    parser.add_argument("--slow-connect", type=float, default=2.0, help="Duração do connect lento, em segundos")
+    parser.add_argument("--idle-timeout", type=float, default=0.05, help="Prazo de ociosidade das sessões de saída no cenário com reaper, em segundos")
+    args = parser.parse_args()
+
+    result = bench_input(args.threads, args.seconds)
+    print(f"Entrada: {result['ops_per_sec']:,} ops/s com {args.threads} threads")
+
+    result = bench_output(args.threads, args.seconds, args.slow_ratio, args.slow_connect)
+    print(f"Saída: get_session p50={result['p50_ms']}ms p99={result['p99_ms']}ms ({result['get_session_calls']:,} chamadas, {args.slow_ratio:.0%} dos connects levando {args.slow_connect}s)")
+
+    result = bench_output_reaping(args.threads, args.seconds, args.idle_timeout)
+    print(f"Saída com reaper: {result['sends']:,} envios, {result['reaped']:,} sessões removidas, {result['dropped']:,} pacotes descartados")
+    if result["dropped"]:
+        raise SystemExit(1)
@@ -0,0 +1,396 @@
+"""
+Corpus de pacotes sintéticos dos protocolos de entrada, com CRC e layouts aceitos pelos handlers.
+Usado pelos benchmarks que exercitam o caminho real de tradução.
+
+Família GT06 (NT40, VL01, VL03, J16W, J16X/J16): 78 78 | tamanho | protocolo | conteúdo | serial (2) | CRC-ITU (2) | 0D 0A,
+onde o tamanho cobre protocolo, conteúdo, serial e CRC e o CRC cobre do tamanho ao serial.
+GP900M: 7D | marcação | IMEI (8) | serial (2) | data (4) | evento | tamanho | tipo do payload | tamanho | relatório.
+"""
+import json
+import random
+import struct
+from datetime import datetime
+
+from crc import Calculator, Configuration
+
+# CRC-ITU (X.25) dos frames GT06, o mesmo de app.src.input.utils.crc_itu. Calculado aqui para que o corpus
+# não importe os módulos de entrada, que conectam ao Redis na importação (o gerador de carga roda sem Redis).
+_CRC_ITU = Calculator(Configuration(width=16, polynomial=0x1021, init_value=0xFFFF, final_xor_value=0xFFFF, reverse_input=True, reverse_output=True))
+
+
+def crc_itu(data: bytes) -> int:
+    return _CRC_ITU.checksum(data)
+
+# Dispositivos usados por padrão em cada protocolo (todos os protocolos de entrada)
+DEVICES = {
+    "j16w": "864943010000001",
+    "j16x_j16": "864943020000001",
+    "nt40": "864943040000001",
+    "vl01": "864943050000001",
+    "vl03": "864943060000001",
+    "suntech2g": "906000001",
+    "suntech4g": "907000001",
+    "gp900m": "0864943070000001",
+    "satellital": "0-4500001",
+}
+
+GT06_FAMILY = ("j16w", "j16x_j16", "nt40", "vl01", "vl03")
+SUNTECH = ("suntech2g", "suntech4g")
+PROTOCOLS = GT06_FAMILY + SUNTECH + ("gp900m", "satellital")
+
+
+def device_id(protocol: str, index: int) -> str:
+    """
+    Identificador sintético e estável do `index`-ésimo dispositivo do protocolo, no formato que o handler extrai do pacote.
+    """
+    code = PROTOCOLS.index(protocol)
+    if protocol in GT06_FAMILY:
+        return f"8690{code}{index:010d}"
+    if protocol == "gp900m":
+        return f"08690{code}{index:010d}"
+    if protocol in SUNTECH:
+        return f"9{code}{index:07d}"
+
+    return f"0-9{index:06d}"
+
+
+def _coordinates_course(latitude: float, longitude: float, course: int, realtime: bool = True) -> tuple:
+    """
+    (lat_raw, lon_raw, course_status) no formato GT06: graus * 1.800.000, bit 10 = norte, bit 11 = oeste, bit 12 = GPS fixo.
+    """
+    course_status = (course & 0x03FF) | (1 << 12)
+    if latitude >= 0:
+        course_status |= 1 << 10
+    if longitude < 0:
+        course_status |= 1 << 11
+    if not realtime:
+        course_status |= 1 << 13
+
+    return int(abs(latitude) * 1800000), int(abs(longitude) * 1800000), course_status
+
+
+def _datetime_bytes(timestamp: datetime | None) -> bytes:
+    timestamp = timestamp or datetime.utcnow()
+    return bytes([timestamp.year - 2000, timestamp.month, timestamp.day, timestamp.hour, timestamp.minute, timestamp.second])
+
+
+# ====================================== Família GT06 ==============================================
+
+def gt06_frame(protocol_number: int, content: bytes, serial: int) -> bytes:
+    body = bytes([len(content) + 5, protocol_number]) + content + struct.pack(">H", serial & 0xFFFF)
+    return b"\x78\x78" + body + struct.pack(">H", crc_itu(body)) + b"\x0d\x0a"
+
+
+def gt06_login(dev_id: str, serial: int = 1) -> bytes:
+    # IMEI em BCD, 8 bytes (15 dígitos com um zero à esquerda)
+    return gt06_frame(0x01, bytes.fromhex(dev_id.rjust(16, "0")), serial)
+
+
+def gt06_heartbeat(serial: int, acc: int = 1, output: int = 0) -> bytes:
+    terminal_info = 0x44 | (acc << 1) | (output << 7)
+    # Informação do terminal, nível de voltagem, sinal GSM, idioma (2)
+    return gt06_frame(0x13, bytes([terminal_info, 6, 4, 0, 2]), serial)
+
+
+def gt06_location(serial: int, latitude: float, longitude: float, speed: int = 60, course: int = 180,
+                  timestamp: datetime | None = None, acc: int = 1, mileage_km: int = 0, realtime: bool = True) -> bytes:
+    lat_raw, lon_raw, course_status = _coordinates_course(latitude, longitude, course)
+
+    # Pacote 0x22: data, satélites, GPS, MCC/MNC/LAC/célula, ACC, modo de envio, tempo real, odômetro
+    content = _datetime_bytes(timestamp) + bytes([0xCC])
+    content += struct.pack(">IIBH", lat_raw, lon_raw, speed, course_status)
+    content += struct.pack(">HBH", 724, 5, 0) + bytes(3)
+    content += bytes([acc, 0, 0 if realtime else 1]) + struct.pack(">I", mileage_km)
+    return gt06_frame(0x22, content, serial)
+
+
+def gt06_alarm(protocol_number: int, serial: int, latitude: float, longitude: float, alarm_code: int,
+               code_at: int = 30, timestamp: datetime | None = None, compact: bool = False) -> bytes:
+    """
+    Alarme com posição GPS e o código em `code_at` (0x16/0x26: 30; NT40: 31; VL03: 37).
+    `compact` é o layout 0x95 do VL01 (data, posição e curso, sem satélites e velocidade).
+    """
+    lat_raw, lon_raw, course_status = _coordinates_course(latitude, longitude, 0)
+    if compact:
+        content = _datetime_bytes(timestamp) + struct.pack(">IIH", lat_raw, lon_raw, course_status)
+    else:
+        content = _datetime_bytes(timestamp) + bytes([0xCC]) + struct.pack(">IIBH", lat_raw, lon_raw, 0, course_status)
+
+    content = content.ljust(code_at, b"\x00") + bytes([alarm_code, 0x02])
+    return gt06_frame(protocol_number, content, serial)
+
+
+def nt40_location(serial: int, latitude: float, longitude: float, speed: int = 60, course: int = 180,
+                  timestamp: datetime | None = None, acc: int = 1, voltage: float = 12.5, mileage_km: int = 0,
+                  realtime: bool = True) -> bytes:
+    lat_raw, lon_raw, course_status = _coordinates_course(latitude, longitude, course, realtime)
+
+    # Pacote 0x22: 9 bytes iniciais e o bloco de localização (data, LBS, GPS, estado, voltagem, alarme, odômetro)
+    location = _datetime_bytes(timestamp) + bytes(6) + bytes([0xCC])
+    location += struct.pack(">IIBH", lat_raw, lon_raw, speed, course_status)
+    location += bytes(9) + bytes([0x44 | (acc << 1)]) + struct.pack(">H", int(voltage * 100))
+    location += bytes(2) + bytes(2) + mileage_km.to_bytes(3, "big")
+    return gt06_frame(0x22, bytes(9) + location, serial)
+
+
+def vl01_location(serial: int, latitude: float, longitude: float, speed: int = 60, course: int = 180,
+                  timestamp: datetime | None = None, acc: int = 1, mileage_km: int = 0, realtime: bool = True) -> bytes:
+    lat_raw, lon_raw, course_status = _coordinates_course(latitude, longitude, course)
+
+    # Pacote 0xA0: data, satélites, GPS, MCC/MNC/LAC/célula, ACC, modo de envio, tempo real, odômetro
+    content = _datetime_bytes(timestamp) + bytes([0xCC])
+    content += struct.pack(">IIBH", lat_raw, lon_raw, speed, course_status)
+    content += struct.pack(">HB", 724, 5) + bytes(4) + bytes(8)
+    content += bytes([acc, 0, 0 if realtime else 1]) + struct.pack(">I", mileage_km)
+    return gt06_frame(0xA0, content, serial)
+
+
+# ====================================== Suntech 4G ================================================
+
+def _suntech_fields(dev_id: str, serial: int, latitude: float, longitude: float, speed: float, course: float,
+                    timestamp: datetime | None, acc: int, voltage: float, odometer: int, alert_id: int = 0, realtime: bool = True) -> list:
+    timestamp = timestamp or datetime.utcnow()
+    return [
+        dev_id, "FFF83F", "ST4310", "1.0.0", "1" if realtime else "0", timestamp.strftime("%Y%m%d"), timestamp.strftime("%H:%M:%S"),
+        f"{latitude:+.6f}", f"{longitude:+.6f}", f"{speed:.2f}", f"{course:.2f}", "12", "1",
+        str(acc), "0", str(alert_id), "0", "0", "0", "0", f"{voltage:.2f}", str(serial), str(odometer),
+    ]
+
+
+def suntech_stt(dev_id: str, serial: int, latitude: float, longitude: float, speed: float = 60.0, course: float = 180.0,
+                timestamp: datetime | None = None, acc: int = 1, voltage: float = 12.5, odometer: int = 0, realtime: bool = True) -> bytes:
+    fields = _suntech_fields(dev_id, serial, latitude, longitude, speed, course, timestamp, acc, voltage, odometer, realtime=realtime)
+    return ("STT;" + ";".join(fields) + "\r").encode("ascii")
+
+
+def suntech_alt(dev_id: str, serial: int, alert_id: int, latitude: float, longitude: float, speed: float = 0.0, course: float = 0.0,
+                timestamp: datetime | None = None, acc: int = 1, voltage: float = 12.5, odometer: int = 0) -> bytes:
+    fields = _suntech_fields(dev_id, serial, latitude, longitude, speed, course, timestamp, acc, voltage, odometer, alert_id)
+    return ("ALT;" + ";".join(fields) + "\r").encode("ascii")
+
+
+def suntech_alv(dev_id: str) -> bytes:
+    return f"ALV;{dev_id}\r".encode("ascii")
+
+
+def _st300_fields(dev_id: str, serial: int, latitude: float, longitude: float, speed: float, course: float,
+                  timestamp: datetime | None, acc: int, voltage: float, odometer: int, alert_id: int, realtime: bool) -> list:
+    timestamp = timestamp or datetime.utcnow()
+    # Entradas/saídas: ignição no primeiro caractere, saída no quinto
+    io = f"{acc}0000000"
+    return [
+        dev_id, "04", "1097B", timestamp.strftime("%Y%m%d"), timestamp.strftime("%H:%M:%S"), "0a0b0c",
+        f"{latitude:+.6f}", f"{longitude:+.6f}", f"{speed:.2f}", f"{course:.2f}", "12", "1", str(odometer), f"{voltage:.2f}",
+        io, str(alert_id) if alert_id else "1", str(serial), "0", "0", "1" if realtime else "0",
+    ]
+
+
+def suntech2g_stt(dev_id: str, serial: int, latitude: float, longitude: float, speed: float = 60.0, course: float = 180.0,
+                  timestamp: datetime | None = None, acc: int = 1, voltage: float = 12.5, odometer: int = 0, realtime: bool = True) -> bytes:
+    fields = _st300_fields(dev_id, serial, latitude, longitude, speed, course, timestamp, acc, voltage, odometer, 0, realtime)
+    return ("ST300STT;" + ";".join(fields) + "\r").encode("ascii")
+
+
+def suntech2g_alt(dev_id: str, serial: int, alert_id: int, latitude: float, longitude: float, speed: float = 0.0, course: float = 0.0,
+                  timestamp: datetime | None = None, acc: int = 1, voltage: float = 12.5, odometer: int = 0) -> bytes:
+    fields = _st300_fields(dev_id, serial, latitude, longitude, speed, course, timestamp, acc, voltage, odometer, alert_id, True)
+    # No ALT o indicador de tempo real fica um campo antes do STT
+    return ("ST300ALT;" + ";".join(fields[:18] + fields[19:]) + "\r").encode("ascii")
+
+
+def suntech2g_alv(dev_id: str) -> bytes:
+    return f"ST300ALV;{dev_id}\r".encode("ascii")
+
+
+# ====================================== GP900M ====================================================
+
+def _gp900m_dynamic(value: int) -> bytes:
+    # Campos dinâmicos: 1 byte abaixo de 224, senão 2 bytes com os 13 bits menos significativos
+    return bytes([value]) if value < 224 else struct.pack(">H", 0xE000 | value)
+
+
+def _gp900m_timestamp(timestamp: datetime) -> int:
+    # Segundos desde 2000 com meses de 31 dias (como decodificado pelo mapper)
+    days = ((timestamp.year - 2000) * 12 + timestamp.month - 1) * 31 + timestamp.day - 1
+    return days * 86400 + timestamp.hour * 3600 + timestamp.minute * 60 + timestamp.second
+
+
+def gp900m_report(dev_id: str, serial: int, latitude: float, longitude: float, speed: int = 60, course: int = 180,
+                  timestamp: datetime | None = None, acc: int = 1, voltage: float = 12.5, odometer: int = 0,
+                  event: int = 0, needs_ack: bool = False) -> bytes:
+    """
+    Relatório geral (payload 0x00) com data GPS, posição, velocidade/direção, precisão, voltagem, GPIO e odômetro.
+    """
+    timestamp = timestamp or datetime.utcnow()
+    gps_time = _gp900m_timestamp(timestamp)
+
+    mask = (1 << 1) | (1 << 2) | (1 << 3) | (1 << 5) | (1 << 6) | (1 << 12) | (1 << 14)
+    report = struct.pack(">II", mask, gps_time)
+    report += struct.pack(">II", int((latitude + 90) * 1000000), int((longitude + 180) * 1000000))
+    report += struct.pack(">BH", speed, course) + bytes([0x1C, 0x00])
+    report += struct.pack(">HBI", int(voltage * 1000), acc, odometer)
+    payload = _gp900m_dynamic(0x00) + _gp900m_dynamic(len(report)) + report
+
+    header = bytes([0x01 if needs_ack else 0x00]) + bytes.fromhex(dev_id.rjust(16, "0"))
+    header += struct.pack(">HI", serial & 0xFFFF, gps_time) + _gp900m_dynamic(event) + _gp900m_dynamic(len(payload))
+    return b"\x7d" + header + payload
+
+
+# ====================================== Satelital =================================================
+
+def satellital_message(esn: str, latitude: float, longitude: float, speed: float = 60.0, course: float = 180.0, acc: int = 1,
+                       timestamp: datetime | None = None, message_type: str = "location") -> bytes:
+    timestamp = timestamp or datetime.utcnow()
+    message = {
+        "ESN": esn,
+        "message_type": message_type,
+        "latitude": latitude,
+        "longitude": longitude,
+        "speed_kmh": speed,
+        "direction": course,
+        "acc_status": acc,
+        "timestamp": timestamp.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    return b"\xff" + json.dumps(message).encode("utf-8") + b"\xfe"
+
+
+def satellital_heartbeat(esn: str, timestamp: datetime | None = None) -> bytes:
+    return satellital_message(esn, 0.0, 0.0, 0.0, 0.0, 0, timestamp, "heartbeat")
+
+
+# ====================================== Por protocolo =============================================
+
+def login(protocol: str, dev_id: str, serial: int = 1) -> bytes | None:
+    """
+    Pacote de login, nos protocolos que autenticam a conexão (família GT06).
+    """
+    return gt06_login(dev_id, serial) if protocol in GT06_FAMILY else None
+
+
+def location(protocol: str, dev_id: str, serial: int, latitude: float, longitude: float, speed: int = 60, course: int = 180,
+             timestamp: datetime | None = None, mileage_km: int = 0, realtime: bool = True) -> bytes:
+    if protocol == "nt40":
+        return nt40_location(serial, latitude, longitude, speed, course, timestamp, mileage_km=mileage_km, realtime=realtime)
+    if protocol == "vl01":
+        return vl01_location(serial, latitude, longitude, speed, course, timestamp, mileage_km=mileage_km, realtime=realtime)
+    if protocol in GT06_FAMILY:
+        return gt06_location(serial, latitude, longitude, speed, course, timestamp, mileage_km=mileage_km, realtime=realtime)
+    if protocol == "suntech4g":
+        return suntech_stt(dev_id, serial, latitude, longitude, speed, course, timestamp, odometer=mileage_km * 1000, realtime=realtime)
+    if protocol == "suntech2g":
+        return suntech2g_stt(dev_id, serial, latitude, longitude, speed, course, timestamp, odometer=mileage_km * 1000, realtime=realtime)
+    if protocol == "gp900m":
+        return gp900m_report(dev_id, serial, latitude, longitude, speed, course, timestamp, odometer=mileage_km * 1000)
+    if protocol == "satellital":
+        return satellital_message(dev_id, latitude, longitude, speed, course, timestamp=timestamp)
+
+    raise ValueError(f"Protocolo sem corpus: {protocol}")
+
+
+def heartbeat(protocol: str, dev_id: str, serial: int) -> bytes | None:
+    """
+    Heartbeat do protocolo (o GP900M não tem; envia apenas relatórios).
+    """
+    if protocol in GT06_FAMILY:
+        return gt06_heartbeat(serial)
+    if protocol == "suntech4g":
+        return suntech_alv(dev_id)
+    if protocol == "suntech2g":
+        return suntech2g_alv(dev_id)
+    if protocol == "satellital":
+        return satellital_heartbeat(dev_id)
+
+    return None
+
+
+def alarm(protocol: str, dev_id: str, serial: int, latitude: float, longitude: float, timestamp: datetime | None = None) -> bytes | None:
+    """
+    Alarme mapeado em UNIVERSAL_ALERT_ID_DICTIONARY (pânico, excesso de velocidade ou antena GPS).
+    """
+    if protocol == "nt40":
+        return gt06_alarm(0x16, serial, latitude, longitude, 0x01, 31, timestamp)
+    if protocol == "vl01":
+        return gt06_alarm(0x95, serial, latitude, longitude, 0x06, 16, timestamp, compact=True)
+    if protocol == "vl03":
+        return gt06_alarm(0x26, serial, latitude, longitude, 0x06, 37, timestamp)
+    if protocol == "j16w":
+        return gt06_alarm(0x26, serial, latitude, longitude, 0x06, 30, timestamp)
+    if protocol == "j16x_j16":
+        return gt06_alarm(0x16, serial, latitude, longitude, 0x06, 30, timestamp)
+    if protocol == "suntech4g":
+        return suntech_alt(dev_id, serial, 3, latitude, longitude, timestamp=timestamp)
+    if protocol == "suntech2g":
+        return suntech2g_alt(dev_id, serial, 1, latitude, longitude, timestamp=timestamp)
+    if protocol == "gp900m":
+        return gp900m_report(dev_id, serial, latitude, longitude, timestamp=timestamp, event=0x13)
+
+    return None
+
+
+def acknowledged(protocol: str, kind: str) -> bool:
+    """
+    Se o gateway responde ao pacote com um ACK (frame 78 78 com o mesmo serial). Apenas a família GT06 responde:
+    login, heartbeat e alarme sempre; localização apenas no VL01 e no VL03.
+    """
+    if protocol not in GT06_FAMILY:
+        return False
+
+    return kind != "location" or protocol in ("vl01", "vl03")
+
+
+def random_walk(latitude: float, longitude: float, meters: float = 50.0) -> tuple:
+    """
+    Próxima posição de um dispositivo em movimento, até `meters` metros em cada eixo.
+    """
+    step = meters / 111000
+    return latitude + random.uniform(-step, step), longitude + random.uniform(-step, step)
+
+
+# ====================================== Cenários ==================================================
+
+def scenario(protocol: str, dev_id: str, count: int = 5, latitude: float = -23.55, longitude: float = -46.63) -> list:
+    """
+    Sequência de pacotes (rótulo, bytes) de um dispositivo: login (família GT06), `count` localizações
+    deslocadas alguns metros entre si e, quando o protocolo tem, um heartbeat e um alerta.
+    """
+    if protocol not in PROTOCOLS:
+        raise ValueError(f"Protocolo sem corpus: {protocol}")
+
+    packets = []
+    login_packet = login(protocol, dev_id, 1)
+    if login_packet:
+        packets.append(("login", login_packet))
+
+    for index in range(count):
+        lat, lon = latitude + index * 0.0005, longitude + index * 0.0005
+        serial = index + 2
+        if protocol == "suntech4g":
+            packets.append(("location", suntech_stt(dev_id, serial, lat, lon, odometer=1000000 + index * 50)))
+        else:
+            packets.append(("location", location(protocol, dev_id, serial, lat, lon, mileage_km=1000 + index)))
+
+    serial = count + 2
+    heartbeat_packet = heartbeat(protocol, dev_id, serial)
+    if heartbeat_packet:
+        packets.append(("heartbeat", heartbeat_packet))
+
+    alarm_packet = alarm(protocol, dev_id, serial + 1, latitude, longitude)
+    if alarm_packet:
+        packets.append(("alert", alarm_packet))
+
+    return packets
+
+
+def seed(redis_client, protocol: str, dev_id: str, output_protocol: str = "suntech4g", latitude: float = -23.55, longitude: float = -46.63):
+    """
+    Estado mínimo no Redis para o dispositivo: protocolo de saída fixo e, no satelital, uma última posição
+    (sem ela o mapper consulta o odômetro em uma API externa).
+    """
+    mapping = {"output_protocol": output_protocol}
+    if protocol == "satellital":
+        mapping["last_merged_location"] = json.dumps({
+            "latitude": latitude, "longitude": longitude, "gps_odometer": 1000000,
+            "gps_fixed": 1, "is_realtime": False, "output_status": 0,
+        })
+
+    redis_client.hset(f"tracker:{dev_id}", mapping=mapping)
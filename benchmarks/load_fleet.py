@@ -0,0 +1,285 @@
+"""
+Gerador de carga: simula uma frota de rastreadores conectados ao gateway, em cada protocolo de
+`settings.INPUT_PROTOCOL_HANDLERS`, com os pacotes do corpus sintético (benchmarks/corpus.py).
+
+Cada dispositivo abre sua conexão (espalhadas ao longo de `--ramp`), faz login quando o protocolo exige
+e envia localizações a cada `--interval` segundos, com heartbeats e alarmes intercalados. Opcionalmente:
+  --burst-every/--burst-size: despejo de memória (localizações antigas, fora de tempo real, em uma única escrita);
+  --reconnect-every: rotatividade, cada conexão dura em média esse tempo e é reaberta com novo login.
+
+Ao final mostra, por protocolo, conexões, pacotes/s sustentados (após a rampa), percentis da latência
+dos ACKs (família GT06; casados pelo serial) e erros (falhas de conexão, conexões derrubadas, ACKs sem resposta).
+Milhares de conexões exigem um limite de descritores compatível (ulimit -n) nas duas pontas.
+
+Uso: python -m benchmarks.load_fleet --host 127.0.0.1 --devices 1000 --interval 10 --duration 120 --protocols nt40 suntech4g
+"""
+import argparse
+import asyncio
+import random
+import struct
+import time
+from datetime import datetime, timedelta
+
+from app.config.settings import settings
+from app.services.latency_service import LatencyHistogram
+from benchmarks import corpus
+
+
+class ProtocolStats:
+    def __init__(self):
+        self.devices = 0
+        self.connected = 0
+        self.connects = 0
+        self.connect_errors = 0
+        self.dropped = 0
+        self.packets = 0
+        self.sustained_packets = 0
+        self.bytes = 0
+        self.acks = 0
+        self.missing_acks = 0
+        self.ack_latency = LatencyHistogram()
+
+
+def gt06_acks(buffer: bytearray):
+    """
+    Seriais dos frames 78 78 completos no buffer (consumidos). Frames 79 79 e bytes soltos são descartados.
+    """
+    serials = []
+    while len(buffer) >= 5:
+        if buffer[0] == 0x78 and buffer[1] == 0x78:
+            size = 2 + 1 + buffer[2] + 2
+            if len(buffer) < size:
+                break
+
+            length = buffer[2]
+            serials.append(struct.unpack(">H", buffer[length - 1:length + 1])[0])
+            del buffer[:size]
+        elif buffer[0] == 0x79 and buffer[1] == 0x79:
+            size = 2 + 2 + struct.unpack(">H", buffer[2:4])[0] + 2
+            if len(buffer) < size:
+                break
+            del buffer[:size]
+        else:
+            del buffer[:1]
+
+    return serials
+
+
+async def read_responses(protocol: str, reader: asyncio.StreamReader, pending: dict, stats: ProtocolStats):
+    buffer = bytearray()
+    while True:
+        try:
+            data = await reader.read(4096)
+        except OSError:
+            return
+        if not data:
+            return
+
+        if protocol not in corpus.GT06_FAMILY:
+            continue
+
+        buffer += data
+        now = time.perf_counter()
+        for serial in gt06_acks(buffer):
+            sent_at = pending.pop(serial, None)
+            if sent_at is not None:
+                stats.acks += 1
+                stats.ack_latency.record(now - sent_at)
+
+
+class Device:
+    def __init__(self, protocol: str, index: int, args, stats: ProtocolStats):
+        self.protocol = protocol
+        self.dev_id = corpus.device_id(protocol, index)
+        self.args = args
+        self.stats = stats
+        self.serial = 0
+        self.reports = 0
+        self.mileage_km = random.randint(1000, 100000)
+        self.latitude = args.latitude + random.uniform(-0.2, 0.2)
+        self.longitude = args.longitude + random.uniform(-0.2, 0.2)
+
+    def _next_serial(self) -> int:
+        self.serial = (self.serial + 1) & 0xFFFF
+        return self.serial
+
+    def _write(self, writer: asyncio.StreamWriter, pending: dict, packets: list, sustained: bool):
+        now = time.perf_counter()
+        for serial, packet, kind in packets:
+            if corpus.acknowledged(self.protocol, kind):
+                pending[serial] = now
+            self.stats.bytes += len(packet)
+
+        self.stats.packets += len(packets)
+        if sustained:
+            self.stats.sustained_packets += len(packets)
+        writer.write(b"".join(packet for _, packet, _ in packets))
+
+    def _report(self) -> list:
+        self.reports += 1
+        serial = self._next_serial()
+
+        if self.args.heartbeat_every and self.reports % self.args.heartbeat_every == 0:
+            packet = corpus.heartbeat(self.protocol, self.dev_id, serial)
+            if packet:
+                return [(serial, packet, "heartbeat")]
+
+        if random.random() < self.args.alarm_probability:
+            packet = corpus.alarm(self.protocol, self.dev_id, serial, self.latitude, self.longitude)
+            if packet:
+                return [(serial, packet, "alarm")]
+
+        self.latitude, self.longitude = corpus.random_walk(self.latitude, self.longitude)
+        self.mileage_km += 1
+        return [(serial, corpus.location(self.protocol, self.dev_id, serial, self.latitude, self.longitude,
+                                         random.randint(0, 110), random.randint(0, 359), mileage_km=self.mileage_km), "location")]
+
+    def _burst(self) -> list:
+        # Posições guardadas enquanto o rastreador estava sem sinal, enviadas de uma vez ao reconectar
+        start = datetime.utcnow() - timedelta(seconds=self.args.burst_size * self.args.interval)
+        packets = []
+        for position in range(self.args.burst_size):
+            serial = self._next_serial()
+            self.latitude, self.longitude = corpus.random_walk(self.latitude, self.longitude)
+            timestamp = start + timedelta(seconds=position * self.args.interval)
+            packets.append((serial, corpus.location(self.protocol, self.dev_id, serial, self.latitude, self.longitude,
+                                                    timestamp=timestamp, mileage_km=self.mileage_km, realtime=False), "location"))
+
+        return packets
+
+    async def run(self, host: str, port: int, measure_from: float, stop_at: float):
+        args = self.args
+        await asyncio.sleep(random.uniform(0, args.ramp))
+
+        while time.monotonic() < stop_at:
+            try:
+                reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), args.connect_timeout)
+            except (OSError, asyncio.TimeoutError):
+                self.stats.connect_errors += 1
+                await asyncio.sleep(random.uniform(1, 3))
+                continue
+
+            self.stats.connects += 1
+            self.stats.connected += 1
+            pending = {}
+            responses = asyncio.create_task(read_responses(self.protocol, reader, pending, self.stats))
+            lifetime = random.expovariate(1 / args.reconnect_every) if args.reconnect_every else float("inf")
+            closes_at = min(time.monotonic() + lifetime, stop_at)
+            next_burst = time.monotonic() + random.uniform(0, args.burst_every) if args.burst_every else float("inf")
+
+            try:
+                serial = self._next_serial()
+                packet = corpus.login(self.protocol, self.dev_id, serial)
+                if packet:
+                    self._write(writer, pending, [(serial, packet, "login")], time.monotonic() >= measure_from)
+                    await writer.drain()
+                    await asyncio.sleep(0.05)
+
+                while time.monotonic() < closes_at:
+                    if responses.done():
+                        raise ConnectionResetError("conexão encerrada pelo gateway")
+
+                    if time.monotonic() >= next_burst:
+                        packets = self._burst()
+                        next_burst += args.burst_every
+                    else:
+                        packets = self._report()
+
+                    self._write(writer, pending, packets, time.monotonic() >= measure_from)
+                    await writer.drain()
+                    await asyncio.sleep(args.interval * random.uniform(0.9, 1.1))
+
+                # Aguardando os ACKs dos últimos pacotes antes de fechar
+                deadline = time.monotonic() + args.ack_timeout
+                while pending and not responses.done() and time.monotonic() < deadline:
+                    await asyncio.sleep(0.05)
+
+            except (OSError, asyncio.TimeoutError):
+                self.stats.dropped += 1
+            finally:
+                self.stats.connected -= 1
+                self.stats.missing_acks += len(pending)
+                responses.cancel()
+                writer.close()
+
+
+async def report_progress(stats: dict, every: float, stop_at: float):
+    last_packets = 0
+    started = time.monotonic()
+    while True:
+        await asyncio.sleep(every)
+        if time.monotonic() >= stop_at:
+            return
+
+        packets = sum(item.packets for item in stats.values())
+        connected = sum(item.connected for item in stats.values())
+        print(f"[{time.monotonic() - started:6.0f}s] conectados={connected} pacotes/s={(packets - last_packets) / every:.1f} "
+              f"acks={sum(item.acks for item in stats.values())} erros={sum(item.connect_errors + item.dropped for item in stats.values())}")
+        last_packets = packets
+
+
+async def run(args) -> dict:
+    stats = {protocol: ProtocolStats() for protocol in args.protocols}
+    started = time.monotonic()
+    measure_from = started + args.ramp
+    stop_at = started + args.duration
+
+    tasks = [asyncio.create_task(report_progress(stats, args.report_every, stop_at))]
+    for protocol in args.protocols:
+        port = settings.INPUT_PROTOCOL_HANDLERS[protocol]["port"]
+        for index in range(args.devices):
+            stats[protocol].devices += 1
+            device = Device(protocol, args.first_index + index, args, stats[protocol])
+            tasks.append(asyncio.create_task(device.run(args.host, port, measure_from, stop_at)))
+
+    await asyncio.gather(*tasks)
+    return stats
+
+
+def print_summary(stats: dict, sustained_seconds: float):
+    print(f"{'protocolo':<11} {'disp':>6} {'conexões':>9} {'pacotes':>9} {'pps':>8} {'acks':>8} "
+          f"{'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'máx ms':>8} {'falhas':>7} {'quedas':>7} {'sem ack':>8}")
+
+    for protocol, item in stats.items():
+        latency = item.ack_latency.summary()
+        has_acks = protocol in corpus.GT06_FAMILY
+        percentiles = [f"{latency[key]:>8.2f}" if has_acks else f"{'-':>8}" for key in ("p50_ms", "p90_ms", "p99_ms", "max_ms")]
+        print(f"{protocol:<11} {item.devices:>6} {item.connects:>9} {item.packets:>9} {item.sustained_packets / sustained_seconds:>8.1f} "
+              f"{item.acks if has_acks else '-':>8} {' '.join(percentiles)} {item.connect_errors:>7} {item.dropped:>7} "
+              f"{item.missing_acks if has_acks else '-':>8}")
+
+    total = sum(item.sustained_packets for item in stats.values())
+    print(f"Total sustentado: {total / sustained_seconds:.1f} pacotes/s em {sustained_seconds:.0f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--protocols", nargs="+", default=[protocol for protocol in corpus.PROTOCOLS if protocol in settings.INPUT_PROTOCOL_HANDLERS],
+                        choices=[protocol for protocol in corpus.PROTOCOLS if protocol in settings.INPUT_PROTOCOL_HANDLERS])
+    parser.add_argument("--devices", type=int, default=100, help="dispositivos por protocolo")
+    parser.add_argument("--first-index", type=int, default=0, help="índice do primeiro dispositivo (para dividir a frota entre geradores)")
+    parser.add_argument("--interval", type=float, default=10.0, help="segundos entre relatórios de cada dispositivo")
+    parser.add_argument("--heartbeat-every", type=int, default=6, help="um heartbeat a cada N relatórios (0 desliga)")
+    parser.add_argument("--alarm-probability", type=float, default=0.01, help="probabilidade de um relatório ser um alarme")
+    parser.add_argument("--burst-every", type=float, default=0.0, help="segundos entre despejos de memória de cada dispositivo (0 desliga)")
+    parser.add_argument("--burst-size", type=int, default=50, help="localizações por despejo de memória")
+    parser.add_argument("--reconnect-every", type=float, default=0.0, help="duração média de cada conexão em segundos (0 desliga)")
+    parser.add_argument("--ramp", type=float, default=10.0, help="segundos para abrir todas as conexões")
+    parser.add_argument("--duration", type=float, default=60.0)
+    parser.add_argument("--connect-timeout", type=float, default=5.0)
+    parser.add_argument("--ack-timeout", type=float, default=5.0, help="espera pelos ACKs pendentes ao fechar uma conexão")
+    parser.add_argument("--report-every", type=float, default=5.0)
+    parser.add_argument("--latitude", type=float, default=-23.55)
+    parser.add_argument("--longitude", type=float, default=-46.63)
+    args = parser.parse_args()
+
+    if args.ramp >= args.duration:
+        parser.error("--ramp deve ser menor que --duration")
+
+    stats = asyncio.run(run(args))
+    print_summary(stats, args.duration - args.ramp)
+
+
+if __name__ == "__main__":
+    main()
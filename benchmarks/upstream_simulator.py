@@ -0,0 +1,568 @@
+"""
+Simulador local do servidor principal (OUTPUT_PROTOCOL_HOST_ADRESSES) para as saídas GT06 e Suntech4G.
+
+Escuta uma porta por protocolo de saída e, como o servidor real:
+  GT06: responde ao login (0x01) e recebe localizações, heartbeats, alarmes, respostas de comando (0x15) e informações (0x94);
+  Suntech4G: recebe MNT, STT, ALT, ALV e RES (sem respostas).
+Cada pacote é registrado no dispositivo que fez login na conexão (IMEI do login GT06 ou ID do MNT/pacote Suntech).
+
+Comandos (--command, repetível, em rodízio a cada --command-every segundos) são enviados às conexões identificadas
+no formato GT06 (0x80, ex: "RELAY,1#", "MILEAGE,ON,1234#"); nas conexões Suntech4G o equivalente CMD é montado
+(ver `suntech_command`). O tempo de ida e volta vai do envio até a resposta do dispositivo (0x15 ou RES): exige
+rastreadores que respondam ao comando; os não respondidos em --command-timeout são contados à parte.
+
+Falhas injetadas por pacote recebido: --latency (atraso de processamento, inclusive da resposta ao login),
+--reset-probability (fecha a conexão com RST) e --stall-probability/--stall-seconds (para de ler o socket).
+
+Ao final mostra pacotes/s por protocolo e tipo, conexões e reconexões (com o tempo até o gateway reconectar),
+percentis do tempo de resposta dos comandos e os dispositivos mais ativos; --dump grava o registro completo em JSON.
+
+Uso: python -m benchmarks.upstream_simulator --gt06-port 7001 --suntech-port 7002 --command "RELAY,1#" --command-every 30
+     GT06_MAIN_SERVER_HOST=127.0.0.1 GT06_MAIN_SERVER_PORT=7001 SUNTECH_MAIN_SERVER_HOST=127.0.0.1 SUNTECH_MAIN_SERVER_PORT=7002 python main.py
+"""
+import argparse
+import itertools
+import json
+import random
+import re
+import socket
+import struct
+import threading
+import time
+from collections import deque
+
+from app.services.latency_service import LatencyHistogram
+from benchmarks import corpus
+
+OUTPUT_PROTOCOLS = ("gt06", "suntech4g")
+
+GT06_PACKET_TYPES = {
+    0x01: "login",
+    0x12: "location",
+    0x22: "location",
+    0x32: "location",
+    0xA0: "location",
+    0x13: "heartbeat",
+    0x16: "alert",
+    0x26: "alert",
+    0x15: "command_reply",
+    0x94: "information",
+}
+
+SUNTECH_PACKET_TYPES = {
+    "MNT": "login",
+    "STT": "location",
+    "ALT": "alert",
+    "ALV": "heartbeat",
+    "RES": "command_reply",
+}
+
+# O MNT é enviado sem o "\r" final: os pacotes Suntech são separados pelo "\r" ou pelo cabeçalho seguinte
+_SUNTECH_HEADER = re.compile(rb"(?:MNT|STT|ALT|ALV|RES|CMD);")
+
+# Comandos GT06 -> (grupo, ação) Suntech, como em app/src/output/suntech4g/mapper.py
+_SUNTECH_COMMANDS = {
+    "RELAY,1#": ("04", "01"),
+    "DYD,000000#": ("04", "01"),
+    "RELAY,0#": ("04", "02"),
+    "HFYD,000000#": ("04", "02"),
+    "GPRS,GET,LOCATION#": ("03", "01"),
+}
+_MILEAGE = re.compile(r"MILEAGE,ON,(\d+(?:\.\d+)?)#")
+
+
+def gt06_command(command: str, serial: int) -> bytes:
+    """
+    Comando online GT06 (0x80): tamanho do comando, flag do servidor (4), comando ASCII e idioma (2).
+    """
+    text = command.encode("ascii")
+    content = bytes([4 + len(text)]) + b"\x00\x00\x00\x01" + text + b"\x00\x02"
+    return corpus.gt06_frame(0x80, content, serial)
+
+
+def suntech_command(command: str, dev_id: str) -> bytes:
+    """
+    Comando Suntech equivalente ao comando GT06 (hodômetro em metros). Comandos "CMD;..." seguem como estão.
+    Sem "\\r": o mapeador de comandos Suntech do gateway compara o último campo sem removê-lo.
+    """
+    if command.startswith("CMD;"):
+        return command.encode("ascii")
+
+    if command in _SUNTECH_COMMANDS:
+        group, action = _SUNTECH_COMMANDS[command]
+        return f"CMD;{dev_id};{group};{action}".encode("ascii")
+
+    mileage = _MILEAGE.fullmatch(command)
+    if mileage:
+        meters = int(float(mileage.group(1)) * 1000)
+        return f"CMD;{dev_id};05;03;{meters}".encode("ascii")
+
+    raise ValueError(f"Comando sem equivalente Suntech: {command}")
+
+
+def gt06_frames(buffer: bytearray) -> list:
+    """
+    Frames 78 78 e 79 79 completos no buffer (consumidos). Bytes soltos são descartados.
+    """
+    frames = []
+    while len(buffer) >= 5:
+        if buffer[0] == 0x78 and buffer[1] == 0x78:
+            size = 2 + 1 + buffer[2] + 2
+        elif buffer[0] == 0x79 and buffer[1] == 0x79:
+            size = 2 + 2 + struct.unpack(">H", buffer[2:4])[0] + 2
+        else:
+            del buffer[:1]
+            continue
+
+        if len(buffer) < size:
+            break
+
+        frames.append(bytes(buffer[:size]))
+        del buffer[:size]
+
+    return frames
+
+
+def suntech_packets(buffer: bytearray) -> list:
+    """
+    Pacotes Suntech completos no buffer (consumidos), sem o "\\r".
+    """
+    packets = []
+    while buffer:
+        end = buffer.find(b"\r")
+        following = _SUNTECH_HEADER.search(buffer, 1)
+        if following and (end < 0 or following.start() < end):
+            end = following.start()
+            skip = 0
+        elif end >= 0:
+            skip = 1
+        elif buffer.startswith(b"MNT;"):
+            # Último pacote do buffer sem terminador: só o MNT é enviado assim
+            end = len(buffer)
+            skip = 0
+        else:
+            break
+
+        packet = bytes(buffer[:end])
+        del buffer[:end + skip]
+        if packet:
+            packets.append(packet)
+
+    return packets
+
+
+class DeviceRecord:
+    """
+    Pacotes recebidos de um dispositivo (ID de saída, como o servidor principal o conhece).
+    """
+    def __init__(self, dev_id: str, output_protocol: str, keep: int):
+        self.dev_id = dev_id
+        self.output_protocol = output_protocol
+        self.connections = 0
+        self.packets = {}
+        self.bytes = 0
+        self.first_seen = None
+        self.last_seen = None
+        self.disconnected_at = None
+        self.recent = deque(maxlen=keep)
+
+    def record(self, packet_type: str, packet: bytes, now: float):
+        self.packets[packet_type] = self.packets.get(packet_type, 0) + 1
+        self.bytes += len(packet)
+        if self.first_seen is None:
+            self.first_seen = now
+        self.last_seen = now
+        self.recent.append((now, packet_type, packet))
+
+    def to_dict(self) -> dict:
+        return {
+            "output_protocol": self.output_protocol,
+            "connections": self.connections,
+            "packets": self.packets,
+            "bytes": self.bytes,
+            "first_seen": self.first_seen,
+            "last_seen": self.last_seen,
+            "recent": [
+                {"time": at, "type": packet_type, "packet": packet.hex() if self.output_protocol == "gt06" else packet.decode("ascii", errors="replace")}
+                for at, packet_type, packet in self.recent
+            ],
+        }
+
+
+class UpstreamConnection:
+    def __init__(self, sock: socket.socket, output_protocol: str):
+        self.sock = sock
+        self.output_protocol = output_protocol
+        self.device = None
+        self.serial = 0
+        self.pending = deque()
+        self.send_lock = threading.Lock()
+
+    def send(self, data: bytes):
+        with self.send_lock:
+            self.sock.sendall(data)
+
+
+class ProtocolStats:
+    def __init__(self):
+        self.connections = 0
+        self.reconnections = 0
+        self.packets = {}
+        self.bytes = 0
+        self.resets = 0
+        self.stalls = 0
+        self.commands = 0
+        self.replies = 0
+        self.unanswered = 0
+        self.command_rtt = LatencyHistogram()
+        self.reconnect_delay = LatencyHistogram()
+
+    @property
+    def total_packets(self) -> int:
+        return sum(self.packets.values())
+
+
+class UpstreamSimulator:
+    """
+    Servidor principal local, uma thread por conexão. Contadores sem lock, como em metrics_service.
+    """
+    def __init__(self, host: str = "127.0.0.1", gt06_port: int = 0, suntech_port: int = 0, latency: float = 0.0,
+                 reset_probability: float = 0.0, stall_probability: float = 0.0, stall_seconds: float = 5.0,
+                 keep: int = 20, command_timeout: float = 30.0, seed: int | None = None):
+        self.host = host
+        self.ports = {"gt06": gt06_port, "suntech4g": suntech_port}
+        self.latency = latency
+        self.reset_probability = reset_probability
+        self.stall_probability = stall_probability
+        self.stall_seconds = stall_seconds
+        self.keep = keep
+        self.command_timeout = command_timeout
+        self.random = random.Random(seed)
+
+        self.stats = {protocol: ProtocolStats() for protocol in OUTPUT_PROTOCOLS}
+        self.devices = {}
+        self.started = None
+        self._connections = set()
+        self._lock = threading.Lock()
+        self._servers = []
+        self._running = False
+
+    # ====================================== Ciclo de vida =============================================
+
+    def start(self) -> "UpstreamSimulator":
+        self._running = True
+        self.started = time.monotonic()
+        for protocol in OUTPUT_PROTOCOLS:
+            server = socket.socket()
+            server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            server.bind((self.host, self.ports[protocol]))
+            server.listen(1024)
+            self.ports[protocol] = server.getsockname()[1]
+            self._servers.append(server)
+            threading.Thread(target=self._accept, args=(server, protocol), daemon=True).start()
+
+        return self
+
+    def stop(self):
+        self._running = False
+        for server in self._servers:
+            server.close()
+
+        with self._lock:
+            connections = list(self._connections)
+        for connection in connections:
+            connection.sock.close()
+
+    def addresses(self) -> dict:
+        return {protocol: (self.host, self.ports[protocol]) for protocol in OUTPUT_PROTOCOLS}
+
+    def install(self):
+        """
+        Aponta as sessões de saída do gateway (no mesmo processo) para o simulador.
+        """
+        # Importado aqui: os builders de saída conectam ao Redis na importação
+        from app.config.output_protocol_settings import output_protocol_settings
+
+        output_protocol_settings.OUTPUT_PROTOCOL_HOST_ADRESSES.update(self.addresses())
+
+    # ====================================== Conexões ==================================================
+
+    def _accept(self, server: socket.socket, protocol: str):
+        while self._running:
+            try:
+                sock, _ = server.accept()
+            except OSError:
+                return
+
+            self.stats[protocol].connections += 1
+            connection = UpstreamConnection(sock, protocol)
+            with self._lock:
+                self._connections.add(connection)
+            threading.Thread(target=self._serve, args=(connection,), daemon=True).start()
+
+    def _serve(self, connection: UpstreamConnection):
+        parse = gt06_frames if connection.output_protocol == "gt06" else suntech_packets
+        buffer = bytearray()
+        try:
+            while self._running:
+                data = connection.sock.recv(4096)
+                if not data:
+                    return
+
+                buffer += data
+                for packet in parse(buffer):
+                    if self.latency:
+                        time.sleep(self.latency)
+
+                    self._handle(connection, packet)
+                    if not self._inject_faults(connection):
+                        return
+        except OSError:
+            pass
+        finally:
+            self._close(connection)
+
+    def _close(self, connection: UpstreamConnection):
+        with self._lock:
+            if connection not in self._connections:
+                return
+            self._connections.discard(connection)
+
+        stats = self.stats[connection.output_protocol]
+        stats.unanswered += len(connection.pending)
+        connection.pending.clear()
+        if connection.device:
+            connection.device.disconnected_at = time.monotonic()
+
+        try:
+            connection.sock.close()
+        except OSError:
+            pass
+
+    def _inject_faults(self, connection: UpstreamConnection) -> bool:
+        """
+        Retorna False quando a conexão foi derrubada.
+        """
+        stats = self.stats[connection.output_protocol]
+        if self.reset_probability and self.random.random() < self.reset_probability:
+            stats.resets += 1
+            # SO_LINGER com tempo zero: o close envia RST em vez de FIN
+            connection.sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+            self._close(connection)
+            return False
+
+        if self.stall_probability and self.random.random() < self.stall_probability:
+            stats.stalls += 1
+            time.sleep(self.stall_seconds)
+
+        return True
+
+    # ====================================== Pacotes ===================================================
+
+    def _identify(self, connection: UpstreamConnection, dev_id: str):
+        if connection.device is not None:
+            return
+
+        with self._lock:
+            device = self.devices.get(dev_id)
+            if device is None:
+                device = self.devices[dev_id] = DeviceRecord(dev_id, connection.output_protocol, self.keep)
+
+        stats = self.stats[connection.output_protocol]
+        device.connections += 1
+        if device.connections > 1:
+            stats.reconnections += 1
+            if device.disconnected_at is not None:
+                stats.reconnect_delay.record(time.monotonic() - device.disconnected_at)
+
+        connection.device = device
+
+    def _handle(self, connection: UpstreamConnection, packet: bytes):
+        if connection.output_protocol == "gt06":
+            protocol_number = packet[3] if packet[0] == 0x78 else packet[4]
+            packet_type = GT06_PACKET_TYPES.get(protocol_number, f"0x{protocol_number:02X}")
+            if packet_type == "login":
+                imei = packet[4:12].hex()
+                self._identify(connection, imei[1:] if imei.startswith("0") else imei)
+                serial = struct.unpack(">H", packet[12:14])[0]
+                connection.send(corpus.gt06_frame(0x01, b"", serial))
+        else:
+            fields = packet.decode("ascii", errors="replace").split(";")
+            packet_type = SUNTECH_PACKET_TYPES.get(fields[0], fields[0])
+            if len(fields) > 1 and fields[1]:
+                self._identify(connection, fields[1])
+
+        stats = self.stats[connection.output_protocol]
+        stats.packets[packet_type] = stats.packets.get(packet_type, 0) + 1
+        stats.bytes += len(packet)
+
+        if connection.device is not None:
+            connection.device.record(packet_type, packet, time.time())
+
+        if packet_type == "command_reply" and connection.pending:
+            sent_at, _ = connection.pending.popleft()
+            stats.replies += 1
+            stats.command_rtt.record(time.monotonic() - sent_at)
+
+    # ====================================== Comandos ==================================================
+
+    def push_command(self, command: str, dev_ids: list | None = None) -> int:
+        """
+        Envia o comando às conexões identificadas (todas ou as dos `dev_ids`). Retorna quantos foram enviados.
+        """
+        with self._lock:
+            connections = [connection for connection in self._connections
+                           if connection.device is not None and (dev_ids is None or connection.device.dev_id in dev_ids)]
+
+        sent = 0
+        for connection in connections:
+            if connection.output_protocol == "gt06":
+                connection.serial = (connection.serial + 1) & 0xFFFF
+                packet = gt06_command(command, connection.serial)
+            else:
+                packet = suntech_command(command, connection.device.dev_id)
+
+            try:
+                connection.pending.append((time.monotonic(), command))
+                connection.send(packet)
+            except OSError:
+                continue
+
+            self.stats[connection.output_protocol].commands += 1
+            sent += 1
+
+        return sent
+
+    def expire_commands(self):
+        """
+        Conta como não respondidos os comandos aguardando há mais de `command_timeout`.
+        """
+        limit = time.monotonic() - self.command_timeout
+        with self._lock:
+            connections = list(self._connections)
+
+        for connection in connections:
+            while connection.pending and connection.pending[0][0] < limit:
+                connection.pending.popleft()
+                self.stats[connection.output_protocol].unanswered += 1
+
+    # ====================================== Leitura ===================================================
+
+    def connected(self) -> dict:
+        counts = dict.fromkeys(OUTPUT_PROTOCOLS, 0)
+        with self._lock:
+            for connection in self._connections:
+                counts[connection.output_protocol] += 1
+
+        return counts
+
+    def dump(self) -> dict:
+        with self._lock:
+            devices = dict(self.devices)
+
+        return {dev_id: device.to_dict() for dev_id, device in sorted(devices.items())}
+
+
+def print_summary(simulator: UpstreamSimulator, seconds: float, show_devices: int):
+    print(f"{'protocolo':<10} {'conexões':>9} {'reconex':>8} {'pacotes':>9} {'pps':>8} {'resets':>7} {'stalls':>7} "
+          f"{'comandos':>9} {'respostas':>10} {'sem resp':>9} {'rtt p50':>8} {'rtt p99':>8} {'reconex p50':>12}")
+
+    for protocol, stats in simulator.stats.items():
+        rtt = stats.command_rtt.summary()
+        reconnect = stats.reconnect_delay.summary()
+        print(f"{protocol:<10} {stats.connections:>9} {stats.reconnections:>8} {stats.total_packets:>9} {stats.total_packets / seconds:>8.1f} "
+              f"{stats.resets:>7} {stats.stalls:>7} {stats.commands:>9} {stats.replies:>10} {stats.unanswered:>9} "
+              f"{rtt['p50_ms']:>8.1f} {rtt['p99_ms']:>8.1f} {reconnect['p50_ms']:>12.1f}")
+
+        for packet_type, count in sorted(stats.packets.items()):
+            print(f"  {packet_type:<16} {count:>9} {count / seconds:>8.1f}/s")
+
+    if show_devices:
+        with simulator._lock:
+            devices = sorted(simulator.devices.values(), key=lambda device: sum(device.packets.values()), reverse=True)
+
+        print(f"{len(devices)} dispositivo(s); mais ativos:")
+        for device in devices[:show_devices]:
+            packets = " ".join(f"{packet_type}={count}" for packet_type, count in sorted(device.packets.items()))
+            print(f"  {device.dev_id:<20} {device.output_protocol:<10} conexões={device.connections} {packets}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--gt06-port", type=int, default=7001)
+    parser.add_argument("--suntech-port", type=int, default=7002)
+    parser.add_argument("--latency", type=float, default=0.0, help="segundos de processamento por pacote recebido")
+    parser.add_argument("--reset-probability", type=float, default=0.0, help="probabilidade de derrubar a conexão (RST) a cada pacote")
+    parser.add_argument("--stall-probability", type=float, default=0.0, help="probabilidade de parar de ler a conexão a cada pacote")
+    parser.add_argument("--stall-seconds", type=float, default=5.0)
+    parser.add_argument("--command", action="append", default=[], help='comando GT06 enviado aos dispositivos, ex: "RELAY,1#" (repetível, em rodízio)')
+    parser.add_argument("--command-every", type=float, default=30.0, help="segundos entre envios de comando")
+    parser.add_argument("--command-devices", type=int, default=0, help="dispositivos sorteados por envio (0: todos os conectados)")
+    parser.add_argument("--command-timeout", type=float, default=30.0, help="espera pela resposta de um comando")
+    parser.add_argument("--duration", type=float, default=0.0, help="segundos de execução (0: até Ctrl+C)")
+    parser.add_argument("--report-every", type=float, default=5.0)
+    parser.add_argument("--keep", type=int, default=20, help="últimos pacotes guardados por dispositivo")
+    parser.add_argument("--show-devices", type=int, default=10, help="dispositivos mostrados no resumo")
+    parser.add_argument("--dump", help="arquivo JSON com o registro por dispositivo")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    for command in args.command:
+        if not command.startswith("CMD;"):
+            try:
+                suntech_command(command, "0")
+            except ValueError as e:
+                parser.error(str(e))
+
+    simulator = UpstreamSimulator(args.host, args.gt06_port, args.suntech_port, args.latency, args.reset_probability,
+                                  args.stall_probability, args.stall_seconds, args.keep, args.command_timeout, args.seed).start()
+    addresses = simulator.addresses()
+    print(f"GT06 em {addresses['gt06'][0]}:{addresses['gt06'][1]}, Suntech4G em {addresses['suntech4g'][0]}:{addresses['suntech4g'][1]}")
+
+    commands = itertools.cycle(args.command) if args.command else None
+    stop_at = simulator.started + args.duration if args.duration else None
+    next_report = simulator.started + args.report_every
+    next_command = simulator.started + args.command_every
+    last_packets = 0
+    try:
+        while stop_at is None or time.monotonic() < stop_at:
+            time.sleep(0.1)
+            now = time.monotonic()
+            simulator.expire_commands()
+
+            if commands and now >= next_command:
+                next_command = now + args.command_every
+                dev_ids = None
+                if args.command_devices:
+                    with simulator._lock:
+                        connected = [connection.device.dev_id for connection in simulator._connections if connection.device is not None]
+                    dev_ids = simulator.random.sample(connected, min(args.command_devices, len(connected)))
+
+                command = next(commands)
+                print(f"Comando {command} enviado a {simulator.push_command(command, dev_ids)} conexão(ões)")
+
+            if now >= next_report:
+                next_report = now + args.report_every
+                packets = sum(stats.total_packets for stats in simulator.stats.values())
+                connected = simulator.connected()
+                print(f"[{now - simulator.started:6.0f}s] conectados gt06={connected['gt06']} suntech4g={connected['suntech4g']} "
+                      f"pacotes/s={(packets - last_packets) / args.report_every:.1f} "
+                      f"resets={sum(stats.resets for stats in simulator.stats.values())} "
+                      f"respostas={sum(stats.replies for stats in simulator.stats.values())}")
+                last_packets = packets
+    except KeyboardInterrupt:
+        pass
+
+    seconds = max(time.monotonic() - simulator.started, 1e-9)
+    simulator.stop()
+    print_summary(simulator, seconds, args.show_devices)
+
+    if args.dump:
+        with open(args.dump, "w") as file:
+            json.dump(simulator.dump(), file, indent=4)
+        print(f"Registro por dispositivo gravado em {args.dump}")
+
+
+if __name__ == "__main__":
+    main()
@@ -66,9 +66,9 @@ def main():
     workers_thread.start()
     logger.info("✅ Workers Iniciados!", log_label="SERVIDOR")
 
-    # Inicializar worker de histórico
-    # Trabalha em um PROCESSO dedicado
-    history_service_process = history_service.start_history_service()
+    # Inicializar workers de histórico
+    # Trabalham em PROCESSOS dedicados (HISTORY_WORKER_PROCESSES)
+    history_service_processes = history_service.start_history_service()
 
     for protocol_name, config in settings.INPUT_PROTOCOL_HANDLERS.items():
         try:
@@ -0,0 +1,6 @@
+import os
+import tempfile
+
+# Os testes rodam com o armazenamento em memória e um CACHE_DIR próprio, sem Redis nem os arquivos da aplicação
+os.environ["STORAGE_BACKEND"] = "memory"
+os.environ["CACHE_DIR"] = tempfile.mkdtemp(prefix="gateway-tests-")
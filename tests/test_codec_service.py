@@ -0,0 +1,45 @@
+import time
+import zlib
+
+import pytest
+
+from app.services.codec_service import ZDICT_MAGIC, ZdictCodec, codec_registry
+
+PAYLOAD = b"ST300STT;864943040000001;04;1097B;20261019;12:00:01;33e530;-23.550520;-046.633308;000.000;000.00" * 4
+
+
+@pytest.fixture
+def dictionary(monkeypatch):
+    codec = ZdictCodec(9001, PAYLOAD[:96])
+    monkeypatch.setitem(codec_registry._zdict_codecs, codec.version, codec)
+    return codec
+
+
+def test_zdict_round_trip(dictionary):
+    blob = dictionary.encode(PAYLOAD)
+
+    assert blob.startswith(ZDICT_MAGIC)
+    assert dictionary.decode(blob) == PAYLOAD
+    assert len(blob) < len(zlib.compress(PAYLOAD))
+
+
+def test_registry_reads_blobs_of_every_format(dictionary):
+    assert codec_registry.decode(zlib.compress(PAYLOAD)) == PAYLOAD
+    assert codec_registry.decode(dictionary.encode(PAYLOAD)) == PAYLOAD
+
+
+def test_registry_encodes_with_the_current_dictionary(dictionary, monkeypatch):
+    monkeypatch.setattr(codec_registry, "_current_version", dictionary.version)
+    monkeypatch.setattr(codec_registry, "_current_checked_at", time.monotonic())
+
+    blob = codec_registry.encode(PAYLOAD)
+
+    assert blob.startswith(ZDICT_MAGIC)
+    assert codec_registry.decode(blob) == PAYLOAD
+
+
+def test_unknown_dictionary_version_is_an_error():
+    blob = ZdictCodec(9002, b"dicionario").encode(PAYLOAD)
+
+    with pytest.raises(ValueError):
+        codec_registry.decode(blob)
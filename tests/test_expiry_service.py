@@ -0,0 +1,82 @@
+import threading
+import time
+
+from app.services.expiry_service import expiry_service
+
+
+def _wait(event: threading.Event, timeout: float = 2.0) -> bool:
+    return event.wait(timeout)
+
+
+def test_keys_expire_in_deadline_order():
+    fired = []
+    done = threading.Event()
+
+    def callback(name):
+        def fire():
+            fired.append(name)
+            if len(fired) == 3:
+                done.set()
+        return fire
+
+    expiry_service.schedule("order-c", 0.15, callback("c"))
+    expiry_service.schedule("order-a", 0.05, callback("a"))
+    expiry_service.schedule("order-b", 0.10, callback("b"))
+
+    assert _wait(done)
+    assert fired == ["a", "b", "c"]
+    assert "order-a" not in expiry_service
+
+
+def test_cancelled_key_does_not_fire():
+    fired = threading.Event()
+    expiry_service.schedule("cancelled", 0.05, fired.set)
+
+    assert expiry_service.cancel("cancelled")
+    assert not fired.wait(0.2)
+    assert not expiry_service.cancel("cancelled")
+
+
+def test_touch_postpones_expiry():
+    fired = threading.Event()
+    start = time.monotonic()
+    expiry_service.schedule("touched", 0.1, fired.set)
+
+    time.sleep(0.05)
+    assert expiry_service.touch("touched", 0.3)
+
+    assert not fired.wait(0.2)
+    assert _wait(fired)
+    assert time.monotonic() - start >= 0.35
+
+
+def test_touch_unknown_key():
+    assert not expiry_service.touch("never-scheduled", 1)
+
+
+def test_reschedule_with_shorter_delay_fires_once():
+    fired = []
+    done = threading.Event()
+
+    def fire():
+        fired.append(time.monotonic())
+        done.set()
+
+    expiry_service.schedule("rescheduled", 5, fire)
+    expiry_service.schedule("rescheduled", 0.05, fire)
+
+    assert _wait(done)
+    time.sleep(0.1)
+    assert len(fired) == 1
+
+
+def test_failing_callback_does_not_stop_the_service():
+    fired = threading.Event()
+
+    def fail():
+        raise RuntimeError("falha no callback")
+
+    expiry_service.schedule("failing", 0.01, fail)
+    expiry_service.schedule("after-failing", 0.05, fired.set)
+
+    assert _wait(fired)
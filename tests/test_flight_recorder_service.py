@@ -0,0 +1,57 @@
+from collections import OrderedDict
+
+import pytest
+
+from app.config.settings import settings
+from app.services.flight_recorder_service import INBOUND, OUTBOUND, flight_recorder, read_pcap
+
+
+@pytest.fixture
+def recorder(monkeypatch):
+    monkeypatch.setattr(flight_recorder, "_recorders", OrderedDict())
+    monkeypatch.setattr(settings, "FLIGHT_RECORDER_ENABLED", True)
+    monkeypatch.setattr(settings, "FLIGHT_RECORDER_EVENTS", 3)
+    monkeypatch.setattr(settings, "FLIGHT_RECORDER_MAX_DEVICES", 3)
+    return flight_recorder
+
+
+def test_keeps_only_the_last_events_of_each_device(recorder):
+    for index in range(5):
+        recorder.record("ring", INBOUND, bytes([index]))
+
+    assert [data for _, _, data, _ in recorder.events("ring")] == [b"\x02", b"\x03", b"\x04"]
+
+
+def test_evicts_the_least_recently_recorded_device(recorder):
+    for dev_id in ("a", "b", "c"):
+        recorder.record(dev_id, INBOUND, b"x")
+
+    # "a" volta a gravar: o menos recente passa a ser "b"
+    recorder.record("a", INBOUND, b"y")
+    recorder.record("d", INBOUND, b"z")
+
+    assert list(recorder._recorders) == ["c", "a", "d"]
+    assert recorder.events("b") == []
+
+
+def test_disabled_recorder_keeps_nothing(recorder, monkeypatch):
+    monkeypatch.setattr(settings, "FLIGHT_RECORDER_ENABLED", False)
+    recorder.record("disabled", INBOUND, b"x")
+
+    assert recorder.events("disabled") == []
+
+
+def test_pcap_export_round_trip(recorder):
+    recorder.record("pcap", INBOUND, b"\x78\x78\x01", {"process": 0.0015})
+    recorder.record("pcap", OUTBOUND, b"STT;1", {"build": 0.0002, "send": 0.001, "unknown": 1.0})
+
+    events = read_pcap(recorder.export_pcap("pcap"))
+
+    assert [(kind, data) for _, kind, data, _ in events] == [(INBOUND, b"\x78\x78\x01"), (OUTBOUND, b"STT;1")]
+    assert events[0][3] == {"process": pytest.approx(0.0015)}
+    assert events[1][3] == {"build": pytest.approx(0.0002), "send": pytest.approx(0.001)}
+
+
+def test_read_pcap_rejects_other_files():
+    with pytest.raises(ValueError):
+        read_pcap(b"\x00" * 24)
@@ -0,0 +1,179 @@
+import json
+import threading
+import zlib
+
+import pytest
+
+from app.config.settings import settings
+from app.services.codec_service import train_dictionary
+from app.services.cold_storage_service import cold_segment_store
+from app.services.history_service import (
+    HistoryEnqueuer, _append_segment, _build_segment_id, _decode_queue_item, _decode_segment, _encode_queue_item,
+    _encode_segment, _history_keys, _packet_samples, _parse_segment_id, _segment_may_contain, get_packet_history,
+    parse_history_cursor, query_packet_history,
+)
+from app.services.redis_service import get_redis
+
+
+def _location(timestamp: float, serial: int) -> dict:
+    raw = f"ST300STT;864943040000001;04;1097B;20261019;12:00:{serial:02d};33e530;-23.550520;-046.633308;000.000;000.00"
+    return {"raw_packet": raw, "translated_packet": None, "timestamp": timestamp, "packet_type": "location"}
+
+
+def test_packet_samples_group_by_packet_shape():
+    first, second = _packet_samples([_location(1760000000.123456, 1), _location(1760000060.654321, 2)])
+
+    assert first != second
+    assert first[:48] == second[:48]
+
+
+def test_dictionary_represents_every_packet_shape():
+    locations = _packet_samples([_location(1760000000.0 + index, index) for index in range(3)])
+    alert, = _packet_samples([{"raw_packet": "ST300ALT;864943040000001;04;33", "timestamp": 1760000100.0, "packet_type": "alert"}])
+
+    zdict = train_dictionary(locations + [alert], size=len(locations[0]) + len(alert))
+
+    assert zdict == alert + locations[0]
+
+
+def _store(dev_id: str, timestamps: list) -> None:
+    """
+    Grava um segmento com um pacote por timestamp, em ordem de chegada; raw_packet identifica cada pacote.
+    """
+    packets = [{"raw_packet": f"P{index}", "timestamp": timestamp, "packet_type": "location"} for index, timestamp in enumerate(timestamps)]
+    _append_segment(get_redis(decode_responses=False), dev_id, packets)
+
+
+def _pages(dev_id: str, limit: int, **filters) -> list:
+    pages, cursor = [], None
+    while True:
+        page = query_packet_history(dev_id, limit=limit, cursor=cursor, **filters)
+        pages.append([packet["raw_packet"] for packet in page["data"]])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+def test_cursor_does_not_skip_packets_with_the_page_boundary_timestamp():
+    _store("cursor-ties", [3.0, 4.0, 4.0, 4.0, 5.0])
+
+    assert _pages("cursor-ties", limit=2) == [["P4", "P3"], ["P2", "P1"], ["P0"]]
+
+
+def test_cursor_with_every_packet_at_the_same_timestamp():
+    _store("cursor-same", [7.0] * 5)
+
+    pages = _pages("cursor-same", limit=2)
+
+    assert [raw for page in pages for raw in page] == ["P4", "P3", "P2", "P1", "P0"]
+
+
+def test_cursor_without_tie_breaker_stays_exclusive():
+    _store("cursor-legacy", [1.0, 2.0, 3.0])
+
+    page = query_packet_history("cursor-legacy", limit=10, cursor="3.0")
+
+    assert [packet["raw_packet"] for packet in page["data"]] == ["P1", "P0"]
+    assert page["next_cursor"] is None
+
+
+def test_page_is_clamped_to_limit():
+    _store("cursor-limit", [float(timestamp) for timestamp in range(30)])
+
+    page = query_packet_history("cursor-limit", limit=7)
+
+    assert len(page["data"]) == 7
+    assert page["next_cursor"] == "23.0:1"
+
+
+def test_window_bounds_are_not_pruned_by_segment_id_rounding():
+    # 6 casas decimais no ID do segmento: o mínimo é arredondado para cima e o máximo para baixo
+    _store("cursor-rounding", [1760000000.1234567, 1760000000.2234564])
+
+    assert len(query_packet_history("cursor-rounding", until=1760000000.1234567)["data"]) == 1
+    assert len(query_packet_history("cursor-rounding", since=1760000000.2234564)["data"]) == 1
+
+
+def test_invalid_cursor_is_rejected():
+    for cursor in ("nan", "inf:0", "1.0:-1", "1.0:x", "abc"):
+        with pytest.raises(ValueError):
+            parse_history_cursor(cursor)
+
+
+def test_enqueuer_counts_every_dropped_packet_across_threads():
+    enqueuer = HistoryEnqueuer()
+    dropped_before = enqueuer.dropped
+
+    def produce():
+        for _ in range(200):
+            # alert_id inválido: descartado ao serializar o lote
+            enqueuer.add("enqueuer-dropped", {"raw_packet": "P", "timestamp": 1.0, "alert_id": "x"})
+            enqueuer.flush()
+
+    threads = [threading.Thread(target=produce) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    enqueuer.flush()
+
+    assert enqueuer.dropped - dropped_before == 8 * 200
+
+
+def test_segment_round_trip_keeps_field_types():
+    packets = [
+        {"raw_packet": b"\x78\x78\x05\x01", "translated_packet": "STT;1", "timestamp": 1760000000.5, "packet_type": "location", "alert_id": None},
+        {"raw_packet": "ALT;2", "translated_packet": b"\x78\x78\x26", "timestamp": 1760000001.25, "packet_type": "alert", "alert_id": 6533},
+        {"raw_packet": None, "translated_packet": None, "timestamp": 1760000002.0, "packet_type": None, "alert_id": None},
+    ]
+
+    decoded = _decode_segment(_encode_segment(packets))
+
+    assert decoded[:2] == packets[:2]
+    assert decoded[2] == {"raw_packet": "", "translated_packet": "", "timestamp": 1760000002.0, "packet_type": None, "alert_id": None}
+
+
+def test_legacy_json_segment_is_readable():
+    packets = [{"raw_packet": "STT;1", "translated_packet": "STT;1", "timestamp": 1.0}]
+
+    assert _decode_segment(zlib.compress(json.dumps(packets).encode())) == packets
+
+
+def test_queue_item_round_trip():
+    packet = {"raw_packet": b"\x01\x02", "translated_packet": "STT;1", "timestamp": 3.5, "packet_type": "heartbeat", "alert_id": None}
+
+    assert _decode_queue_item(_encode_queue_item("864943040000001", packet)) == ("864943040000001", packet)
+
+
+def test_segment_id_describes_the_segment():
+    packets = [
+        {"timestamp": 2.0, "packet_type": "alert", "alert_id": 33},
+        {"timestamp": 1.0, "packet_type": "location"},
+    ]
+
+    seg_id = _build_segment_id(packets)
+
+    assert seg_id.startswith("1.000000-2.000000-2-")
+    assert _segment_may_contain(seg_id, "alert", 33)
+    assert not _segment_may_contain(seg_id, "heartbeat", None)
+    assert not _segment_may_contain(seg_id, None, 34)
+
+
+def test_old_segments_move_to_the_cold_tier_without_losing_packets(monkeypatch):
+    monkeypatch.setattr(settings, "HISTORY_HOT_LIMIT", 20)
+    monkeypatch.setattr(settings, "HISTORY_LIMIT", 1000)
+    redis_client = get_redis(decode_responses=False)
+
+    for batch in range(10):
+        packets = [{"raw_packet": f"P{batch * 10 + index}", "timestamp": float(batch * 10 + index)} for index in range(10)]
+        _append_segment(redis_client, "tiered", packets)
+
+    _, index_key = _history_keys("tiered")
+    hot_packets = sum(_parse_segment_id(seg_id)[2] for seg_id in redis_client.zrange(index_key, 0, -1))
+    with cold_segment_store.reader("tiered") as reader:
+        cold_packets = sum(_parse_segment_id(seg_id)[2] for seg_id in reader.seg_ids)
+
+    assert hot_packets == 20
+    assert int(redis_client.get("history:tiered:hot_packets")) == 20
+    assert cold_packets == 80
+    assert [packet["raw_packet"] for packet in get_packet_history("tiered")] == [f"P{index}" for index in reversed(range(100))]
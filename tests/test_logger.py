@@ -0,0 +1,89 @@
+import io
+import re
+
+import pytest
+
+from app.core.logger import SyncLogSink, get_logger, lazy, logger, logging_control
+
+packet_logger = get_logger(__name__, sampled=True)
+
+
+@pytest.fixture
+def log_stream():
+    stream = io.StringIO()
+    sink, level, sample_every = logging_control._sink, logging_control.level, logging_control.sample_every
+    logging_control.set_sink(SyncLogSink(stream))
+    logging_control.configure(level="INFO", sample_every=10)
+    logging_control._sample_counters.clear()
+    yield stream
+    logging_control.set_sink(sink)
+    logging_control.configure(level=level, sample_every=sample_every)
+
+
+def test_sampled_messages_are_not_formatted(log_stream):
+    calls = []
+
+    def format_packet(value):
+        calls.append(value)
+        return f"pacote {value}"
+
+    with logger.contextualize(log_label="TESTE"):
+        for index in range(100):
+            packet_logger.info("Pacote mapeado: {}", lazy(format_packet, index))
+
+    assert len(calls) == 10
+    assert log_stream.getvalue().count("Pacote mapeado") == 10
+    assert f"{__name__}:test_sampled_messages_are_not_formatted" in log_stream.getvalue()
+
+
+def test_messages_below_level_are_not_formatted(log_stream):
+    calls = []
+
+    with logger.contextualize(log_label="TESTE"):
+        for index in range(20):
+            packet_logger.debug("Pacote: {}", lazy(calls.append, index))
+
+    assert calls == []
+    assert log_stream.getvalue() == ""
+
+
+def test_device_rules_bypass_sampling(log_stream):
+    calls = []
+    logging_control.configure(devices={"864943040000001": "DEBUG"})
+    try:
+        with logger.contextualize(log_label="864943040000001"):
+            for index in range(20):
+                packet_logger.debug("Pacote: {}", lazy(calls.append, index))
+    finally:
+        logging_control.configure(devices={"864943040000001": None})
+
+    assert len(calls) == 20
+
+
+def _plain(stream) -> str:
+    return re.sub(r"\x1b\[[0-9;]*m", "", stream.getvalue())
+
+
+def test_backtrace_is_off_unless_enabled(log_stream):
+    def fail():
+        raise RuntimeError("falha")
+
+    def caught():
+        try:
+            fail()
+        except RuntimeError:
+            logger.exception("Erro capturado")
+
+    with logger.contextualize(log_label="TESTE"):
+        caught()
+        assert logging_control.snapshot()["backtrace"] is False
+        assert "caught()" not in _plain(log_stream)
+
+        logging_control.configure(backtrace=True)
+        try:
+            caught()
+        finally:
+            logging_control.configure(backtrace=False)
+
+    # Com backtrace, o rastro inclui os frames acima do que capturou a exceção
+    assert "caught()" in _plain(log_stream)
@@ -0,0 +1,121 @@
+import socket
+import threading
+import time
+
+import pytest
+
+from app.config.output_protocol_settings import output_protocol_settings
+from app.services.redis_service import get_redis
+from app.src.session.output_sessions_manager import MainServerSession, output_sessions_manager, send_to_main_server
+
+DEV_ID = "864943040000029"
+
+
+@pytest.fixture
+def main_server(monkeypatch):
+    """
+    Servidor principal local: aceita conexões e acumula os bytes recebidos.
+    """
+    listener = socket.create_server(("127.0.0.1", 0))
+    received = bytearray()
+    lock = threading.Lock()
+
+    def serve(conn):
+        with conn:
+            while data := conn.recv(4096):
+                with lock:
+                    received.extend(data)
+
+    def accept():
+        while True:
+            try:
+                conn, _ = listener.accept()
+            except OSError:
+                return
+            threading.Thread(target=serve, args=(conn,), daemon=True).start()
+
+    threading.Thread(target=accept, daemon=True).start()
+    monkeypatch.setitem(output_protocol_settings.OUTPUT_PROTOCOL_HOST_ADRESSES, "suntech4g", listener.getsockname())
+    get_redis().hset(f"tracker:{DEV_ID}", "output_protocol", "suntech4g")
+
+    def wait_for(payload: bytes, timeout: float = 2.0) -> bool:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with lock:
+                if payload in received:
+                    return True
+            time.sleep(0.01)
+        return False
+
+    yield wait_for
+
+    output_sessions_manager.delete_session(DEV_ID)
+    listener.close()
+
+
+def test_send_retries_on_a_new_session_when_reaped_before_sending(main_server, monkeypatch):
+    get_session = output_sessions_manager.get_session
+    reaped = []
+
+    def get_session_reaped_before_send(dev_id, output_protocol, serial):
+        session = get_session(dev_id, output_protocol, serial)
+        if not reaped:
+            # O reaper de ociosidade remove a sessão entre get_session e o envio
+            session._delete_idle()
+            reaped.append(session)
+        return session
+
+    monkeypatch.setattr(output_sessions_manager, "get_session", get_session_reaped_before_send)
+
+    send_to_main_server(DEV_ID, serial="1", type="heartbeat")
+
+    assert reaped and reaped[0]._is_deleted
+    assert main_server(b"ALV;3040000029")
+    assert output_sessions_manager._sessions[DEV_ID] is not reaped[0]
+
+
+def test_deleted_session_does_not_send():
+    session = output_sessions_manager.get_session(DEV_ID, "suntech4g", "1")
+    output_sessions_manager.delete_session(DEV_ID, session=session)
+
+    assert session.send(b"ALV;3040000029", "suntech4g") is False
+    assert DEV_ID not in output_sessions_manager._sessions
+
+
+def test_concurrent_get_session_registers_a_single_session(monkeypatch):
+    monkeypatch.setattr(MainServerSession, "connect", lambda session: True)
+    barrier = threading.Barrier(16)
+    sessions = []
+
+    def get():
+        barrier.wait()
+        sessions.append(output_sessions_manager.get_session("concurrent-get", "suntech4g", "1"))
+
+    threads = [threading.Thread(target=get) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    try:
+        assert len(sessions) == 16
+        assert all(session is sessions[0] for session in sessions)
+        assert output_sessions_manager._sessions["concurrent-get"] is sessions[0]
+    finally:
+        output_sessions_manager.delete_session("concurrent-get")
+
+
+def test_stale_session_does_not_delete_its_replacement(monkeypatch):
+    monkeypatch.setattr(MainServerSession, "connect", lambda session: True)
+    stale = output_sessions_manager.get_session("replaced", "suntech4g", "1")
+    output_sessions_manager.delete_session("replaced")
+    current = output_sessions_manager.get_session("replaced", "suntech4g", "1")
+
+    try:
+        # Reaper atrasado da sessão antiga
+        output_sessions_manager.delete_session("replaced", session=stale)
+
+        assert output_sessions_manager._sessions["replaced"] is current
+        assert not current._is_deleted
+    finally:
+        output_sessions_manager.delete_session("replaced")